@@ -0,0 +1,52 @@
+"""Throughput of the /todos/bulk endpoints against one-task-at-a-time calls.
+
+Creates --tasks tasks with POST /todos one by one, then the same number
+with one POST /todos/bulk, and updates and deletes them with PATCH and
+DELETE /todos/bulk, printing tasks per second for each. Runs through the
+Flask test client, against a throwaway SQLite file unless --database
+names another one. Run from backend/:
+
+    python bench_bulk.py --tasks 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def timed(label, count, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>28}: {elapsed:.2f}s, {count / elapsed:,.0f} tasks/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bulk task endpoints")
+    parser.add_argument('--tasks', type=int, default=10000, help="Tasks per request (at most 10,000)")
+    parser.add_argument('--single', type=int, default=1000, help="Tasks created one POST at a time")
+    parser.add_argument('--database', help="SQLAlchemy URL (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    # app reads DATABASE_URL (and creates the schema) on import
+    os.environ['DATABASE_URL'] = args.database or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    from app import app
+
+    client = app.test_client()
+    with app.app_context():
+        timed('POST /todos, one at a time', args.single, lambda: [
+            client.post('/todos', json={'content': f"single {i}"}) for i in range(args.single)
+        ])
+
+        body = [{'content': f"bulk {i}", 'due_date': '2026-05-01T09:00'} for i in range(args.tasks)]
+        created = timed('POST /todos/bulk', args.tasks, lambda: client.post('/todos/bulk', json=body).json)
+        ids = [result['task']['id'] for result in created['results']]
+
+        updates = [{'id': id, 'completed': True} for id in ids]
+        timed('PATCH /todos/bulk', args.tasks, lambda: client.patch('/todos/bulk', json=updates))
+        timed('DELETE /todos/bulk', args.tasks, lambda: client.delete('/todos/bulk', json=ids))
+
+
+if __name__ == '__main__':
+    main()
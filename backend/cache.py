@@ -0,0 +1,100 @@
+# Read-through Redis cache for GET /todos pages and single tasks.
+#
+# Keys carry a version: every write bumps the list version (and the task's
+# own) after it commits, so a page built from data read before a write is
+# stored under a version nobody asks for again and just expires. Readers
+# fetch the version before querying, which is what makes concurrent
+# writers safe. Without REDIS_HOST (or the redis package) every read goes
+# to the database.
+
+import hashlib
+import os
+import threading
+from collections import Counter
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+TTL = int(os.environ.get('CACHE_TTL', 300))
+PREFIX = 'todos'
+
+
+def redis_client():
+    """A client for REDIS_HOST, or None when caching is off."""
+    host = os.environ.get('REDIS_HOST')
+    if not host or redis is None:
+        return None
+    return redis.Redis(host=host, port=int(os.environ.get('REDIS_PORT', 6379)),
+                       socket_timeout=0.25, socket_connect_timeout=0.25)
+
+
+class TodoCache:
+    def __init__(self, client, ttl=TTL):
+        self.client = client
+        self.ttl = ttl
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, kind):
+        with self._lock:
+            self.counts[kind] += 1
+
+    def _version_key(self, id=None):
+        return f"{PREFIX}:v" if id is None else f"{PREFIX}:v:{id}"
+
+    def fetch(self, id, args, build):
+        """Cached body for task `id` (None for list pages) and the request
+        `args`, or build() it and store it. Returns (body, hit)."""
+        if self.client is None:
+            return build(), False
+
+        digest = hashlib.sha1(repr(sorted(args.items(multi=True))).encode()).hexdigest()
+        try:
+            version = int(self.client.get(self._version_key(id)) or 0)
+            key = f"{PREFIX}:{'list' if id is None else f'item:{id}'}:{version}:{digest}"
+            body = self.client.get(key)
+        except redis.RedisError:
+            # Redis down: serve from the database
+            self._count('errors')
+            return build(), False
+
+        if body is not None:
+            self._count('hits')
+            return body, True
+
+        self._count('misses')
+        body = build()
+        try:
+            self.client.set(key, body, ex=self.ttl)
+        except redis.RedisError:
+            self._count('errors')
+        return body, False
+
+    def invalidate(self, *ids):
+        """Call after a write commits: bump the list version (and those of
+        tasks `ids`) in one round trip."""
+        if self.client is None:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.incr(self._version_key())
+            for id in ids:
+                pipe.incr(self._version_key(id))
+            pipe.execute()
+        except redis.RedisError:
+            # Stale entries now live until their TTL runs out
+            self._count('errors')
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = counts.get('hits', 0) + counts.get('misses', 0)
+        return {
+            'enabled': self.client is not None,
+            'hits': counts.get('hits', 0),
+            'misses': counts.get('misses', 0),
+            'errors': counts.get('errors', 0),
+            'hit_ratio': round(counts.get('hits', 0) / lookups, 3) if lookups else None,
+        }
@@ -0,0 +1,99 @@
+# Versioned schema migrations, replacing db.create_all().
+#
+# Each step runs once per database, in order; the last applied version is
+# kept in schema_version. Steps are idempotent (checkfirst), so databases
+# created by the old db.create_all() are adopted as they are. Run at
+# startup by app.py, or by hand with `flask --app app migrate`.
+#
+# Steps spell out their own DDL instead of reading the Task model, so what
+# a version creates never changes after it ships; a model change needs a
+# new step.
+
+import sqlalchemy as sa
+
+# Held while migrating, so backend replicas starting together don't race
+LOCK_ID = 7240001
+
+
+def task_table(metadata):
+    """The task table as version 1 created it."""
+    return sa.Table(
+        'task', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('content', sa.String(200), nullable=False),
+        sa.Column('notes', sa.Text, nullable=True),
+        sa.Column('due_date', sa.DateTime, nullable=True),
+        sa.Column('completed', sa.Boolean),
+        sa.Column('created_at', sa.DateTime),
+    )
+
+
+def task_indexes(table, concurrently=False):
+    """The indexes version 2 added: keyset pages newest first, the same for
+    open tasks only, and open tasks by due date."""
+    c = table.c
+    open_ = c.completed == sa.false()
+    open_due = sa.and_(open_, c.due_date.isnot(None))
+    return [
+        sa.Index('ix_task_created_at_id', c.created_at.desc(), c.id.desc(),
+                 postgresql_concurrently=concurrently),
+        sa.Index('ix_task_open_created_at', c.created_at.desc(), c.id.desc(),
+                 postgresql_where=open_, sqlite_where=open_, postgresql_concurrently=concurrently),
+        sa.Index('ix_task_open_due_date', c.due_date, c.id,
+                 postgresql_where=open_due, sqlite_where=open_due, postgresql_concurrently=concurrently),
+    ]
+
+
+def invalid_index(conn, name):
+    """True if a failed CREATE INDEX CONCURRENTLY left `name` behind INVALID
+    (Postgres only)."""
+    if conn.dialect.name != 'postgresql':
+        return False
+    return bool(conn.execute(sa.text(
+        "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid"
+        " JOIN pg_namespace n ON n.oid = c.relnamespace"
+        " WHERE c.relname = :name AND n.nspname = current_schema()"
+    ), {'name': name}).scalar())
+
+
+def create_task_table(conn):
+    task_table(sa.MetaData()).create(conn, checkfirst=True)
+
+
+def add_task_indexes(conn):
+    # On Postgres, build without blocking writes to a live table
+    table = task_table(sa.MetaData())
+    for index in task_indexes(table, concurrently=conn.dialect.name == 'postgresql'):
+        # checkfirst would keep an INVALID index, which is never used
+        if invalid_index(conn, index.name):
+            index.drop(conn)
+        index.create(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    (1, create_task_table),
+    (2, add_task_indexes),
+]
+
+
+def migrate(engine):
+    """Apply every pending migration. Returns the versions applied."""
+    applied = []
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        postgres = conn.dialect.name == 'postgresql'
+        if postgres:
+            conn.execute(sa.text("SELECT pg_advisory_lock(:id)"), {'id': LOCK_ID})
+        try:
+            conn.execute(sa.text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+            current = conn.execute(sa.text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+            for version, step in MIGRATIONS:
+                if version <= current:
+                    continue
+                step(conn)
+                conn.execute(sa.text("INSERT INTO schema_version (version) VALUES (:v)"), {'v': version})
+                applied.append(version)
+        finally:
+            if postgres:
+                conn.execute(sa.text("SELECT pg_advisory_unlock(:id)"), {'id': LOCK_ID})
+    return applied
@@ -0,0 +1,339 @@
+import base64
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+
+# An in-memory SQLite database instead of Postgres; set before app is imported
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+import app as app_module  # noqa: E402
+from app import app, db, Task, FIELDS, SORTS, decode_cursor, encode_cursor, page_query  # noqa: E402
+import migrations  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+INDEXES = {'ix_task_created_at_id', 'ix_task_open_created_at', 'ix_task_open_due_date'}
+
+
+@pytest.fixture(scope='module')
+def ctx():
+    with app.app_context():
+        start = datetime(2026, 1, 1)
+        db.session.add_all([
+            Task(content=f"task {i}", completed=i % 3 == 0, created_at=start + timedelta(minutes=i),
+                 due_date=start + timedelta(days=i % 30) if i % 2 else None)
+            for i in range(2000)
+        ])
+        db.session.commit()
+        db.session.execute(sa.text("ANALYZE"))
+        yield
+
+
+def plan(query):
+    """SQLite's EXPLAIN QUERY PLAN for an ORM query, as one string."""
+    compiled = query.statement.compile(db.engine)
+    params = [str(value) for value in compiled.construct_params().values()]
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", tuple(params)).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+
+def test_migrations_create_indexes_once(ctx):
+    names = {index['name'] for index in sa.inspect(db.engine).get_indexes('task')}
+    assert INDEXES <= names
+    assert {index.name for index in Task.__table__.indexes} == INDEXES
+    assert migrate(db.engine) == []
+
+
+def test_migrate_adopts_create_all_schema(tmp_path):
+    # A database made by the old db.create_all(): the table, no indexes
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    old = sa.Table('task', sa.MetaData(), *(sa.Column(c.name, c.type, primary_key=c.primary_key)
+                                             for c in Task.__table__.columns))
+    old.create(engine)
+
+    assert migrate(engine) == [1, 2]
+    assert INDEXES <= {index['name'] for index in sa.inspect(engine).get_indexes('task')}
+    engine.dispose()
+
+
+def test_migrations_build_what_the_model_declares():
+    # The steps' frozen DDL still matches the model; a model change needs a new step
+    table = migrations.task_table(sa.MetaData())
+    for dialect in (sa.dialects.sqlite.dialect(), sa.dialects.postgresql.dialect()):
+        def ddl(elements):
+            return sorted(str(element.compile(dialect=dialect)) for element in elements)
+        assert ddl([sa.schema.CreateTable(table)]) == ddl([sa.schema.CreateTable(Task.__table__)])
+        assert ddl(map(sa.schema.CreateIndex, migrations.task_indexes(table))) == \
+            ddl(map(sa.schema.CreateIndex, Task.__table__.indexes))
+
+
+def test_concurrent_index_builds_use_their_own_copies():
+    postgres = sa.dialects.postgresql.dialect()
+    table = migrations.task_table(sa.MetaData())
+    index = migrations.task_indexes(table, concurrently=True)[0]
+    create = str(sa.schema.CreateIndex(index).compile(dialect=postgres))
+    assert create.startswith('CREATE INDEX CONCURRENTLY ix_task_created_at_id ON task (created_at DESC, id DESC)')
+    assert str(sa.schema.DropIndex(index).compile(dialect=postgres)).strip() == 'DROP INDEX CONCURRENTLY ix_task_created_at_id'
+
+    # Building them never touches the model's indexes
+    assert all(not index.dialect_options['postgresql']['concurrently'] for index in Task.__table__.indexes)
+    for index in Task.__table__.indexes:
+        assert 'CONCURRENTLY' not in str(sa.schema.CreateIndex(index).compile(dialect=postgres))
+
+
+def test_invalid_indexes_are_rebuilt(tmp_path, monkeypatch):
+    # Version 1 applied and one index left INVALID by a failed concurrent build
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'half.db'}")
+    assert migrate(engine) == [1, 2]
+    with engine.begin() as conn:
+        conn.execute(sa.text("DELETE FROM schema_version WHERE version = 2"))
+    monkeypatch.setattr(migrations, 'invalid_index', lambda conn, name: name == 'ix_task_open_due_date')
+
+    statements = []
+    sa.event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2].strip()))
+    assert migrate(engine) == [2]
+    ddl = [s.split('(')[0].strip() for s in statements if s.startswith(('CREATE INDEX', 'DROP INDEX'))]
+    assert ddl == ['DROP INDEX ix_task_open_due_date', 'CREATE INDEX ix_task_open_due_date ON task']
+    assert INDEXES <= {index['name'] for index in sa.inspect(engine).get_indexes('task')}
+    engine.dispose()
+
+
+def test_page_plans_use_indexes(ctx):
+    cursor = (datetime(2026, 1, 1, 12), 720)
+
+    for query in (page_query(FIELDS, 50), page_query(FIELDS, 50, cursor)):
+        text = plan(query)
+        assert 'ix_task_created_at_id' in text and 'TEMP B-TREE' not in text, text
+
+    text = plan(page_query(FIELDS, 50, cursor, completed=False))
+    assert 'ix_task_open_created_at' in text and 'TEMP B-TREE' not in text, text
+
+    due = (datetime(2026, 1, 10), 19)
+    text = plan(page_query(FIELDS, 50, due, completed=False, due_before=datetime(2026, 1, 20), sort='due'))
+    assert 'ix_task_open_due_date' in text and 'TEMP B-TREE' not in text, text
+
+
+def test_filtered_pages(ctx):
+    client = app.test_client()
+    items = client.get('/todos', query_string={'completed': 'false', 'due_before': '2026-01-03', 'limit': 500}).json['items']
+    assert items and all(not t['completed'] and t['due_date'] < '2026-01-03' for t in items)
+    assert len(items) == db.session.query(Task).filter(
+        Task.completed.is_(False), Task.due_date < datetime(2026, 1, 3)).count()
+
+    # Soonest due first, paged on (due_date, id)
+    seen, cursor = [], ''
+    while True:
+        page = client.get('/todos', query_string={'sort': 'due', 'completed': 'false', 'limit': 70,
+                                                  'fields': 'id,due_date', 'cursor': cursor}).json
+        seen += [(t['due_date'], t['id']) for t in page['items']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert seen == sorted(seen)
+    assert len(seen) == db.session.query(Task).filter(Task.completed.is_(False), Task.due_date.isnot(None)).count()
+
+
+def walk(client, **params):
+    """Every page of GET /todos for `params`, following next_cursor."""
+    pages, cursor = [], params.pop('cursor', '')
+    while True:
+        page = client.get('/todos', query_string=dict(params, cursor=cursor)).json
+        pages.append(page['items'])
+        cursor = page['next_cursor']
+        if not cursor:
+            return pages
+
+
+def test_cursor_round_trip(ctx):
+    value = datetime(2026, 3, 4, 5, 6, 7, 890)
+    assert decode_cursor(encode_cursor(value, 42)) == (value, 42)
+
+    client = app.test_client()
+    pages = walk(client, limit=500, fields='id')
+    ids = [t['id'] for page in pages for t in page]
+    assert [len(page) for page in pages[:-1]] == [500] * (len(pages) - 1)
+    assert ids == [id for id, in db.session.query(Task.id).order_by(Task.created_at.desc(), Task.id.desc())]
+
+
+def test_cursor_breaks_created_at_ties_on_id(ctx):
+    # Older than every other task, all created in the same instant
+    tied = datetime(2025, 6, 1)
+    tasks = [Task(content=f"tie {i}", created_at=tied) for i in range(10)]
+    db.session.add_all(tasks)
+    db.session.commit()
+    try:
+        client = app.test_client()
+        # Seek from just past the newest of them, in pages that split the group
+        start = encode_cursor(tied, max(t.id for t in tasks) + 1)
+        pages = walk(client, limit=3, fields='id,created_at', cursor=start)
+        assert [len(page) for page in pages] == [3, 3, 3, 1]
+        ids = [t['id'] for page in pages for t in page]
+        assert ids == sorted((t.id for t in tasks), reverse=True)
+        assert all(t['created_at'] == tied.isoformat() for page in pages for t in page)
+    finally:
+        for task in tasks:
+            db.session.delete(task)
+        db.session.commit()
+
+
+def test_due_sort_leaves_out_tasks_without_a_due_date(ctx):
+    client = app.test_client()
+    assert SORTS['due'] == 'due_date'
+    seen = [(t['due_date'], t['id']) for page in walk(client, sort='due', limit=300, fields='id,due_date') for t in page]
+    assert seen == sorted(seen) and all(due for due, _ in seen)
+    assert len(seen) == db.session.query(Task).filter(Task.due_date.isnot(None)).count()
+
+
+@pytest.mark.parametrize('params, error', [
+    ({'cursor': 'not a cursor'}, 'Invalid'),
+    ({'cursor': base64.urlsafe_b64encode(b'2026-01-01T00:00:00').decode()}, 'Invalid'),
+    ({'cursor': base64.urlsafe_b64encode(b'\xff\xfe|1').decode()}, 'Invalid'),
+    ({'limit': 'ten'}, 'Invalid'),
+    ({'limit': 0}, 'Invalid'),
+    ({'limit': -5}, 'Invalid'),
+    ({'due_before': 'tomorrow'}, 'Invalid'),
+    ({'fields': 'id,password'}, 'Unknown fields: password'),
+    ({'sort': 'priority'}, 'Unknown sort: priority'),
+])
+def test_bad_page_parameters(ctx, params, error):
+    response = app.test_client().get('/todos', query_string=params)
+    assert response.status_code == 400
+    assert response.json['error'].startswith(error)
+
+
+class FakeRedis:
+    """The few Redis commands TodoCache uses, in memory (TTLs ignored)."""
+
+    def __init__(self):
+        self.data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self.data.get(key)
+        return value.encode() if isinstance(value, str) else value
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self.data[key] = value
+
+    def incr(self, key):
+        with self._lock:
+            self.data[key] = str(int(self.data.get(key, 0)) + 1)
+            return int(self.data[key])
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def incr(self, key):
+        self.calls.append(key)
+
+    def execute(self):
+        return [self.client.incr(key) for key in self.calls]
+
+
+@pytest.fixture
+def cached(ctx):
+    cache = app_module.cache
+    cache.client, cache.counts = FakeRedis(), cache.counts.__class__()
+    queries = []
+
+    def count(*args):
+        queries.append(args[2])
+    sa.event.listen(db.engine, 'before_cursor_execute', count)
+    yield queries
+    sa.event.remove(db.engine, 'before_cursor_execute', count)
+    cache.client = None
+
+
+def test_hot_reads_skip_database(cached):
+    client = app.test_client()
+    first = client.get('/todos', query_string={'limit': 5})
+    assert first.headers['X-Cache'] == 'MISS' and cached
+
+    cached.clear()
+    again = client.get('/todos', query_string={'limit': 5})
+    assert again.headers['X-Cache'] == 'HIT' and again.json == first.json
+    id = first.json['items'][0]['id']
+    assert client.get(f'/todos/{id}').headers['X-Cache'] == 'MISS'
+    assert client.get(f'/todos/{id}').headers['X-Cache'] == 'HIT'
+    cached.clear()
+    client.get('/todos', query_string={'limit': 5})
+    client.get(f'/todos/{id}')
+    assert cached == []
+
+    stats = client.get('/todos/cache').json
+    assert stats['enabled'] and stats['hits'] == 4 and stats['misses'] == 2
+
+
+def test_writes_invalidate(cached):
+    client = app.test_client()
+    id = client.get('/todos', query_string={'limit': 1}).json['items'][0]['id']
+    client.get(f'/todos/{id}')
+
+    client.put(f'/todos/{id}', json={'content': 'renamed'})
+    page = client.get('/todos', query_string={'limit': 1})
+    assert page.headers['X-Cache'] == 'MISS' and page.json['items'][0]['content'] == 'renamed'
+    assert client.get(f'/todos/{id}').json['content'] == 'renamed'
+
+    new = client.post('/todos', json={'content': 'newest'}).json
+    assert client.get('/todos', query_string={'limit': 1}).json['items'][0]['id'] == new['id']
+
+    client.delete(f"/todos/{new['id']}")
+    assert client.get(f"/todos/{new['id']}").status_code == 404
+    assert client.get('/todos', query_string={'limit': 1}).json['items'][0]['id'] == id
+
+
+def test_bulk_create_update_delete(cached):
+    client = app.test_client()
+    body = [{'content': 'bulk a', 'due_date': '2026-05-01T09:00'}, {'content': ''}, {'content': 'bulk b', 'completed': True}]
+    created = client.post('/todos/bulk', json=body).json
+    assert [r['status'] for r in created['results']] == [201, 400, 201]
+    a, b = created['results'][0]['task'], created['results'][2]['task']
+    assert a['due_date'] == '2026-05-01T09:00:00' and not a['completed'] and b['completed']
+    assert client.get(f"/todos/{a['id']}").json == a
+
+    ndjson = '{"content": "line 1"}\n\nnot json\n{"content": "line 2"}\n'
+    lines = client.post('/todos/bulk', data=ndjson, content_type='application/x-ndjson').json
+    assert [r['status'] for r in lines['results']] == [201, 400, 201]
+
+    updated = client.patch('/todos/bulk', json=[{'id': a['id'], 'completed': True}, {'id': 10 ** 9, 'notes': 'x'},
+                                                {'id': b['id']}]).json
+    assert [r['status'] for r in updated['results']] == [200, 404, 400]
+    assert updated['results'][0]['task']['completed'] and client.get(f"/todos/{a['id']}").json['completed']
+
+    deleted = client.delete('/todos/bulk', json=[a['id'], {'id': b['id']}, 10 ** 9]).json
+    assert [r['status'] for r in deleted['results']] == [200, 200, 404]
+    assert client.get(f"/todos/{a['id']}").status_code == 404
+
+
+def test_bulk_rejects_whole_request(ctx):
+    client = app.test_client()
+    before = db.session.query(Task).count()
+    assert client.post('/todos/bulk', json={'content': 'not a list'}).status_code == 400
+    assert client.post('/todos/bulk', json=[{'content': 'x'}] * 10001).status_code == 413
+    assert db.session.query(Task).count() == before
+
+
+def test_export_streams_every_task(ctx):
+    client = app.test_client()
+    count = db.session.query(Task).count()
+
+    response = client.get('/todos/export')
+    assert response.is_streamed and response.mimetype == 'application/json'
+    tasks = response.json
+    assert len(tasks) == count and [t['id'] for t in tasks] == sorted(t['id'] for t in tasks)
+    assert tasks[0] == db.session.get(Task, tasks[0]['id']).to_dict()
+
+    lines = client.get('/todos/export', query_string={'format': 'ndjson', 'fields': 'id,due_date'}).data.splitlines()
+    assert len(lines) == count and set(json.loads(lines[-1])) == {'id', 'due_date'}
+    assert client.get('/todos/export', query_string={'format': 'xml'}).status_code == 400
@@ -0,0 +1,57 @@
+"""Aggregating findings on the columnar FindingsTable.
+
+Appends synthetic pages of findings, then times building the DataFrame and
+the report aggregations (total, per-service / region / account group-bys,
+cost sort). Run from cost-optimizer/:
+
+    python -m benchmarks.bench_findings --findings 1000000
+"""
+import argparse
+import random
+import time
+
+from services.findings import Finding, FindingsTable
+from services.registry import SCANS
+
+PAGE_SIZE = 1000
+
+
+def pages(count, seed):
+    rng = random.Random(seed)
+    services = [scan['name'] for scan in SCANS]
+    regions = ['ap-south-1', 'us-east-1', 'eu-west-1', 'us-west-2']
+    accounts = [f"{100000000000 + i}" for i in range(20)]
+    for start in range(0, count, PAGE_SIZE):
+        page = [Finding(f"res-{i:08x}", 'Unused', rng.random() * 100, rng.choice(regions), rng.choice(accounts))
+                for i in range(start, min(count, start + PAGE_SIZE))]
+        yield rng.choice(services), page
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:>24}: {time.perf_counter() - start:.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark findings aggregation")
+    parser.add_argument('--findings', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    generated = list(pages(args.findings, seed=1))
+    table = FindingsTable(scan['name'] for scan in SCANS)
+    timed('append pages', lambda: [table.add(service, page) for service, page in generated])
+    timed('build frame', table.frame)
+
+    start = time.perf_counter()
+    timed('total', table.total)
+    timed('by service', table.summary)
+    timed('by service/region', lambda: table.summary(('Service', 'Region')))
+    timed('by account', lambda: table.summary(('Account',)))
+    timed('sort by cost', table.by_cost)
+    print(f"{'aggregations':>24}: {time.perf_counter() - start:.3f}s for {len(table)} findings")
+
+
+if __name__ == '__main__':
+    main()
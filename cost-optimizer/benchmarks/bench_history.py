@@ -0,0 +1,72 @@
+"""Trend and per-resource queries on the scan history store.
+
+Records a year of daily scans of a synthetic account (most findings stay
+open from day to day, a few resolve and new ones appear), then times the
+queries the dashboard's trend view runs. Run from cost-optimizer/:
+
+    python -m benchmarks.bench_history --days 365 --findings 10000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from services.findings import Finding, FindingsTable
+from services.history import History
+from services.registry import SCANS
+
+DAY = 86400
+
+
+def daily_tables(days, count, seed):
+    rng = random.Random(seed)
+    services = [scan['name'] for scan in SCANS]
+    regions = ['ap-south-1', 'us-east-1', 'eu-west-1', 'us-west-2']
+    open_ids = list(range(count))
+    next_id = count
+    for _ in range(days):
+        # ~2% resolve each day and as many new ones appear
+        for i in rng.sample(range(len(open_ids)), len(open_ids) // 50):
+            open_ids[i] = next_id
+            next_id += 1
+        table = FindingsTable(services)
+        for start in range(0, count, 1000):
+            ids = open_ids[start:start + 1000]
+            table.add(services[start // 1000 % len(services)],
+                      [Finding(f"vol-{i:010x}", 'Unattached', (i % 100) / 10, regions[i % len(regions)]) for i in ids])
+        yield table
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:>24}: {time.perf_counter() - start:.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scan history store")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--findings', type=int, default=10000, help="Findings per daily scan")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'history.sqlite')
+    history = History(path)
+    first_day = time.time() - args.days * DAY
+
+    start = time.perf_counter()
+    for day, table in enumerate(daily_tables(args.days, args.findings, seed=1)):
+        history.record(table, scanned_at=first_day + (day + 1) * DAY)
+    elapsed = time.perf_counter() - start
+    print(f"{'record':>24}: {elapsed:.1f}s for {args.days} runs "
+          f"({elapsed / args.days * 1000:.0f}ms per run, {os.path.getsize(path) / 1e6:.0f} MB)")
+
+    timed('trend by service, 90d', lambda: history.trend(90))
+    timed('trend by region, 365d', lambda: history.trend(365, by='Region'))
+    oldest = timed('oldest 50 open', lambda: history.oldest(50))
+    timed('one resource', lambda: history.resource(oldest['ID'].iloc[0]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Every scanner and the full pipelines against a synthetic account on moto.
+
+Fills a mocked account with `--scale` instances, volumes, snapshots and
+ENIs (and a tenth as many buckets), then runs each registry scanner on its
+own, scan_regions, main.py and web_app.py, recording wall time, AWS API
+calls by operation and peak traced memory (measured in a second run, so
+tracemalloc doesn't skew the timings). Results are written to
+outputs/benchmarks/scanners_<scale>_<timestamp>.json and compared with
+the previous run at the same scale. Run from cost-optimizer/:
+
+    python -m benchmarks.bench_scanners --scale 1000
+    python -m benchmarks.bench_scanners --scale 100000 --no-memory --skip-web
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+import boto3
+import botocore.handlers
+from moto import mock_aws
+from tabulate import tabulate
+
+from services import cache, inventory
+from services.client import STATS
+from services.registry import SCANS
+from services.regions import RegionClients, scan_regions
+
+REGION = 'ap-south-1'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, 'outputs', 'benchmarks')
+
+# Slower than the last run by more than this (and by 50ms) is flagged
+SLOWER = 1.25
+
+
+class ApiCalls:
+    """Counts AWS API calls by operation across every boto3 client. The
+    handler is added to botocore's built-ins (as moto does), so the
+    per-region sessions the scanners create pick it up too."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        botocore.handlers.BUILTIN_HANDLERS.append(('before-call', self._count))
+
+    def _count(self, model, **kwargs):
+        with self._lock:
+            self.counts[f"{model.service_model.service_name}.{model.name}"] += 1
+
+    def take(self):
+        with self._lock:
+            counts, self.counts = dict(self.counts), Counter()
+        return counts
+
+
+def populate(scale, buckets):
+    """A synthetic account: `scale` each of instances, unattached volumes,
+    snapshots and ENIs, plus `buckets` S3 buckets."""
+    ec2 = boto3.client('ec2', region_name=REGION)
+    s3 = boto3.client('s3', region_name=REGION)
+
+    for start in range(0, scale, 500):
+        count = min(500, scale - start)
+        ec2.run_instances(ImageId='ami-12c6146b', MinCount=count, MaxCount=count, InstanceType='t3.micro')
+
+    volumes = [ec2.create_volume(AvailabilityZone=f"{REGION}a", Size=8)['VolumeId'] for _ in range(scale)]
+    for i in range(scale):
+        ec2.create_snapshot(VolumeId=volumes[i % len(volumes)])
+
+    # 16 /20 subnets per /16 VPC, ~4000 ENIs per subnet
+    subnet, free = None, 0
+    for i in range(scale):
+        if free == 0:
+            if i % (16 * 4000) == 0:
+                vpc = ec2.create_vpc(CidrBlock=f"10.{i // (16 * 4000) % 256}.0.0/16")['Vpc']['VpcId']
+            block = i // 4000 % 16
+            subnet = ec2.create_subnet(VpcId=vpc, CidrBlock=f"10.{i // (16 * 4000) % 256}.{block * 16}.0/20")['Subnet']['SubnetId']
+            free = 4000
+        ec2.create_network_interface(SubnetId=subnet)
+        free -= 1
+
+    for i in range(buckets):
+        s3.create_bucket(Bucket=f"bench-bucket-{i:06d}", CreateBucketConfiguration={'LocationConstraint': REGION})
+
+    return {'instances': scale, 'volumes': scale, 'snapshots': scale, 'enis': scale, 'buckets': buckets}
+
+
+def measure(func, calls, memory):
+    calls.take()
+    STATS.reset()
+    start = time.perf_counter()
+    findings = func()
+    entry = {'seconds': round(time.perf_counter() - start, 3), 'findings': findings}
+    entry['calls'] = calls.take()
+    entry['total_calls'] = sum(entry['calls'].values())
+    entry['client'] = STATS.totals()
+
+    if memory:
+        tracemalloc.start()
+        func()
+        entry['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+        tracemalloc.stop()
+        calls.take()
+    return entry
+
+
+def scanner(scan, session):
+    def run():
+        clients = RegionClients(REGION, session)
+        return sum(len(page) for page in scan['stream'](*clients.args(scan)))
+    return run
+
+
+def run_scan_regions(session):
+    findings, timings = scan_regions([REGION], session=session)
+    return len(findings)
+
+
+def run_main():
+    import main
+    argv = sys.argv
+    sys.argv = ['main.py', '--region', REGION, '--no-cache', '--no-history']
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            findings = main.main()
+    finally:
+        sys.argv = argv
+    if findings is None:
+        raise RuntimeError("main.py scan failed")
+    return len(findings)
+
+
+def run_web_app():
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(os.path.join(ROOT, 'web_app.py'), default_timeout=3600)
+    app.run()
+    app.sidebar.text_input[0].set_value(REGION)
+    for box in app.sidebar.checkbox:
+        if 'scan cache' in box.label or 'scan history' in box.label:
+            box.uncheck()
+    app.session_state['scan_in_progress'] = True
+    app.run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    return int(app.metric[2].value)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_results(scale):
+    paths = sorted(glob.glob(os.path.join(RESULTS, f"scanners_{scale}_*.json")))
+    if not paths:
+        return None
+    with open(paths[-1]) as f:
+        return json.load(f)
+
+
+def report(results, previous):
+    rows = []
+    for label, entry in results.items():
+        row = [label, entry['findings'], entry['total_calls'], f"{entry['seconds']:.2f}s", entry.get('peak_mb', '-')]
+        flag = ''
+        before = (previous or {}).get('results', {}).get(label)
+        if before:
+            row += [before['total_calls'], f"{before['seconds']:.2f}s"]
+            if entry['total_calls'] > before['total_calls']:
+                flag = 'MORE CALLS'
+            elif entry['seconds'] > before['seconds'] * SLOWER and entry['seconds'] - before['seconds'] > 0.05:
+                flag = 'SLOWER'
+        else:
+            row += ['-', '-']
+        rows.append(row + [flag])
+    print(tabulate(rows, headers=['Benchmark', 'Findings', 'Calls', 'Wall', 'Peak MB', 'Prev calls', 'Prev wall', ''],
+                   tablefmt='simple'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scanners and pipelines on moto")
+    parser.add_argument('--scale', type=int, default=1000, help="Instances, volumes, snapshots and ENIs each")
+    parser.add_argument('--buckets', type=int, help="S3 buckets (default: scale / 10)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc pass")
+    parser.add_argument('--skip-web', action='store_true', help="Skip the web_app.py pipeline")
+    args = parser.parse_args()
+    buckets = args.buckets if args.buckets is not None else max(1, args.scale // 10)
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', REGION)
+    calls = ApiCalls()
+    cache.disable()
+    inventory.disable()
+
+    with mock_aws():
+        start = time.perf_counter()
+        resources = populate(args.scale, buckets)
+        calls.take()
+        print(f" Populated {resources} in {time.perf_counter() - start:.1f}s")
+
+        session = boto3.Session(region_name=REGION)
+        memory = not args.no_memory
+        results = {}
+        for scan in SCANS:
+            results[scan['name']] = measure(scanner(scan, session), calls, memory)
+        results['scan_regions'] = measure(lambda: run_scan_regions(session), calls, memory)
+        results['main.py'] = measure(run_main, calls, memory)
+        if not args.skip_web:
+            results['web_app.py'] = measure(run_web_app, calls, memory)
+
+    previous = previous_results(args.scale)
+    report(results, previous)
+
+    os.makedirs(RESULTS, exist_ok=True)
+    path = os.path.join(RESULTS, f"scanners_{args.scale}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump({
+            'timestamp': time.time(), 'commit': git_commit(), 'python': platform.python_version(),
+            'scale': args.scale, 'resources': resources, 'results': results,
+        }, f, indent=2)
+    print(f"\n Results written to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,27 +3,15 @@ from colorama import Fore, Style, init
 
 init()
 
-def generate_dashboard(cloud_data):
+def generate_dashboard(findings):
     print(Style.BRIGHT + Fore.CYAN + "\n" + "="*60)
     print("     AWS COST OPTIMIZER REPORT   ")
     print("="*60 + Style.RESET_ALL)
-    
-    grand_total = 0.0
-    summary_data = []
-    all_details = []
-
-    for service, resources in cloud_data.items():
-        service_total = 0.0
-        count = len(resources)
-        
-        for item in resources:
-            cost = item.get('Cost', 0.0)
-            service_total += cost
-            grand_total += cost
-            all_details.append([service, item.get('ID', 'N/A'), item.get('Reason', 'Unused'), f"${cost:.2f}"])
-            
-        if count > 0:
-            summary_data.append([service, count, f"${service_total:.2f}"])
+
+    # Totals, per-service summary and the cost sort all run on the findings table
+    grand_total = findings.total()
+    summary = findings.summary()
+    summary_data = [[service, count, f"${cost:.2f}"] for service, count, cost in summary.itertuples(index=False)]
 
     print(Fore.YELLOW + "\n  SUMMARY" + Style.RESET_ALL)
     if summary_data:
@@ -31,11 +19,53 @@ def generate_dashboard(cloud_data):
     else:
         print(Fore.GREEN + "  No waste found." + Style.RESET_ALL)
 
-    if all_details:
+    if len(findings):
         print(Fore.YELLOW + "\n DETAILED FINDINGS" + Style.RESET_ALL)
-        all_details.sort(key=lambda x: float(x[3].replace('$', '')), reverse=True)
-        print(tabulate(all_details, headers=["Service", "Resource ID", "Reason", "Est. Cost"], tablefmt="simple"))
+        details = findings.by_cost()
+        columns = ["Service", "Region", "ID", "Reason", "Cost"]
+        headers = ["Service", "Region", "Resource ID", "Reason", "Est. Cost"]
+        # Org-wide scans tag findings with their account
+        if findings.has_accounts():
+            columns.insert(1, "Account")
+            headers.insert(1, "Account")
+        details = details[columns].assign(Cost=details['Cost'].map("${:.2f}".format))
+        print(tabulate(details.itertuples(index=False), headers=headers, tablefmt="simple"))
 
     print(Style.BRIGHT + "\n" + "-"*60)
     print(f" TOTAL POTENTIAL SAVINGS: ${grand_total:.2f} / month")
-    print("-"*60 + "\n")
\ No newline at end of file
+    print("-"*60 + "\n")
+
+def print_timings(timings):
+    print(Fore.YELLOW + "\n  SCAN TIMINGS" + Style.RESET_ALL)
+
+    region_rows = [[region, f"{seconds:.2f}s"] for region, seconds in sorted(timings['regions'].items())]
+    print(tabulate(region_rows, headers=["Region", "Wall Time"], tablefmt="simple"))
+
+    slowest_first = sorted(timings['scanners'].items(), key=lambda x: x[1], reverse=True)
+    scanner_rows = [[region, name, f"{seconds:.2f}s"] for (region, name), seconds in slowest_first]
+    print()
+    print(tabulate(scanner_rows, headers=["Region", "Scanner", "Wall Time"], tablefmt="simple"))
+    print()
+
+def print_client_stats(totals, scan_cache=None):
+    print(Fore.YELLOW + "\n  API CLIENT" + Style.RESET_ALL)
+    print(f" Calls: {totals['calls']}  Pages: {totals['pages']}  Retries: {totals['retries']}  "
+          f"Throttles: {totals['throttles']}  Dropped: {totals['drops']}")
+    if scan_cache:
+        print(f" Cache hits: {scan_cache.hits}  misses: {scan_cache.misses}  ({scan_cache.path})")
+    if totals['drops']:
+        print(Fore.RED + " Some findings were dropped after retries ran out; the report may be incomplete." + Style.RESET_ALL)
+    print()
+
+def print_diff(diff, scan_inventory=None):
+    print(Fore.YELLOW + "\n  CHANGES SINCE LAST SCAN" + Style.RESET_ALL)
+    print(f" New: {len(diff['new'])}  Resolved: {len(diff['resolved'])}  Unchanged: {len(diff['unchanged'])}")
+    if scan_inventory:
+        print(f" Verdicts reused: {scan_inventory.reused}  re-checked: {scan_inventory.checked}  "
+              f"pruned: {getattr(scan_inventory, 'pruned', 0)}")
+    rows = [["+", d['Service'], d['Region'], d['ID'], f"${d['Cost']:.2f}"] for d in diff['new']]
+    rows += [["-", d['Service'], d['Region'], d['ID'], f"${d['Cost']:.2f}"] for d in diff['resolved']]
+    if rows:
+        print(tabulate(rows, headers=["", "Service", "Region", "Resource ID", "Est. Cost"], tablefmt="simple"))
+    print(f" Diff written to {diff['path']}")
+    print()
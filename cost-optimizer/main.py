@@ -1,85 +1,195 @@
+import argparse
+import threading
+from types import SimpleNamespace
 import boto3
-from dashboard import generate_dashboard
-
-from services.vpc import scan_vpc
-from services.ebs import scan_ebs
-from services.elastic_ip import scan_eip
-from services.alb import scan_alb
-from services.snapshot import scan_snapshots
-from services.rds import scan_rds
-from services.nat_gateway import scan_nat
-from services.s3 import scan_s3
-from services.ec2 import scan_ec2
-from services.eks import scan_eks
+from dashboard import generate_dashboard, print_timings, print_client_stats, print_diff
 
+from services.regions import get_enabled_regions, scan_regions
+from services.accounts import list_org_accounts, scan_accounts
+from services.registry import SCANS
+from services.scheduler import ScanScheduler
+from services.findings import FindingsTable
+from services.client import STATS
+from services import cache, inventory, s3_inventory
+from services.export import Exports, FORMATS
+from services.history import History
+from services.telemetry import TELEMETRY, Profiler
+from services.scan_client import ScanClient, timings_from_job
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AWS Cost Optimizer")
+    parser.add_argument('--region', default='ap-south-1', help="Region to scan (default: ap-south-1)")
+    parser.add_argument('--all-regions', action='store_true', help="Scan every region enabled for the account")
+    parser.add_argument('--workers', type=int, default=16, help="Initial concurrent API calls (adapts to throttling)")
+    parser.add_argument('--deadline', type=float, help="Stop scanning after this many seconds and report what was found")
+    parser.add_argument('--no-cache', action='store_true', help="Always call AWS; skip the on-disk scan cache")
+    parser.add_argument('--max-cache-age', type=float, help="Use cached responses fresher than this many seconds (default: per-type TTLs)")
+    parser.add_argument('--clear-cache', action='store_true', help="Empty the scan cache before scanning")
+    parser.add_argument('--incremental', action='store_true', help="Re-check only new or changed resources and write a diff against the last run")
+    parser.add_argument('--max-verdict-age', type=float, default=24, help="Re-check unchanged resources after this many hours (default: 24)")
+    parser.add_argument('--s3-inventory', help="Directory (or manifest.json) of S3 Inventory reports to size buckets from")
+    parser.add_argument('--org', action='store_true', help="Scan every member account of the AWS Organization")
+    parser.add_argument('--accounts', help="Comma-separated account IDs to scan (implies --org)")
+    parser.add_argument('--role-name', default='OrganizationAccountAccessRole', help="Role to assume in each account")
+    parser.add_argument('--account-workers', type=int, default=4, help="Max concurrent API calls within one account")
+    parser.add_argument('--no-history', action='store_true', help="Don't record this scan in outputs/history.sqlite")
+    parser.add_argument('--export', action='append', choices=list(FORMATS), default=[],
+                        help="Stream findings to outputs/ as they arrive (repeatable: ndjson, parquet, arrow)")
+    parser.add_argument('--profile', metavar='PATH', help="Profile the scan (all threads) and write pstats to PATH")
+    parser.add_argument('--metrics', metavar='PATH', help="Write scan metrics to PATH in the Prometheus text format")
+    parser.add_argument('--server', help="Run the scan on a scan service (scan_server.py) at this URL instead of locally")
+    return parser.parse_args()
+
+def spec_from_args(args):
+    return {
+        'region': args.region,
+        'all_regions': args.all_regions,
+        'org': args.org,
+        'accounts': args.accounts.split(',') if args.accounts else None,
+        'role_name': args.role_name,
+        'account_workers': args.account_workers,
+        'workers': args.workers,
+        'deadline': args.deadline,
+        'use_cache': not args.no_cache,
+        'max_cache_age': args.max_cache_age,
+        'incremental': args.incremental,
+        'max_verdict_age': args.max_verdict_age,
+        's3_inventory': args.s3_inventory,
+        'history': not args.no_history,
+    }
+
+def run_remote(args, on_done, exports):
+    client = ScanClient(args.server)
+    submitted = client.submit(spec_from_args(args))
+    job = submitted['job']
+    if submitted['deduped']:
+        print(f"\n Joining scan {job['id']} already {job['status']} on {args.server}...")
+    else:
+        print(f"\n Submitted scan {job['id']} ({job['total']} scanners) to {args.server}...")
+
+    findings, job = client.findings(job['id'], on_done=on_done, on_page=exports.on_page)
+    if job['status'] != 'done':
+        print(f" Scan {job['status']}: {job.get('error') or 'partial results'}")
+
+    generate_dashboard(findings)
+    result = job.get('result') or {}
+    timings = timings_from_job(job)
+    if timings:
+        print_timings(timings)
+    if 'stats' in result:
+        print_client_stats(result['stats'])
+    if 'diff' in result:
+        print_diff(result['diff'], SimpleNamespace(**result['verdicts']))
+
+# Returns the scan's FindingsTable, or None for --server runs and failed scans
 def main():
-    region = 'ap-south-1'
-    
-    print(f"\n Connecting to AWS ({region})... This may take a moment...")
+    args = parse_args()
 
+    print_lock = threading.Lock()
+
+    def on_done(region, name, seconds, error):
+        with print_lock:
+            if error:
+                print(f"   ... {name} [{region}] FAILED: {error}")
+            else:
+                print(f"   ... Scanned {name} [{region}] in {seconds:.1f}s")
+
+    exports = None
+    findings = None
+    profiler = Profiler().start() if args.profile else None
     try:
-     
-        
-        ec2 = boto3.client('ec2', region_name=region)
-        elb = boto3.client('elbv2', region_name=region)
-        cw = boto3.client('cloudwatch', region_name=region)
-        rds = boto3.client('rds', region_name=region)
-        s3 = boto3.client('s3', region_name=region)
-        s3 = boto3.client('s3', region_name=region)
-        eks = boto3.client('eks', region_name=region)
-
-    
-        print("   ... Scanning EBS Volumes")
-        ebs_data = scan_ebs(ec2)
-        
-        print("   ... Scanning Elastic IPs")
-        eip_data = scan_eip(ec2)
-        
-        print("   ... Scanning Load Balancers")
-        alb_data = scan_alb(elb, cw)
-        
-        print("   ... Scanning NAT Gateways")
-        nat_data = scan_nat(ec2, cw)
-        
-        print("   ... Scanning Snapshots")
-        snap_data = scan_snapshots(ec2)
-        
-        print("   ... Scanning RDS")
-        rds_data = scan_rds(rds)
-        
-        print("   ... Scanning S3")
-        s3_data = scan_s3(s3)
-        
-        print("   ... Scanning EC2 ")
-        ec2_data = scan_ec2(ec2, cw)
-
-        print("   ... Scanning EKS Clusters") 
-        eks_data = scan_eks(eks)
-
-        print("   ... Scanning VPCs & Public IPs")
-        vpc_data = scan_vpc(ec2)
-
-      
-        cloud_data = {
-            'EBS Volumes': ebs_data,
-            'Elastic IPs': eip_data,
-            'Load Balancers': alb_data,
-            'NAT Gateways': nat_data,
-            'Snapshots': snap_data,
-            'RDS Instances': rds_data,
-            'S3 Buckets': s3_data,
-            'EC2 Instances': ec2_data,
-            'EKS Clusters' :eks_data,
-            'VPC & Public IPs': vpc_data
-        }
-
-    
-        generate_dashboard(cloud_data)
+        exports = Exports(args.export)
+
+        if args.server:
+            run_remote(args, on_done, exports)
+            return
+
+        session = boto3.Session()
+
+        if not args.no_cache:
+            scan_cache = cache.configure(max_age=args.max_cache_age)
+            if args.clear_cache:
+                scan_cache.clear()
+            scan_cache.prune()
+
+        if args.s3_inventory:
+            s3_inventory.configure(args.s3_inventory)
+
+        if args.incremental:
+            inventory.configure(max_age=args.max_verdict_age * 3600)
+
+        if args.all_regions:
+            print("\n Discovering enabled regions...")
+            regions = get_enabled_regions(session, args.region)
+        else:
+            regions = [args.region]
+
+        print(f"\n Connecting to AWS ({', '.join(regions)})... This may take a moment...")
+
+        def on_account_done(account, region, name, seconds, error):
+            on_done(f"{account}/{region}", name, seconds, error)
+
+        if args.org or args.accounts:
+            accounts = args.accounts.split(',') if args.accounts else list_org_accounts(session)
+            print(f" Scanning {len(accounts)} accounts as role '{args.role_name}'...")
+
+            # Pages stream in from every account; merge them into one report
+            findings = FindingsTable(scan['name'] for scan in SCANS)
+            scheduler = ScanScheduler(concurrency=args.workers, per_key=args.account_workers, deadline=args.deadline)
+            stream = scan_accounts(
+                accounts, args.role_name, regions, session=session,
+                on_done=on_account_done, scheduler=scheduler
+            )
+            for account, region, name, page in stream:
+                findings.add(name, page)
+                exports.on_page(region, name, page)
+
+            generate_dashboard(findings)
+        else:
+            accounts = [None]
+            scheduler = ScanScheduler(concurrency=args.workers, deadline=args.deadline)
+            findings, timings = scan_regions(
+                regions, session=session, on_page=exports.on_page, on_done=on_done, scheduler=scheduler
+            )
+
+            generate_dashboard(findings)
+            print_timings(timings)
+
+        print_client_stats(STATS.totals(), cache.CACHE)
+
+        if args.metrics:
+            with open(args.metrics, 'w') as f:
+                f.write(TELEMETRY.prometheus(STATS))
+            print(f" Metrics written to {args.metrics}")
+
+        if not args.no_history:
+            scan_history = History()
+            scan_history.record(findings)
+            print(f" Scan recorded in {scan_history.path}")
+
+        if args.incremental:
+            inventory.INVENTORY.prune()
+            # A cut-short scan would report everything it missed as resolved
+            if scheduler.complete:
+                if accounts == [None]:
+                    accounts = [session.client('sts').get_caller_identity()['Account']]
+                print_diff(inventory.write_diff(findings, inventory.baseline_path(accounts, regions)), inventory.INVENTORY)
+            else:
+                print(" Scan did not complete; skipped the diff against the last run")
 
     except Exception as e:
+        findings = None
         print(f"\n CRITICAL ERROR IN MAIN: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if profiler:
+            if profiler.stop(args.profile):
+                print(f" Profile written to {args.profile} (python -m pstats {args.profile})")
+        if exports:
+            for path in exports.close():
+                print(f" Findings exported to {path}")
+    return findings
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
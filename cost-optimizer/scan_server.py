@@ -0,0 +1,123 @@
+import argparse
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from services.client import STATS
+from services.jobs import ScanService, JobStore, DEFAULT_PATH
+from services.telemetry import TELEMETRY
+
+# Headless scan service. web_app.py and main.py (--server URL) submit scans
+# here instead of scanning in-process:
+#
+#   POST   /scans                   body: scan options -> {"job": ..., "deduped": bool}
+#   GET    /jobs                    recent jobs
+#   GET    /jobs/latest?key=KEY     newest finished job for a request (see jobs.spec_key)
+#   GET    /jobs/ID                 one job
+#   GET    /jobs/ID/events?since=N  its pages of findings / finished scanners from seq N
+#   DELETE /jobs/ID                 cancel it
+#   GET    /metrics                 Prometheus metrics for the current / last scan
+
+
+class Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send(self, status, body):
+        data = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _job_or_404(self, job_id):
+        job = self.service.store.get(job_id)
+        if job is None:
+            self._send(404, {'error': f"No job {job_id}"})
+        return job
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/scans':
+            return self._send(404, {'error': 'Not found'})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            spec = json.loads(self.rfile.read(length) or b'{}')
+            job, deduped = self.service.submit(spec)
+        except (ValueError, TypeError) as e:
+            return self._send(400, {'error': str(e)})
+        except Exception as e:
+            return self._send(502, {'error': f"Could not plan scan: {e}"})
+        self._send(200 if deduped else 202, {'job': job, 'deduped': deduped})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == '/metrics':
+            data = TELEMETRY.prometheus(STATS).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        if url.path == '/jobs':
+            return self._send(200, {'jobs': self.service.store.recent()})
+
+        if url.path == '/jobs/latest':
+            job = self.service.store.latest(query.get('key', [''])[0])
+            return self._send(200 if job else 404, {'job': job})
+
+        match = re.fullmatch(r'/jobs/(\w+)(/events)?', url.path)
+        if not match:
+            return self._send(404, {'error': 'Not found'})
+        job = self._job_or_404(match.group(1))
+        if job is None:
+            return
+        if not match.group(2):
+            return self._send(200, {'job': job})
+
+        since = int(query.get('since', ['0'])[0])
+        events = self.service.store.events(job['id'], since)
+        next_seq = events[-1]['seq'] + 1 if events else since
+        self._send(200, {'events': events, 'next': next_seq, 'status': job['status']})
+
+    def do_DELETE(self):
+        match = re.fullmatch(r'/jobs/(\w+)', urlparse(self.path).path)
+        if not match:
+            return self._send(404, {'error': 'Not found'})
+        if self._job_or_404(match.group(1)) is None:
+            return
+        self.service.cancel(match.group(1))
+        self._send(200, {'job': self.service.store.get(match.group(1))})
+
+    def log_message(self, format, *args):
+        pass  # Viewers poll events; keep the console for scan progress
+
+
+def make_server(host='127.0.0.1', port=8765, service=None):
+    Handler.service = service or ScanService().start()
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AWS Cost Optimizer scan service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--db', default=DEFAULT_PATH, help="Where jobs and results are kept")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, ScanService(JobStore(args.db)).start())
+    print(f" Scan service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
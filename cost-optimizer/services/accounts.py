@@ -0,0 +1,127 @@
+import boto3
+import queue
+import threading
+from functools import partial
+from botocore.credentials import RefreshableCredentials
+from services.paginate import paginate
+from services.client import wrap
+from services.regions import RegionClients, credentials_session, plan_jobs
+from services.registry import SCANS
+from services.scheduler import ScanScheduler, ScanUnit
+
+
+def list_org_accounts(session=None):
+    """Active member accounts of the caller's AWS Organization."""
+    session = session or boto3.Session()
+    org = session.client('organizations')
+    accounts = []
+    for page in paginate(org, 'list_accounts', 'Accounts'):
+        accounts.extend(a['Id'] for a in page if a['Status'] == 'ACTIVE')
+    return accounts
+
+
+class AccountSessions:
+    """Assumes `role_name` in member accounts and caches one session per
+    account. Credentials are refreshable: botocore renews them shortly
+    before they expire, so long org scans never run on stale tokens."""
+
+    def __init__(self, role_name, session=None, duration=3600):
+        self.role_name = role_name
+        self.duration = duration
+        self.sts = wrap((session or boto3.Session()).client('sts'))
+        self._sessions = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, account_id):
+        # Lock per account, so AssumeRole calls for different accounts overlap
+        with self._lock:
+            account_lock = self._locks.setdefault(account_id, threading.Lock())
+        with account_lock:
+            if account_id not in self._sessions:
+                self._sessions[account_id] = self._assume(account_id)
+            return self._sessions[account_id]
+
+    def _assume(self, account_id):
+        role_arn = f"arn:aws:iam::{account_id}:role/{self.role_name}"
+
+        def fetch():
+            creds = self.sts.assume_role(
+                RoleArn=role_arn,
+                RoleSessionName='cost-optimizer',
+                DurationSeconds=self.duration
+            )['Credentials']
+            return {
+                'access_key': creds['AccessKeyId'],
+                'secret_key': creds['SecretAccessKey'],
+                'token': creds['SessionToken'],
+                'expiry_time': creds['Expiration'].isoformat(),
+            }
+
+        credentials = RefreshableCredentials.create_from_metadata(
+            metadata=fetch(),
+            refresh_using=fetch,
+            method='sts-assume-role'
+        )
+        return credentials_session(credentials)
+
+
+def scan_accounts(accounts, role_name, regions, session=None, max_workers=32,
+                  per_account=4, scans=SCANS, on_done=None, deadline=None, scheduler=None):
+    """Run every scanner for every (account x region) and stream the results.
+
+    Yields (account_id, region, name, page) as pages of findings arrive, each
+    finding tagged with its "Account" and "Region". The scheduler caps
+    concurrency overall (adapting to throttling) and at `per_account` calls
+    within one account, which keeps each account under its API rate limits.
+    on_done(account_id, region, name, seconds, error) fires per scanner.
+    """
+    sessions = AccountSessions(role_name, session)
+    scheduler = scheduler or ScanScheduler(concurrency=max_workers, per_key=per_account, deadline=deadline)
+    clients = {}
+    clients_lock = threading.Lock()
+    pages = queue.Queue()
+    DONE = object()
+
+    def region_clients(account_id, region, scan):
+        # Built lazily inside the scheduler, so a failed AssumeRole only
+        # fails that account's scanners
+        session = sessions.get(account_id)
+        with clients_lock:
+            key = (account_id, region)
+            if key not in clients:
+                clients[key] = RegionClients(region, session, account_id)
+            region_clients = clients[key]
+        return region_clients.args(scan)
+
+    units = []
+    for account_id in accounts:
+        for region, scan in plan_jobs(regions, scans):
+            tags = {'Account': account_id, 'Region': 'global' if scan.get('global') else region}
+            get_args = partial(region_clients, account_id, region, scan)
+            units.append(ScanUnit(scan, get_args, tags, key=account_id))
+
+    def page_done(unit, page):
+        pages.put((unit.tags['Account'], unit.tags['Region'], unit.name, page))
+
+    def unit_done(unit, seconds, error):
+        if on_done:
+            on_done(unit.tags['Account'], unit.tags['Region'], unit.name, seconds, error)
+
+    def run():
+        try:
+            scheduler.run(units, on_page=page_done, on_done=unit_done)
+        finally:
+            pages.put(DONE)
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is DONE:
+                break
+            yield item
+    finally:
+        # Stop the scan if the consumer walks away early
+        scheduler.cancel()
@@ -1,50 +1,112 @@
 import boto3
-from datetime import datetime, timedelta
+from functools import partial
+from services.pricing import get_price
+from services.metrics import MetricsEngine
+from services.paginate import paginate, drain
+from services.client import wrap
+from services.findings import Finding
+from services import inventory
 
 
 class ALBScanner():
-    def __init__(self, elb_client, cw_client):
-        self.client = elb_client
-        self.cw_client = cw_client
+    def __init__(self, elb_client, cw_client, metrics=None):
+        self.client = wrap(elb_client)
+        self.cw_client = wrap(cw_client)
+        self.metrics = metrics or MetricsEngine(cw_client)
+        self.inventory = inventory.INVENTORY
+        self.scope = inventory.scope_of(self.client)
 
-    def get_idle_albs(self):
-        # 1. Fetch all ALBs
-        response = self.client.describe_load_balancers()
-        albs = response.get('LoadBalancers', [])
-        idle_list = []
+    def iter_idle_albs(self):
+        # 1. Fetch ALBs one page at a time
+        for albs in paginate(self.client, 'describe_load_balancers', 'LoadBalancers'):
+            queued = []
+            reused = []
+
+            for alb in albs:
+                plan = self._plan(alb)
+                if isinstance(plan, list):
+                    reused.extend(plan)
+                else:
+                    queued.append(plan)
+
+            yield reused + self._evaluate(queued)
+
+        if self.inventory:
+            self.inventory.listed(self.scope, 'alb')
+
+    def alb_tasks(self):
+        # One task per load balancer, their queries batched on first read
+        tasks = []
+        for albs in paginate(self.client, 'describe_load_balancers', 'LoadBalancers'):
+            for alb in albs:
+                plan = self._plan(alb)
+                tasks.append(partial(list, plan) if isinstance(plan, list) else partial(self._evaluate, [plan]))
+        if self.inventory:
+            self.inventory.listed(self.scope, 'alb')
+        return tasks
+
+    def _plan(self, alb):
+        # Unchanged ALBs (same state, name, subnets and price) keep their
+        # last verdict on incremental scans
+        stamp = inventory.fingerprint(
+            alb.get('State', {}).get('Code'), alb.get('Scheme'), alb.get('CreatedTime'), alb.get('LoadBalancerName'),
+            sorted(zone.get('SubnetId') or '' for zone in alb.get('AvailabilityZones', [])),
+            get_price('alb', self.client.region)
+        )
+        if self.inventory:
+            hit, verdict = self.inventory.lookup(self.scope, 'alb', alb['LoadBalancerArn'], stamp)
+            if hit:
+                return verdict
+
+        # Extracting the correct suffix for ALB metrics
+        # Dimensions usually need the suffix part of the ARN
+        alb_id = alb['LoadBalancerArn'].split('/')[-3:]
+        dimension_value = f"{alb_id[0]}/{alb_id[1]}/{alb_id[2]}"
 
-        for alb in albs:
-            name = alb['LoadBalancerName']
-            # Extracting the correct suffix for ALB metrics
-            # Dimensions usually need the suffix part of the ARN
-            alb_id = alb['LoadBalancerArn'].split('/')[-3:]
-            dimension_value = f"{alb_id[0]}/{alb_id[1]}/{alb_id[2]}"
-
-            # 2. Fetch metrics from CloudWatch
-            metric_data = self.cw_client.get_metric_statistics(
-                Namespace='AWS/ApplicationELB',
-                MetricName='RequestCount',
-                Dimensions=[{'Name': 'LoadBalancer', 'Value': dimension_value}],
-                StartTime=datetime.utcnow() - timedelta(days=1), # Checking last 24h
-                EndTime=datetime.utcnow(),
-                Period=86400, # 24 hours
-                Statistics=['Sum']
-            )
+        # 2. Queue the RequestCount lookup (last 24h) on the shared engine
+        query_id = self.metrics.add_query(
+            'AWS/ApplicationELB', 'RequestCount',
+            [{'Name': 'LoadBalancer', 'Value': dimension_value}],
+            'Sum', days=1
+        )
+        return alb, query_id, stamp
 
+    def _evaluate(self, queued):
+        idle_list = []
+
+        for alb, query_id, stamp in queued:
             # 3. Check if it's a "Zombie"
-            datapoints = metric_data.get('Datapoints', [])
-            
+            datapoints = self.metrics.values(query_id)
+            if datapoints is None:
+                continue
+
             # If no traffic exists in 24 hours, it's idle
-            if not datapoints or datapoints[0].get('Sum', 0) == 0:
-                item = {
-                    "ID": alb['LoadBalancerArn'].split('/')[-1],
-                    "Name": name,
-                    "Cost": 18.25
-                }
-                idle_list.append(item)
+            verdict = []
+            if sum(datapoints) == 0:
+                item = Finding(
+                    alb['LoadBalancerArn'].split('/')[-1],
+                    f"Idle ALB {alb['LoadBalancerName']} (no requests in 24h)",
+                    get_price('alb', self.client.region)
+                )
+                verdict.append(item)
+
+            if self.inventory:
+                self.inventory.record(self.scope, 'alb', alb['LoadBalancerArn'], stamp, verdict)
+            idle_list.extend(verdict)
 
         return idle_list
 
-def scan_alb(elb_client, cw_client):
-    scanner = ALBScanner(elb_client, cw_client)
-    return scanner.get_idle_albs()
\ No newline at end of file
+    def get_idle_albs(self):
+        return drain(self.iter_idle_albs())
+
+def scan_alb(elb_client, cw_client, metrics=None):
+    scanner = ALBScanner(elb_client, cw_client, metrics)
+    return scanner.get_idle_albs()
+
+def stream_alb(elb_client, cw_client, metrics=None):
+    scanner = ALBScanner(elb_client, cw_client, metrics)
+    return scanner.iter_idle_albs()
+
+def split_alb(elb_client, cw_client, metrics=None):
+    scanner = ALBScanner(elb_client, cw_client, metrics)
+    return scanner.alb_tasks()
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs', 'scan_cache.sqlite'
+)
+
+# Seconds an entry stays fresh, per resource type
+TTLS = {
+    'snapshots': 3600,
+    'metrics': 900,
+    'volumes': 900,
+    'instances': 600,
+    'load_balancers': 900,
+    'nat_gateways': 900,
+    'network': 900,
+    'databases': 900,
+    'clusters': 3600,
+    'buckets': 3600,
+    'objects': 3600,
+    'default': 600,
+}
+
+API_TYPES = {
+    'DescribeSnapshots': 'snapshots',
+    'GetMetricData': 'metrics',
+    'DescribeVolumes': 'volumes',
+    'DescribeInstances': 'instances',
+    'DescribeLoadBalancers': 'load_balancers',
+    'DescribeNatGateways': 'nat_gateways',
+    'DescribeNetworkInterfaces': 'network',
+    'DescribeVpcs': 'network',
+    'DescribeAddresses': 'network',
+    'DescribeDBInstances': 'databases',
+    'ListClusters': 'clusters',
+    'ListBuckets': 'buckets',
+    'ListObjectsV2': 'objects',
+}
+
+# Only read-only calls are ever cached
+CACHEABLE_PREFIXES = ('Describe', 'List', 'Get')
+
+# Cached per query by MetricsEngine instead of per request: a request packs
+# whichever queries the scanners had queued, under ids numbered in queue
+# order, so under the parallel scheduler whole requests almost never repeat
+PER_QUERY = ('GetMetricData',)
+
+
+class ScanCache:
+    """SQLite cache of AWS responses keyed by account, region, API and
+    parameters. An entry is served while it is younger than the TTL for its
+    resource type, or younger than `max_age` seconds when that is set."""
+
+    def __init__(self, path=DEFAULT_PATH, ttls=None, max_age=None):
+        self.path = path
+        self.ttls = dict(TTLS, **(ttls or {}))
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._count_lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, api TEXT NOT NULL, created REAL NOT NULL, value BLOB NOT NULL)"
+        )
+
+    def _connect(self):
+        # sqlite3 connections can't be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def cacheable(self, api):
+        return api.startswith(CACHEABLE_PREFIXES) and api not in PER_QUERY
+
+    def ttl(self, api):
+        if self.max_age is not None:
+            return self.max_age
+        return self.ttls.get(API_TYPES.get(api, 'default'), self.ttls['default'])
+
+    def key(self, account, region, api, params, page=0):
+        params = dict(params)
+        # Metric windows slide with the clock; key them on their length
+        if 'StartTime' in params and 'EndTime' in params:
+            params['Window'] = (params.pop('EndTime') - params.pop('StartTime')).total_seconds() // 60
+        params.pop('PaginationConfig', None)
+        raw = json.dumps([account, region, api, params, page], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def metric_key(self, account, region, metric_stat, days):
+        """Key for one metric query: what it measures and how far back, not
+        its Id or the request it was sent in."""
+        return self.key(account, region, 'GetMetricData', {'MetricStat': metric_stat, 'Days': days})
+
+    def get(self, key, api):
+        row = self._connect().execute(
+            "SELECT created, value FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or time.time() - row[0] > self.ttl(api):
+            with self._count_lock:
+                self.misses += 1
+            return False, None
+        with self._count_lock:
+            self.hits += 1
+        return True, pickle.loads(row[1])
+
+    def put(self, key, api, value):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO entries (key, api, created, value) VALUES (?, ?, ?, ?)",
+            (key, api, time.time(), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        )
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries")
+
+    def prune(self):
+        """Drop entries older than the longest TTL."""
+        oldest = time.time() - max(self.ttls.values())
+        self._connect().execute("DELETE FROM entries WHERE created < ?", (oldest,))
+
+
+CACHE = None
+
+
+def configure(path=DEFAULT_PATH, ttls=None, max_age=None):
+    """Turn on the cache for clients built by RegionClients."""
+    global CACHE
+    CACHE = ScanCache(path, ttls, max_age)
+    return CACHE
+
+
+def disable():
+    global CACHE
+    CACHE = None
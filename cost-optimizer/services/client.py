@@ -0,0 +1,329 @@
+import random
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+import botocore.session
+import jmespath
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError
+from services.telemetry import TELEMETRY
+
+# Error codes AWS uses to say "slow down"
+THROTTLE_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottled',
+    'RequestLimitExceeded', 'TooManyRequestsException', 'SlowDown',
+    'RequestThrottledException', 'ProvisionedThroughputExceededException',
+}
+
+# Server-side blips that are worth another try
+TRANSIENT_CODES = {'InternalError', 'InternalFailure', 'ServiceUnavailable', 'RequestTimeout'}
+
+# Requests per second and burst per (region, API). Anything not listed
+# uses DEFAULT_RATE; tune with set_rate().
+DEFAULT_RATE = (20.0, 40)
+RATES = {
+    'GetMetricData': (10.0, 20),
+    'ListObjectsV2': (50.0, 100),
+    'DescribeSnapshots': (10.0, 20),
+    'AssumeRole': (10.0, 20),
+}
+
+MAX_ATTEMPTS = 8
+# Throttles get more (and by then MAX_DELAY-spaced) tries before a call gives
+# up: paginators resume from their last token, so waiting costs no repeat calls
+THROTTLE_ATTEMPTS = 12
+BASE_DELAY = 0.2
+MAX_DELAY = 20.0
+
+
+def is_throttle(error):
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in THROTTLE_CODES
+
+
+def is_retryable(error):
+    if isinstance(error, BotoConnectionError):
+        return True
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in THROTTLE_CODES | TRANSIENT_CODES
+    return False
+
+
+def gives_up(error, attempt):
+    """True if `error` on try number `attempt` (from 0) should be raised."""
+    if not is_retryable(error):
+        return True
+    return attempt >= (THROTTLE_ATTEMPTS if is_throttle(error) else MAX_ATTEMPTS) - 1
+
+
+def backoff(attempt):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ClientStats:
+    """Thread-safe counters for calls, pages, retries, throttles and drops,
+    keyed by "region:API" (drops are keyed by the scanner that lost them)."""
+
+    KINDS = ('calls', 'pages', 'retries', 'throttles', 'drops')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {kind: Counter() for kind in self.KINDS}
+
+    def record(self, kind, key, count=1):
+        with self._lock:
+            self.counters[kind][key] += count
+
+    def totals(self):
+        with self._lock:
+            return {kind: sum(counter.values()) for kind, counter in self.counters.items()}
+
+    def snapshot(self):
+        with self._lock:
+            return {kind: dict(counter) for kind, counter in self.counters.items()}
+
+
+STATS = ClientStats()
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_local = threading.local()
+
+
+def set_rate(api, rate, burst):
+    """Override the token bucket rate for one API (applies to new buckets)."""
+    RATES[api] = (rate, burst)
+
+
+def get_bucket(region, api):
+    with _buckets_lock:
+        key = (region, api)
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(*RATES.get(api, DEFAULT_RATE))
+        return _buckets[key]
+
+
+def throttle_events():
+    """Throttles seen by the current thread since the last call; lets the
+    scheduler's adaptive limit react even when a retry succeeded."""
+    count = getattr(_local, 'throttles', 0)
+    _local.throttles = 0
+    return count
+
+
+def record_drop(source, error, count=1):
+    """Note findings lost to an error a scanner could not recover from."""
+    STATS.record('drops', source, count)
+    print(f"  Dropped {count} from {source}: {error}")
+
+
+def _note_retry(stats, key, error):
+    stats.record('retries', key)
+    if is_throttle(error):
+        stats.record('throttles', key)
+        _local.throttles = getattr(_local, 'throttles', 0) + 1
+
+
+class ResilientClient:
+    """Wraps a boto3 client. Every API call (and every paginator page) waits
+    on a token bucket for its (region, API), retries throttling and transient
+    errors with jittered exponential backoff, and is counted in STATS.
+    With a ScanCache, fresh cached responses are served without a call.
+    Each attempt's latency and response size go to TELEMETRY."""
+
+    def __init__(self, client, stats=STATS, account=None, cache=None):
+        self._client = client
+        self._stats = stats
+        self.region = client.meta.region_name
+        self.meta = client.meta
+        self.account = account
+        self.cache = cache
+        # Clients get wrapped again (by each scanner, by the cache), so the
+        # byte counter is registered once per raw client, not per wrapper
+        client.meta.events.register('before-parse', self._count_bytes, unique_id='cost-optimizer-bytes')
+
+    def _count_bytes(self, operation_model, response_dict, **kwargs):
+        body = response_dict.get('body')
+        if isinstance(body, bytes):
+            TELEMETRY.count('api_response_bytes', len(body), region=self.region, api=operation_model.name)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        api = self._client.meta.method_to_api_mapping.get(name)
+        if api is None or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self._call(api, attr, *args, **kwargs)
+        return call
+
+    def _call(self, api, method, *args, **kwargs):
+        cache_key = None
+        if self.cache and self.cache.cacheable(api):
+            cache_key = self.cache.key(self.account, self.region, api, kwargs)
+            hit, response = self.cache.get(cache_key, api)
+            if hit:
+                return response
+
+        key = f"{self.region}:{api}"
+        bucket = get_bucket(self.region, api)
+        attempt = 0
+        while True:
+            bucket.acquire()
+            self._stats.record('calls', key)
+            try:
+                with TELEMETRY.span('api_call_seconds', region=self.region, api=api):
+                    response = method(*args, **kwargs)
+                if cache_key:
+                    self.cache.put(cache_key, api, response)
+                return response
+            except Exception as e:
+                if gives_up(e, attempt):
+                    raise
+                _note_retry(self._stats, key, e)
+                time.sleep(backoff(attempt))
+                attempt += 1
+
+    def get_paginator(self, operation):
+        api = self._client.meta.method_to_api_mapping[operation]
+        return ResilientPaginator(self, self._client.get_paginator(operation), api)
+
+
+class ResilientPaginator:
+    def __init__(self, client, paginator, api):
+        self._client = client
+        self._paginator = paginator
+        self._api = api
+
+    def _model(self):
+        service_model = self._client.meta.service_model
+        return paginator_model(service_model.service_name, service_model.api_version, self._api)
+
+    def paginate(self, **kwargs):
+        client = self._client
+        cache = client.cache if client.cache and client.cache.cacheable(self._api) else None
+
+        def page_key(index):
+            return cache.key(client.account, client.region, self._api, kwargs, page=index)
+
+        # Serve the listing from the cache while its pages are fresh; each
+        # page is stored with a flag marking the last one
+        index = 0
+        if cache:
+            while True:
+                hit, value = cache.get(page_key(index), self._api)
+                if not hit:
+                    break
+                page, last = value
+                index += 1
+                yield page
+                if last:
+                    return
+
+        # Live pages, skipping any the cache already delivered
+        for position, page, last in self._live_pages(kwargs):
+            if cache:
+                cache.put(page_key(position), self._api, (page, last))
+            if position >= index:
+                yield page
+
+    def _live_pages(self, kwargs):
+        # On a retryable error the page iterator is dead, so start a new one
+        # from the last resume token instead of from the first page again
+        key = f"{self._client.region}:{self._api}"
+        bucket = get_bucket(self._client.region, self._api)
+        stats = self._client._stats
+        token = None
+        attempt = 0
+        position = 0
+
+        while True:
+            config = dict(kwargs.get('PaginationConfig') or {})
+            if token:
+                config['StartingToken'] = token
+            pages = self._paginator.paginate(**dict(kwargs, PaginationConfig=config))
+            iterator = iter(pages)
+
+            while True:
+                bucket.acquire()
+                start = time.perf_counter()
+                try:
+                    page = next(iterator)
+                except StopIteration:
+                    return
+                except Exception as e:
+                    stats.record('calls', key)
+                    TELEMETRY.observe('api_call_seconds', time.perf_counter() - start,
+                                      region=self._client.region, api=self._api)
+                    if gives_up(e, attempt):
+                        raise
+                    _note_retry(stats, key, e)
+                    time.sleep(backoff(attempt))
+                    attempt += 1
+                    break
+
+                attempt = 0
+                stats.record('calls', key)
+                stats.record('pages', key)
+                TELEMETRY.observe('api_call_seconds', time.perf_counter() - start,
+                                  region=self._client.region, api=self._api)
+                token = resume_token(pages, page, self._model())
+                yield position, page, token is None
+                position += 1
+
+
+@lru_cache(maxsize=None)
+def paginator_model(service, api_version, api):
+    """botocore's pagination config (input/output tokens) for one API."""
+    model = botocore.session.get_session().get_paginator_model(service, api_version)
+    return model.get_paginator(api)
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def resume_token(pages, page, model):
+    """StartingToken for the page after `page`, or None after the last one.
+    botocore only fills in PageIterator.resume_token when MaxItems truncates,
+    so read the output tokens off the page and hand them to its setter."""
+    more_results = model.get('more_results')
+    if more_results and not jmespath.search(more_results, page):
+        return None
+    values = [jmespath.search(expr, page) for expr in _as_list(model['output_token'])]
+    if all(value is None for value in values):
+        return None
+    pages.resume_token = dict(zip(_as_list(model['input_token']), values))
+    return pages.resume_token
+
+
+def wrap(client, account=None, cache=None):
+    """Wrap a boto3 client once; already-wrapped clients pass through."""
+    if client is None or isinstance(client, ResilientClient):
+        return client
+    return ResilientClient(client, account=account, cache=cache)
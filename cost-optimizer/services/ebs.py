@@ -1,30 +1,42 @@
 import boto3
 from services.pricing import get_ebs_price
+from services.paginate import paginate, drain
+from services.client import wrap
+from services.findings import Finding
 
 class EBSScanner:
     def __init__(self, ec2_client):
-        self.ec2 = ec2_client
+        self.ec2 = wrap(ec2_client)
+
+    def iter_orphan_volumes(self):
+        pages = paginate(self.ec2, 'describe_volumes', 'Volumes',
+                         Filters=[{'Name': 'status', 'Values': ['available']}])
+
+        for volumes in pages:
+            orphans = []
+
+            for vol in volumes:
+                v_id = vol['VolumeId']
+                size = vol['Size']
+                v_type = vol['VolumeType']
+
+                real_cost = get_ebs_price(size, v_type, self.ec2.region)
+
+                orphans.append(Finding(
+                    v_id,
+                    f"Unattached Volume ({size} GB)",
+                    real_cost
+                ))
+
+            yield orphans
 
     def get_orphan_volumes(self):
-        response = self.ec2.describe_volumes(Filters=[{'Name': 'status', 'Values': ['available']}])
-        orphans = []
-
-        for vol in response['Volumes']:
-            v_id = vol['VolumeId']
-            size = vol['Size']
-            v_type = vol['VolumeType']
-            
-            real_cost = get_ebs_price(size, v_type)
-
-            orphans.append({
-                "ID": v_id,
-                "Reason": "Unattached Volume",
-                "Size": size,
-                "Cost": real_cost
-            })
-        
-        return orphans
+        return drain(self.iter_orphan_volumes())
 
 def scan_ebs(ec2_client):
     scanner = EBSScanner(ec2_client)
-    return scanner.get_orphan_volumes()
\ No newline at end of file
+    return scanner.get_orphan_volumes()
+
+def stream_ebs(ec2_client):
+    scanner = EBSScanner(ec2_client)
+    return scanner.iter_orphan_volumes()
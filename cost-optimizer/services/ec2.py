@@ -1,63 +1,141 @@
 import boto3
-from datetime import datetime, timedelta
-from services.pricing import get_ec2_price
+from functools import partial
+from services.pricing import get_ec2_price, get_price
+from services.metrics import MetricsEngine
+from services.paginate import paginate, drain
+from services.client import wrap
+from services.findings import Finding
+from services import inventory
 
 class EC2Scanner:
-    def __init__(self, ec2_client, cw_client):
-        self.ec2 = ec2_client
-        self.cw = cw_client
+    def __init__(self, ec2_client, cw_client, metrics=None):
+        self.ec2 = wrap(ec2_client)
+        self.cw = wrap(cw_client)
+        self.metrics = metrics or MetricsEngine(cw_client)
+        self.inventory = inventory.INVENTORY
+        self.scope = inventory.scope_of(self.ec2)
 
-    def get_ec2_waste(self):
-        response = self.ec2.describe_instances()
+    def iter_ec2_waste(self):
+        for reservations in paginate(self.ec2, 'describe_instances', 'Reservations'):
+            # Queue a CPU lookup for every running instance on this page.
+            # Stopped instances need no metrics, so they are flagged right away.
+            queued = []
+            reused = []
+            for reservation in reservations:
+                for instance in reservation['Instances']:
+                    plan = self._plan(instance)
+                    if isinstance(plan, list):
+                        reused.extend(plan)
+                    elif plan:
+                        queued.append(plan)
+
+            yield reused + self._evaluate(queued)
+
+        if self.inventory:
+            self.inventory.listed(self.scope, 'ec2')
+
+    def instance_tasks(self):
+        # One task per instance (CPU queries all queued up front, so the
+        # first task to read one resolves them in shared batches)
+        tasks = []
+        for reservations in paginate(self.ec2, 'describe_instances', 'Reservations'):
+            for reservation in reservations:
+                for instance in reservation['Instances']:
+                    plan = self._plan(instance)
+                    if isinstance(plan, list):
+                        tasks.append(partial(list, plan))
+                    elif plan:
+                        tasks.append(partial(self._evaluate, [plan]))
+        if self.inventory:
+            self.inventory.listed(self.scope, 'ec2')
+        return tasks
+
+    def _plan(self, instance):
+        # The reused verdict (a list), an (instance, query_id, stamp) entry
+        # for _evaluate, or None for instances that are neither running nor stopped
+        state = instance['State']['Name']
+
+        if state == 'running':
+            # Incremental scans reuse the last verdict for an instance whose
+            # state, type, launch, price and attachments are unchanged
+            stamp = inventory.fingerprint(
+                state, instance['InstanceType'], instance.get('LaunchTime'),
+                get_ec2_price(instance['InstanceType'], self.ec2.region), _attachments(instance)
+            )
+            if self.inventory:
+                hit, verdict = self.inventory.lookup(self.scope, 'ec2', instance['InstanceId'], stamp)
+                if hit:
+                    return verdict
+
+            query_id = self.metrics.add_query(
+                'AWS/EC2', 'CPUUtilization',
+                [{'Name': 'InstanceId', 'Value': instance['InstanceId']}],
+                'Average', days=7
+            )
+            return instance, query_id, stamp
+        if state == 'stopped':
+            return instance, None, None
+        return None
+
+    def _evaluate(self, queued):
         waste_list = []
 
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                
-                instance_id = instance['InstanceId']
-                state = instance['State']['Name']
-                inst_type = instance['InstanceType']
-                
-                # CASE 1: Stopped Instance (Paying for EBS only usually, but let's flag it)
-                if state == 'stopped':
-                    item = {
-                        "ID": instance_id,
-                        "Reason": "Stopped Instance",
-                        "Cost": 2.00 # Nominal EBS cost estimate
-                    }
-                    waste_list.append(item)
-                    continue
-
-                # CASE 2: Zombie Instance (Running but Idle)
-                if state == 'running':
-                    try:
-                        metric = self.cw.get_metric_statistics(
-                            Namespace='AWS/EC2',
-                            MetricName='CPUUtilization',
-                            Dimensions=[{'Name': 'InstanceId', 'Value': instance_id}],
-                            StartTime=datetime.utcnow() - timedelta(days=7),
-                            EndTime=datetime.utcnow(),
-                            Period=86400,
-                            Statistics=['Average']
-                        )
-                        
-                        datapoints = metric.get('Datapoints', [])
-                        if datapoints:
-                            avg_cpu = datapoints[0]['Average']
-                            if avg_cpu < 1.0:
-                                real_cost = get_ec2_price(inst_type)
-                                item = {
-                                    "ID": instance_id,
-                                    "Reason": f"Zombie {inst_type} (CPU {avg_cpu:.1f}%)",
-                                    "Cost": real_cost
-                                }
-                                waste_list.append(item)
-                    except Exception as e:
-                        print(f"Error checking EC2 {instance_id}: {e}")
-                        continue
-        
+        for instance, query_id, stamp in queued:
+            instance_id = instance['InstanceId']
+            inst_type = instance['InstanceType']
+
+            # CASE 1: Stopped Instance (Paying for EBS only usually, but let's flag it)
+            if query_id is None:
+                item = Finding(
+                    instance_id,
+                    "Stopped Instance",
+                    get_price('stopped_instance', self.ec2.region) # Nominal EBS cost estimate
+                )
+                waste_list.append(item)
+                continue
+
+            # CASE 2: Zombie Instance (Running but Idle)
+            datapoints = self.metrics.values(query_id)
+            if datapoints is None:
+                continue
+
+            verdict = []
+            if datapoints:
+                avg_cpu = sum(datapoints) / len(datapoints)
+                if avg_cpu < 1.0:
+                    real_cost = get_ec2_price(inst_type, self.ec2.region)
+                    item = Finding(
+                        instance_id,
+                        f"Zombie {inst_type} (CPU {avg_cpu:.1f}%)",
+                        real_cost
+                    )
+                    verdict.append(item)
+
+            if self.inventory:
+                self.inventory.record(self.scope, 'ec2', instance_id, stamp, verdict)
+            waste_list.extend(verdict)
+
         return waste_list
 
-def scan_ec2(ec2_client, cw_client):
-    scanner = EC2Scanner(ec2_client, cw_client)
-    return scanner.get_ec2_waste()
\ No newline at end of file
+    def get_ec2_waste(self):
+        return drain(self.iter_ec2_waste())
+
+def _attachments(instance):
+    # Attached volumes and network interfaces, with their attachment state
+    volumes = [(m.get('Ebs', {}).get('VolumeId'), m.get('Ebs', {}).get('Status'))
+               for m in instance.get('BlockDeviceMappings', [])]
+    enis = [(eni.get('NetworkInterfaceId'), eni.get('Attachment', {}).get('Status'))
+            for eni in instance.get('NetworkInterfaces', [])]
+    return volumes, enis
+
+def scan_ec2(ec2_client, cw_client, metrics=None):
+    scanner = EC2Scanner(ec2_client, cw_client, metrics)
+    return scanner.get_ec2_waste()
+
+def stream_ec2(ec2_client, cw_client, metrics=None):
+    scanner = EC2Scanner(ec2_client, cw_client, metrics)
+    return scanner.iter_ec2_waste()
+
+def split_ec2(ec2_client, cw_client, metrics=None):
+    scanner = EC2Scanner(ec2_client, cw_client, metrics)
+    return scanner.instance_tasks()
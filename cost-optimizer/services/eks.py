@@ -1,33 +1,37 @@
 import boto3
+from services.pricing import get_price
+from services.paginate import paginate, drain
+from services.client import wrap, record_drop
+from services.findings import Finding
 
 class EKSScanner:
     def __init__(self, eks_client):
-        self.eks = eks_client
+        self.eks = wrap(eks_client)
 
-    def get_clusters(self):
-        waste = []
-        
+    def iter_clusters(self):
         try:
-            
-            response = self.eks.list_clusters()
-            
-            
-            clusters = response.get('clusters', [])
-            
-           
-            for cluster in clusters:
-                waste.append({
-                    "ID": cluster,
-                    "Reason": "EKS Control Plane (Active)",
-                    "Cost": 72.00  # $0.10/hr * 720 hours
-                })
-                
+            for clusters in paginate(self.eks, 'list_clusters', 'clusters'):
+                waste = []
+
+                for cluster in clusters:
+                    waste.append(Finding(
+                        cluster,
+                        "EKS Control Plane (Active)",
+                        get_price('eks_cluster', self.eks.region)
+                    ))
+
+                yield waste
+
         except Exception as e:
-            print(f"  Error scanning EKS: {e}")
-            return []
+            record_drop('EKS Clusters', e)
 
-        return waste
+    def get_clusters(self):
+        return drain(self.iter_clusters())
 
 def scan_eks(eks_client):
     scanner = EKSScanner(eks_client)
-    return scanner.get_clusters()
\ No newline at end of file
+    return scanner.get_clusters()
+
+def stream_eks(eks_client):
+    scanner = EKSScanner(eks_client)
+    return scanner.iter_clusters()
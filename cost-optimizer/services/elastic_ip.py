@@ -1,27 +1,37 @@
 import boto3 
+from services.pricing import get_price
+from services.paginate import drain
+from services.client import wrap
+from services.findings import Finding
 
 class elastic_ip_scanner(): #Class to scan for unattached elastic IPs
     def __init__(self,client):
-        self.client = client
+        self.client = wrap(client)
     
 
-    def get_elastic_ip(self): #Get the list of elastic IPs
+    def iter_elastic_ip(self): #DescribeAddresses has no paginator, so this is a single page
         list_of_eips = self.client.describe_addresses()['Addresses']
 
         clean_list = []
 
         for eip in list_of_eips: #Loop through the list of elastic IPs
             if 'AssociationId' not in eip: 
-                item = { 
-                    "ID": eip['AllocationId'], 
-                    "Public IP": eip['Public Ip'], 
-                    "Cost": 3.6
-                }
-            
+                item = Finding(
+                    eip['AllocationId'],
+                    f"Unattached Elastic IP {eip['PublicIp']}",
+                    get_price('elastic_ip', self.client.region)
+                )
+                clean_list.append(item) #Append the item to the clean list
+
+        yield clean_list
 
-            clean_list.append(item) #Append the item to the clean list
-        return clean_list #Return the clean list of elastic IPs
+    def get_elastic_ip(self): #Get the list of elastic IPs
+        return drain(self.iter_elastic_ip()) #Return the clean list of elastic IPs
         
 def scan_eip(ec2_client): #Function to scan for unattached elastic IPs
     eip_instance = elastic_ip_scanner(ec2_client)
     return eip_instance.get_elastic_ip()
+
+def stream_eip(ec2_client): #Function to stream unattached elastic IPs
+    eip_instance = elastic_ip_scanner(ec2_client)
+    return eip_instance.iter_elastic_ip()
@@ -0,0 +1,172 @@
+import gzip
+import json
+import os
+import threading
+import time
+
+OUTPUTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
+
+COLUMNS = ['Service', 'Account', 'Region', 'ID', 'Reason', 'Cost', 'ScannedAt']
+FORMATS = {'ndjson': '.ndjson.gz', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Rows buffered per Parquet row group / Arrow record batch
+BATCH_ROWS = 65536
+
+
+class FindingsWriter:
+    """Streams findings to a file as pages arrive. write() may be called
+    from the scan threads; only the current batch is held in memory."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        # Every row of one scan carries the same timestamp, so appended
+        # exports form a queryable scan history
+        self.scanned_at = time.time()
+        self._lock = threading.Lock()
+
+    def write(self, service, page):
+        with self._lock:
+            self._write(service, page)
+            self.rows += len(page)
+
+    def close(self):
+        with self._lock:
+            self._close()
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NdjsonWriter(FindingsWriter):
+    """One JSON object per finding, gzip-compressed."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+        self._encode = json.JSONEncoder(default=str).encode
+
+    def _write(self, service, page):
+        scanned_at = int(self.scanned_at)
+        lines = []
+        for finding in page:
+            lines.append(self._encode({
+                'Service': service, 'Account': finding.account, 'Region': finding.region, 'ID': finding.id,
+                'Reason': finding.reason, 'Cost': finding.cost, 'ScannedAt': scanned_at,
+            }))
+        if lines:
+            self._file.write('\n'.join(lines) + '\n')
+
+    def _close(self):
+        self._file.close()
+
+
+class _ArrowBatchWriter(FindingsWriter):
+    """Buffers findings column by column and hands full batches to pyarrow."""
+
+    def __init__(self, path, batch_rows=BATCH_ROWS):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("Parquet and Arrow exports need pyarrow (pip install pyarrow)")
+        super().__init__(path)
+        self._pa = pa
+        self.batch_rows = batch_rows
+        self.schema = pa.schema([
+            ('Service', pa.string()), ('Account', pa.string()), ('Region', pa.string()),
+            ('ID', pa.string()), ('Reason', pa.string()), ('Cost', pa.float64()),
+            ('ScannedAt', pa.timestamp('s', tz='UTC')),
+        ])
+        self._buffer = {name: [] for name in COLUMNS}
+        self._open()
+
+    def _write(self, service, page):
+        buffer = self._buffer
+        for finding in page:
+            buffer['Service'].append(service)
+            buffer['Account'].append(finding.account)
+            buffer['Region'].append(finding.region)
+            buffer['ID'].append(str(finding.id))
+            buffer['Reason'].append(finding.reason)
+            buffer['Cost'].append(finding.cost)
+        if len(buffer['Cost']) >= self.batch_rows:
+            self._flush()
+
+    def _flush(self):
+        buffer = self._buffer
+        if not buffer['Cost']:
+            return
+        buffer['ScannedAt'] = [int(self.scanned_at)] * len(buffer['Cost'])
+        batch = self._pa.RecordBatch.from_pydict(buffer, schema=self.schema)
+        self._write_batch(batch)
+        self._buffer = {name: [] for name in COLUMNS}
+
+    def _close(self):
+        self._flush()
+        self._writer.close()
+
+
+class ParquetWriter(_ArrowBatchWriter):
+    """Parquet, zstd-compressed, one row group per batch."""
+
+    def _open(self):
+        import pyarrow.parquet as pq
+        self._writer = pq.ParquetWriter(self.path, self.schema, compression='zstd')
+
+    def _write_batch(self, batch):
+        self._writer.write_batch(batch)
+
+
+class ArrowWriter(_ArrowBatchWriter):
+    """Arrow IPC file (Feather v2), zstd-compressed."""
+
+    def _open(self):
+        pa = self._pa
+        self._sink = pa.OSFile(self.path, 'wb')
+        options = pa.ipc.IpcWriteOptions(compression='zstd')
+        self._writer = pa.ipc.new_file(self._sink, self.schema, options=options)
+
+    def _write_batch(self, batch):
+        self._writer.write_batch(batch)
+
+    def _close(self):
+        super()._close()
+        self._sink.close()
+
+
+WRITERS = {'ndjson': NdjsonWriter, 'parquet': ParquetWriter, 'arrow': ArrowWriter}
+
+
+def open_writer(fmt, path=None, outputs=OUTPUTS):
+    """A writer for outputs/findings_<timestamp>.<ext> (or path)."""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format {fmt!r} (expected one of {', '.join(WRITERS)})")
+    if path is None:
+        os.makedirs(outputs, exist_ok=True)
+        path = os.path.join(outputs, f"findings_{time.strftime('%Y%m%d_%H%M%S')}{FORMATS[fmt]}")
+    return WRITERS[fmt](path)
+
+
+class Exports:
+    """Fans each page out to several writers; on_page() matches the scan
+    callbacks' signature."""
+
+    def __init__(self, formats, outputs=OUTPUTS):
+        self.writers = []
+        try:
+            for fmt in formats:
+                self.writers.append(open_writer(fmt, outputs=outputs))
+        except Exception:
+            self.close()
+            raise
+
+    def on_page(self, region, name, page):
+        for writer in self.writers:
+            writer.write(name, page)
+
+    def close(self):
+        return [writer.close() for writer in self.writers]
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from array import array
+
+COLUMNS = ['Service', 'Account', 'Region', 'ID', 'Reason', 'Cost']
+CATEGORIES = ('Service', 'Account', 'Region')
+
+
+class Finding:
+    """One flagged resource, as emitted by every scanner. Slotted, so an
+    org-wide scan holding millions of them pays ~70 bytes each rather than
+    a dict per finding. Region and Account are stamped on by the scheduler."""
+
+    __slots__ = ('id', 'reason', 'cost', 'region', 'account')
+
+    def __init__(self, id, reason, cost, region='-', account='-'):
+        self.id = id
+        self.reason = reason
+        self.cost = float(cost)
+        self.region = region
+        self.account = account
+
+    def tag(self, tags):
+        """Apply scheduler tags ({'Region': ..., 'Account': ...})."""
+        self.region = tags.get('Region', self.region)
+        self.account = tags.get('Account', self.account)
+
+    def to_dict(self):
+        return {'ID': self.id, 'Reason': self.reason, 'Cost': self.cost, 'Region': self.region, 'Account': self.account}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['ID'], data.get('Reason', 'Unused'), data.get('Cost', 0.0), data.get('Region', '-'), data.get('Account', '-'))
+
+    def __eq__(self, other):
+        return isinstance(other, Finding) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"Finding({self.id!r}, {self.reason!r}, {self.cost:.2f}, region={self.region!r}, account={self.account!r})"
+
+
+class FindingsTable:
+    """Columnar store for scan findings.
+
+    Pages of findings are appended column by column as they arrive; frame()
+    turns them into one pandas DataFrame (categorical Service / Account /
+    Region, float Cost), so totals, group-bys and sorting run vectorized
+    instead of looping over dicts.
+    """
+
+    def __init__(self, services=()):
+        self.services = []
+        # Service / Account / Region are stored as category codes and Cost
+        # as raw doubles, so building the frame copies no Python objects
+        self._codes = {name: {} for name in CATEGORIES}
+        self._columns = {name: array('i') for name in CATEGORIES}
+        self._columns.update(ID=[], Reason=[], Cost=array('d'))
+        self._frame = None
+        for service in services:
+            self._code('Service', service)
+
+    @classmethod
+    def from_pages(cls, pages, services=()):
+        """Build from (service, page) pairs."""
+        table = cls(services)
+        for service, page in pages:
+            table.add(service, page)
+        return table
+
+    def _code(self, column, value):
+        codes = self._codes[column]
+        if value not in codes:
+            codes[value] = len(codes)
+            if column == 'Service':
+                self.services.append(value)
+        return codes[value]
+
+    def add(self, service, page):
+        columns = self._columns
+        service_code = self._code('Service', service)
+        accounts, regions = self._codes['Account'], self._codes['Region']
+        for finding in page:
+            if finding.account not in accounts:
+                accounts[finding.account] = len(accounts)
+            if finding.region not in regions:
+                regions[finding.region] = len(regions)
+            columns['Service'].append(service_code)
+            columns['Account'].append(accounts[finding.account])
+            columns['Region'].append(regions[finding.region])
+            columns['ID'].append(finding.id)
+            columns['Reason'].append(finding.reason)
+            columns['Cost'].append(finding.cost)
+        self._frame = None
+
+    def __len__(self):
+        return len(self._columns['Cost'])
+
+    def frame(self):
+        """All findings as a DataFrame (built once per batch of adds)."""
+        if self._frame is None:
+            data = {}
+            for name in COLUMNS:
+                column = self._columns[name]
+                if name in CATEGORIES:
+                    codes = np.frombuffer(column, dtype=np.int32) if len(column) else np.empty(0, dtype=np.int32)
+                    data[name] = pd.Categorical.from_codes(codes.copy(), categories=list(self._codes[name]))
+                elif name == 'Cost':
+                    data[name] = np.frombuffer(column, dtype=np.float64).copy() if len(column) else np.empty(0)
+                else:
+                    data[name] = column
+            self._frame = pd.DataFrame(data)
+        return self._frame
+
+    def total(self):
+        return float(self.frame()['Cost'].sum())
+
+    def summary(self, by=('Service',)):
+        """Count and Cost per group, in service (registry) order; groups
+        with no findings are left out."""
+        return (self.frame()
+                .groupby(list(by), observed=True)['Cost']
+                .agg(Count='size', Cost='sum')
+                .reset_index())
+
+    def by_cost(self):
+        """Findings, most expensive first."""
+        return self.frame().sort_values('Cost', ascending=False, kind='stable')
+
+    def top(self, n):
+        """The n most expensive findings, without sorting the rest."""
+        return self.frame().nlargest(n, 'Cost', keep='first')
+
+    def has_accounts(self):
+        return bool((self.frame()['Account'] != '-').any())
+
+    def records(self):
+        return self.frame().astype({'Service': str, 'Account': str, 'Region': str}).to_dict('records')
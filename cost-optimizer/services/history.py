@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+
+OUTPUTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
+DEFAULT_PATH = os.path.join(OUTPUTS, 'history.sqlite')
+
+TREND_BY = {'Service': 'service', 'Account': 'account', 'Region': 'region'}
+
+
+def _day(timestamp):
+    return time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+
+
+class History:
+    """Append-only record of every finding from every scan run.
+
+    Three tables, each shaped for one kind of question:
+      findings    every finding of every run, indexed by (resource_id, day)
+                  for "what happened to this resource"
+      run_totals  count and cost per (run, service, account, region); trend
+                  queries over a year of daily scans read these few rows
+                  rather than millions of findings
+      resources   one row per flagged resource with the start of its
+                  current streak, for "how long has this been orphaned"
+
+    A day's trend point is its last run, so trends assume each run scans
+    the same regions and accounts (e.g. a daily scheduled scan).
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " id INTEGER PRIMARY KEY, scanned_at REAL NOT NULL, day TEXT NOT NULL,"
+            " findings INTEGER NOT NULL, cost REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS runs_day ON runs (day, id);"
+            "CREATE TABLE IF NOT EXISTS findings ("
+            " run_id INTEGER NOT NULL, day TEXT NOT NULL, service TEXT NOT NULL, account TEXT NOT NULL,"
+            " region TEXT NOT NULL, resource_id TEXT NOT NULL, reason TEXT, cost REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS findings_resource ON findings (resource_id, day);"
+            "CREATE TABLE IF NOT EXISTS run_totals ("
+            " run_id INTEGER NOT NULL, day TEXT NOT NULL, service TEXT NOT NULL, account TEXT NOT NULL,"
+            " region TEXT NOT NULL, count INTEGER NOT NULL, cost REAL NOT NULL,"
+            " PRIMARY KEY (run_id, service, account, region));"
+            "CREATE INDEX IF NOT EXISTS run_totals_day ON run_totals (day);"
+            "CREATE TABLE IF NOT EXISTS resources ("
+            " resource_id TEXT NOT NULL, service TEXT NOT NULL, account TEXT NOT NULL, region TEXT NOT NULL,"
+            " reason TEXT, cost REAL NOT NULL, first_seen REAL NOT NULL, last_seen REAL NOT NULL,"
+            " last_run INTEGER NOT NULL, PRIMARY KEY (resource_id, service, account, region));"
+            "CREATE INDEX IF NOT EXISTS resources_open ON resources (last_run, first_seen);"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, findings, scanned_at=None):
+        """Append one run (a FindingsTable). Returns its run id."""
+        scanned_at = scanned_at or time.time()
+        day = _day(scanned_at)
+        frame = findings.frame()
+        rows = list(zip(
+            frame['Service'].astype(str), frame['Account'].astype(str), frame['Region'].astype(str),
+            frame['ID'].astype(str), frame['Reason'], frame['Cost'].astype(float)
+        ))
+        totals = findings.summary(by=('Service', 'Account', 'Region'))
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            previous = conn.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+            run_id = conn.execute(
+                "INSERT INTO runs (scanned_at, day, findings, cost) VALUES (?, ?, ?, ?)",
+                (scanned_at, day, len(rows), findings.total())
+            ).lastrowid
+
+            # 1. Every finding, for per-resource history
+            conn.executemany(
+                "INSERT INTO findings (run_id, day, service, account, region, resource_id, reason, cost)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, day, *row) for row in rows)
+            )
+
+            # 2. Per-group totals, for trends
+            conn.executemany(
+                "INSERT INTO run_totals (run_id, day, service, account, region, count, cost)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, day, str(t.Service), str(t.Account), str(t.Region), int(t.Count), float(t.Cost))
+                 for t in totals.itertuples())
+            )
+
+            # 3. Streaks: a resource flagged in the previous run keeps its
+            # first_seen; one that wasn't (new, or resolved and back) starts over.
+            # A resource flagged twice in this run (two reasons) is already
+            # stamped with this run by its first row, so it keeps first_seen too
+            conn.executemany(
+                "INSERT INTO resources (resource_id, service, account, region, reason, cost, first_seen, last_seen, last_run)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (resource_id, service, account, region) DO UPDATE SET"
+                "  first_seen = CASE WHEN resources.last_run IN (?, ?) THEN resources.first_seen ELSE excluded.first_seen END,"
+                "  reason = excluded.reason, cost = excluded.cost,"
+                "  last_seen = excluded.last_seen, last_run = excluded.last_run",
+                ((resource_id, service, account, region, reason, cost, scanned_at, scanned_at, run_id, previous, run_id)
+                 for service, account, region, resource_id, reason, cost in rows)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return run_id
+
+    def runs(self, limit=30):
+        return pd.read_sql_query(
+            "SELECT id, scanned_at, day, findings, cost FROM runs ORDER BY id DESC LIMIT ?",
+            self._connect(), params=(limit,)
+        )
+
+    def trend(self, days=90, by='Service'):
+        """Daily waste per Service / Account / Region over the last `days`
+        days: columns Day, <by>, Count, Cost."""
+        column = TREND_BY[by]
+        since = _day(time.time() - days * 86400)
+        return pd.read_sql_query(
+            f"SELECT t.day AS Day, t.{column} AS {by}, SUM(t.count) AS Count, SUM(t.cost) AS Cost"
+            " FROM run_totals t"
+            " JOIN (SELECT MAX(id) AS id FROM runs WHERE day >= ? GROUP BY day) last ON t.run_id = last.id"
+            f" GROUP BY t.day, t.{column} ORDER BY t.day",
+            self._connect(), params=(since,)
+        )
+
+    def oldest(self, limit=50):
+        """Findings still open in the latest run, longest-flagged first."""
+        conn = self._connect()
+        latest = conn.execute("SELECT id, scanned_at FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+        if latest is None:
+            return pd.DataFrame(columns=['Service', 'Account', 'Region', 'ID', 'Reason', 'Cost', 'First Seen', 'Days'])
+        frame = pd.read_sql_query(
+            "SELECT service AS Service, account AS Account, region AS Region, resource_id AS ID,"
+            " reason AS Reason, cost AS Cost, first_seen FROM resources"
+            " WHERE last_run = ? ORDER BY first_seen LIMIT ?",
+            conn, params=(latest[0], limit)
+        )
+        frame['Days'] = ((latest[1] - frame['first_seen']) // 86400).astype(int)
+        frame.insert(6, 'First Seen', pd.to_datetime(frame.pop('first_seen'), unit='s').dt.strftime('%Y-%m-%d'))
+        return frame
+
+    def resource(self, resource_id):
+        """How long a resource has been flagged and its per-day history,
+        or None if it never was."""
+        conn = self._connect()
+        streak = conn.execute(
+            "SELECT service, account, region, reason, cost, first_seen, last_seen, last_run FROM resources"
+            " WHERE resource_id = ? ORDER BY last_seen DESC LIMIT 1",
+            (resource_id,)
+        ).fetchone()
+        if streak is None:
+            return None
+        service, account, region, reason, cost, first_seen, last_seen, last_run = streak
+        latest = conn.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+        history = pd.read_sql_query(
+            "SELECT day AS Day, MAX(cost) AS Cost, MAX(reason) AS Reason FROM findings"
+            " WHERE resource_id = ? GROUP BY day ORDER BY day",
+            conn, params=(resource_id,)
+        )
+        return {
+            'service': service, 'account': account, 'region': region, 'reason': reason, 'cost': cost,
+            'first_seen': first_seen, 'last_seen': last_seen,
+            'open': last_run == latest,
+            'days': int((last_seen - first_seen) // 86400),
+            'history': history,
+        }
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from services.findings import Finding
+
+OUTPUTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
+DEFAULT_PATH = os.path.join(OUTPUTS, 'inventory.sqlite')
+
+# Re-check a resource even if it looks unchanged once its verdict is this old
+DEFAULT_MAX_AGE = 24 * 3600
+
+
+def fingerprint(*parts):
+    """Stable string from the fields that say whether a resource changed."""
+    return json.dumps(parts, sort_keys=True, default=str)
+
+
+class Inventory:
+    """Resources seen by earlier scans, with the fingerprint they had and
+    the findings (verdict) they produced. Scanners reuse a verdict when the
+    fingerprint still matches, skipping their CloudWatch/S3 lookups.
+    Rows for resources a complete listing no longer returns are dropped
+    by prune() once the scan is done."""
+
+    def __init__(self, path=DEFAULT_PATH, max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.reused = 0
+        self.checked = 0
+        self.pruned = 0
+        # Resources looked up per (scope, kind), and the pairs whose listing
+        # ran to the end, since the last prune()
+        self._seen = {}
+        self._listed = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS resources ("
+            " scope TEXT NOT NULL, kind TEXT NOT NULL, id TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL, verdict TEXT NOT NULL, checked REAL NOT NULL,"
+            " PRIMARY KEY (scope, kind, id))"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, scope, kind, resource_id, stamp):
+        """(True, findings) if the resource is unchanged and its verdict is fresh."""
+        with self._lock:
+            self._seen.setdefault((scope, kind), set()).add(resource_id)
+        row = self._connect().execute(
+            "SELECT fingerprint, verdict, checked FROM resources WHERE scope = ? AND kind = ? AND id = ?",
+            (scope, kind, resource_id)
+        ).fetchone()
+        if row is None or row[0] != stamp or time.time() - row[2] > self.max_age:
+            with self._lock:
+                self.checked += 1
+            return False, None
+        with self._lock:
+            self.reused += 1
+        return True, [Finding.from_dict(d) for d in json.loads(row[1])]
+
+    def record(self, scope, kind, resource_id, stamp, findings):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO resources (scope, kind, id, fingerprint, verdict, checked)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (scope, kind, resource_id, stamp, json.dumps([f.to_dict() for f in findings]), time.time())
+        )
+
+    def listed(self, scope, kind):
+        """Mark a complete listing of `kind` in `scope` (every page read)."""
+        with self._lock:
+            self._listed.add((scope, kind))
+
+    def prune(self):
+        """Delete the rows of fully listed (scope, kind) pairs whose resource
+        was not looked up: deleted, or no longer in a state that gets a
+        verdict. Returns how many were dropped."""
+        with self._lock:
+            listed, self._listed = self._listed, set()
+            seen, self._seen = self._seen, {}
+
+        conn = self._connect()
+        pruned = 0
+        for scope, kind in listed:
+            stored = {row[0] for row in conn.execute(
+                "SELECT id FROM resources WHERE scope = ? AND kind = ?", (scope, kind)
+            )}
+            gone = stored - seen.get((scope, kind), set())
+            conn.executemany(
+                "DELETE FROM resources WHERE scope = ? AND kind = ? AND id = ?",
+                ((scope, kind, resource_id) for resource_id in gone)
+            )
+            pruned += len(gone)
+        self.pruned += pruned
+        return pruned
+
+
+INVENTORY = None
+
+
+def configure(path=DEFAULT_PATH, max_age=DEFAULT_MAX_AGE):
+    """Turn on incremental scanning for scanners built after this call."""
+    global INVENTORY
+    INVENTORY = Inventory(path, max_age)
+    return INVENTORY
+
+
+def disable():
+    global INVENTORY
+    INVENTORY = None
+
+
+def scope_of(client):
+    """Account/region scope for a (wrapped) client."""
+    return f"{getattr(client, 'account', None) or '-'}:{client.meta.region_name}"
+
+
+def finding_key(item):
+    return f"{item['Service']}|{item['Account']}|{item['Region']}|{item['ID']}"
+
+
+def baseline_path(accounts, regions, outputs=OUTPUTS):
+    """Where a scan of `accounts` x `regions` keeps its findings for the next
+    diff. One file per scope, so a scan of one region or account is never
+    compared with (or replaces) the baseline of a wider one."""
+    scope = json.dumps([sorted(account or '-' for account in accounts), sorted(regions)])
+    return os.path.join(outputs, f"last_findings_{hashlib.sha256(scope.encode()).hexdigest()[:16]}.json")
+
+
+def write_diff(findings, last_path, outputs=OUTPUTS):
+    """Compare findings with the previous run's baseline at `last_path`
+    (see baseline_path), write the new / resolved / unchanged diff to
+    outputs/scan_diff_<timestamp>.json and make this run's findings the
+    baseline. Only call it for complete scans: anything a cancelled or
+    timed-out scan missed would show up as resolved. Returns the diff."""
+    current = {}
+    for item in findings.records():
+        current[finding_key(item)] = item
+
+    previous = {}
+    if os.path.exists(last_path):
+        with open(last_path) as f:
+            previous = json.load(f)
+
+    diff = {
+        'new': [current[k] for k in current.keys() - previous.keys()],
+        'resolved': [previous[k] for k in previous.keys() - current.keys()],
+        'unchanged': [current[k] for k in current.keys() & previous.keys()],
+    }
+
+    os.makedirs(outputs, exist_ok=True)
+    diff_path = os.path.join(outputs, f"scan_diff_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(diff_path, 'w') as f:
+        json.dump(diff, f, indent=2, default=str)
+    with open(last_path, 'w') as f:
+        json.dump(current, f, default=str)
+
+    diff['path'] = diff_path
+    return diff
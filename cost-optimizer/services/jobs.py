@@ -0,0 +1,317 @@
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+import boto3
+from services import cache, inventory, s3_inventory
+from services.client import STATS
+from services.telemetry import TELEMETRY
+from services.regions import get_enabled_regions, plan_jobs, scan_regions
+from services.accounts import list_org_accounts, scan_accounts
+from services.registry import SCANS
+from services.scheduler import ScanScheduler
+from services.findings import FindingsTable
+from services.history import History
+
+OUTPUTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
+DEFAULT_PATH = os.path.join(OUTPUTS, 'scan_jobs.sqlite')
+
+# Everything a scan request can set; the same options main.py takes
+SPEC_DEFAULTS = {
+    'region': 'ap-south-1',
+    'all_regions': False,
+    'org': False,
+    'accounts': None,
+    'role_name': 'OrganizationAccountAccessRole',
+    'account_workers': 4,
+    'workers': 16,
+    'deadline': None,
+    'use_cache': True,
+    'max_cache_age': None,
+    'incremental': False,
+    'max_verdict_age': 24,
+    's3_inventory': None,
+    'history': True,
+}
+
+ACTIVE = ('queued', 'running')
+# 'partial': the deadline cut the scan short. Such jobs are never reused
+# (latest() only serves 'done') or recorded in the history.
+FINISHED = ('done', 'partial', 'failed', 'cancelled')
+
+
+def normalize(spec):
+    """Fill in defaults and reject unknown options."""
+    unknown = set(spec) - set(SPEC_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown scan options: {', '.join(sorted(unknown))}")
+    spec = dict(SPEC_DEFAULTS, **spec)
+    if spec['accounts']:
+        spec['accounts'] = sorted(spec['accounts'])
+        spec['org'] = True
+    return spec
+
+
+def spec_key(spec):
+    """Identical scan requests share this key (and so one job)."""
+    return hashlib.sha256(json.dumps(normalize(spec), sort_keys=True).encode()).hexdigest()
+
+
+class JobStore:
+    """Scan jobs and their event log (pages of findings, finished scanners)
+    in SQLite, so results outlive the worker and any number of viewers can
+    read a job's events from wherever they got to."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, key TEXT NOT NULL, spec TEXT NOT NULL, status TEXT NOT NULL,"
+            " total INTEGER, created REAL NOT NULL, started REAL, finished REAL, error TEXT, result TEXT);"
+            "CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, created);"
+            "CREATE TABLE IF NOT EXISTS events ("
+            " job_id TEXT NOT NULL, seq INTEGER NOT NULL, kind TEXT NOT NULL, region TEXT NOT NULL,"
+            " name TEXT NOT NULL, payload TEXT, PRIMARY KEY (job_id, seq));"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def create(self, key, spec, total):
+        job_id = uuid.uuid4().hex
+        self._connect().execute(
+            "INSERT INTO jobs (id, key, spec, status, total, created) VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, key, json.dumps(spec), total, time.time())
+        )
+        return self.get(job_id)
+
+    def update(self, job_id, **fields):
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], default=str)
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        self._connect().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def active(self, key):
+        row = self._connect().execute(
+            "SELECT * FROM jobs WHERE key = ? AND status IN (?, ?) ORDER BY created DESC LIMIT 1",
+            (key, *ACTIVE)
+        ).fetchone()
+        return _job(row) if row else None
+
+    def latest(self, key):
+        row = self._connect().execute(
+            "SELECT * FROM jobs WHERE key = ? AND status = 'done' ORDER BY finished DESC LIMIT 1", (key,)
+        ).fetchone()
+        return _job(row) if row else None
+
+    def recent(self, limit=20):
+        rows = self._connect().execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [_job(row) for row in rows]
+
+    def add_event(self, job_id, seq, kind, region, name, payload):
+        self._connect().execute(
+            "INSERT INTO events (job_id, seq, kind, region, name, payload) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, seq, kind, region, name, json.dumps(payload))
+        )
+
+    def events(self, job_id, since=0, limit=1000):
+        rows = self._connect().execute(
+            "SELECT seq, kind, region, name, payload FROM events WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+            (job_id, since, limit)
+        ).fetchall()
+        return [{'seq': r['seq'], 'kind': r['kind'], 'region': r['region'], 'name': r['name'],
+                 'payload': json.loads(r['payload'])} for r in rows]
+
+
+def _job(row):
+    job = dict(row)
+    job['spec'] = json.loads(job['spec'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+class ScanService:
+    """Headless scan worker behind scan_server.py.
+
+    submit() queues a scan job, or hands back the queued/running job for an
+    identical request so every viewer shares it. One worker thread runs jobs
+    in order: the cache, inventory and client stats are process-wide, so
+    scans never overlap. Each page of findings and each finished scanner is
+    appended to the job's event log as it happens.
+    """
+
+    def __init__(self, store=None, session=None):
+        self.store = store or JobStore()
+        self.session = session or boto3.Session()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._schedulers = {}
+        self._worker = threading.Thread(target=self._work, daemon=True)
+
+    def start(self):
+        # Jobs left queued or running by a previous process never finished
+        for job in self.store.recent(limit=1000):
+            if job['status'] in ACTIVE:
+                self.store.update(job['id'], status='failed', error="Scan service restarted", finished=time.time())
+        self._worker.start()
+        return self
+
+    def submit(self, spec):
+        """(job, deduped) for a scan request."""
+        spec = normalize(spec)
+        key = spec_key(spec)
+        job = self.store.active(key)
+        if job:
+            return job, True
+
+        # Plan outside the lock (it calls AWS), then re-check for a twin
+        regions, accounts = self._plan(spec)
+        total = len(plan_jobs(regions, SCANS)) * len(accounts)
+        with self._lock:
+            job = self.store.active(key)
+            if job:
+                return job, True
+            spec = dict(spec, _regions=regions, _accounts=accounts)
+            job = self.store.create(key, spec, total)
+            self._queue.put(job['id'])
+        return job, False
+
+    def cancel(self, job_id):
+        with self._lock:
+            scheduler = self._schedulers.get(job_id)
+            job = self.store.get(job_id)
+            if job and job['status'] == 'queued':
+                self.store.update(job_id, status='cancelled', finished=time.time())
+        if scheduler:
+            scheduler.cancel()
+
+    def _plan(self, spec):
+        if spec['all_regions']:
+            regions = get_enabled_regions(self.session, spec['region'])
+        else:
+            regions = [spec['region']]
+        if spec['org']:
+            accounts = spec['accounts'] or list_org_accounts(self.session)
+        else:
+            accounts = [None]
+        return regions, accounts
+
+    def _baseline(self, accounts, regions):
+        if accounts == [None]:
+            accounts = [self.session.client('sts').get_caller_identity()['Account']]
+        return inventory.baseline_path(accounts, regions)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            job = self.store.get(job_id)
+            if job is None or job['status'] != 'queued':
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                self.store.update(job_id, status='failed', error=str(e), finished=time.time())
+            finally:
+                with self._lock:
+                    self._schedulers.pop(job_id, None)
+
+    def _run(self, job):
+        job_id = job['id']
+        spec = job['spec']
+        regions, accounts = spec['_regions'], spec['_accounts']
+
+        # 1. Apply this job's settings to the process-wide layers
+        STATS.reset()
+        TELEMETRY.reset()
+        if spec['use_cache']:
+            cache.configure(max_age=spec['max_cache_age']).prune()
+        else:
+            cache.disable()
+        if spec['incremental']:
+            inventory.configure(max_age=spec['max_verdict_age'] * 3600)
+        else:
+            inventory.disable()
+        s3_inventory.configure(spec['s3_inventory'])
+
+        scheduler = ScanScheduler(
+            concurrency=spec['workers'], per_key=spec['account_workers'] if spec['org'] else None,
+            deadline=spec['deadline']
+        )
+        with self._lock:
+            self._schedulers[job_id] = scheduler
+        self.store.update(job_id, status='running', started=time.time())
+
+        # 2. Log every page and finished scanner as it happens
+        seq = iter(range(1 << 62))
+        log_lock = threading.Lock()
+
+        def log(kind, region, name, payload):
+            with log_lock:
+                self.store.add_event(job_id, next(seq), kind, region, name, payload)
+
+        def on_page(region, name, page):
+            log('page', region, name, [finding.to_dict() for finding in page])
+
+        def on_done(region, name, seconds, error):
+            log('done', region, name, {'seconds': seconds, 'error': str(error) if error else None})
+
+        # 3. Run it
+        timings = None
+        if spec['org']:
+            def on_account_done(account, region, name, seconds, error):
+                on_done(f"{account}/{region}", name, seconds, error)
+
+            stream = scan_accounts(
+                accounts, spec['role_name'], regions, session=self.session,
+                on_done=on_account_done, scheduler=scheduler
+            )
+            findings = FindingsTable(scan['name'] for scan in SCANS)
+            for account, region, name, page in stream:
+                findings.add(name, page)
+                on_page(f"{account}/{region}", name, page)
+        else:
+            findings, timings = scan_regions(
+                regions, session=self.session, on_page=on_page, on_done=on_done, scheduler=scheduler
+            )
+
+        result = {'stats': STATS.totals(), 'telemetry': TELEMETRY.summary()}
+        if timings:
+            result['timings'] = {
+                'regions': timings['regions'],
+                'scanners': [[region, name, seconds] for (region, name), seconds in timings['scanners'].items()],
+            }
+        if spec['incremental']:
+            inventory.INVENTORY.prune()
+            # A cut-short scan would report everything it missed as resolved
+            if scheduler.complete:
+                result['diff'] = inventory.write_diff(findings, self._baseline(accounts, regions))
+            result['verdicts'] = {
+                'reused': inventory.INVENTORY.reused, 'checked': inventory.INVENTORY.checked,
+                'pruned': inventory.INVENTORY.pruned,
+            }
+
+        if scheduler.cancelled:
+            status = 'cancelled'
+        elif scheduler.timed_out:
+            status = 'partial'
+        else:
+            status = 'done'
+        if spec['history'] and status == 'done':
+            result['history_run'] = History().record(findings)
+        self.store.update(job_id, status=status, result=result, finished=time.time())
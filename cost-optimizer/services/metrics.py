@@ -0,0 +1,149 @@
+import boto3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from services.client import wrap, record_drop
+
+# GetMetricData accepts at most 500 queries per call
+MAX_QUERIES_PER_CALL = 500
+
+
+class MetricsEngine:
+    """Shared CloudWatch engine.
+
+    Scanners queue their metric lookups with add_query() and read them back
+    with values(). The first read resolves everything queued so far, packed
+    into GetMetricData calls of up to 500 queries that run concurrently, so
+    one engine shared by several scanners costs O(resources / 500) calls.
+    With the scan cache on, each query's datapoints are cached on their own,
+    so a repeat scan hits whatever order its queries were queued in.
+    """
+
+    def __init__(self, cw_client, max_workers=4):
+        self.cw = wrap(cw_client)
+        self.max_workers = max_workers
+        self.api_calls = 0
+        # run() holds _lock while its pool fetches, so the call count has its own
+        self._calls_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._results = {}
+        self._counter = 0
+
+    def add_query(self, namespace, metric_name, dimensions, stat, days=1, period=86400):
+        """Queue one metric query and return its id."""
+        with self._lock:
+            query_id = f"q{self._counter}"
+            self._counter += 1
+            self._pending.append((days, {
+                'Id': query_id,
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': namespace,
+                        'MetricName': metric_name,
+                        'Dimensions': dimensions,
+                    },
+                    'Period': period,
+                    'Stat': stat,
+                },
+                'ReturnData': True,
+            }))
+        return query_id
+
+    def values(self, query_id):
+        """Datapoint values for a query, or None if its batch failed."""
+        points = self.series(query_id)
+        if points is None:
+            return None
+        return [value for _, value in points]
+
+    def series(self, query_id):
+        """(timestamp, value) datapoints for a query, newest first, or None
+        if its batch failed."""
+        if query_id not in self._results:
+            self.run()
+        return self._results.get(query_id)
+
+    def run(self):
+        """Resolve every pending query."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+
+            # 1. Answer what the scan cache holds; group the rest by
+            # look-back window (one StartTime/EndTime per call)
+            by_window = {}
+            for days, query in pending:
+                hit, points = self._cached(days, query)
+                if hit:
+                    self._results[query['Id']] = points
+                else:
+                    by_window.setdefault(days, []).append(query)
+
+            # 2. Pack each window into batches of 500
+            batches = []
+            for days, queries in by_window.items():
+                for i in range(0, len(queries), MAX_QUERIES_PER_CALL):
+                    batches.append((days, queries[i:i + MAX_QUERIES_PER_CALL]))
+
+            # 3. Fire the batches concurrently
+            now = datetime.now(timezone.utc)
+            workers = max(1, min(self.max_workers, len(batches)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for results in executor.map(lambda batch: self._fetch(batch, now), batches):
+                    self._results.update(results)
+
+    def _cache_key(self, days, query):
+        cache = self.cw.cache
+        if cache is None:
+            return None
+        return cache.metric_key(self.cw.account, self.cw.region, query['MetricStat'], days)
+
+    def _cached(self, days, query):
+        key = self._cache_key(days, query)
+        if key is None:
+            return False, None
+        return self.cw.cache.get(key, 'GetMetricData')
+
+    def _fetch(self, batch, now):
+        days, queries = batch
+        results = {query['Id']: [] for query in queries}
+        try:
+            paginator = self.cw.get_paginator('get_metric_data')
+            pages = paginator.paginate(
+                MetricDataQueries=queries,
+                StartTime=now - timedelta(days=days),
+                EndTime=now,
+                ScanBy='TimestampDescending'
+            )
+            for page in pages:
+                with self._calls_lock:
+                    self.api_calls += 1
+                for result in page.get('MetricDataResults', []):
+                    results[result['Id']].extend(zip(result.get('Timestamps', []), result.get('Values', [])))
+        except Exception as e:
+            record_drop('CloudWatch metrics', e, len(queries))
+            return {query_id: None for query_id in results}
+        for query in queries:
+            key = self._cache_key(days, query)
+            if key is not None:
+                self.cw.cache.put(key, 'GetMetricData', results[query['Id']])
+        return results
+
+
+class RegionalMetrics:
+    """One MetricsEngine per region, built on first use. Global scanners
+    call it with a resource's region, since services like S3 publish
+    metrics in the region the resource lives in."""
+
+    def __init__(self, engine_for=None):
+        self.engine_for = engine_for or (lambda region: MetricsEngine(boto3.client('cloudwatch', region_name=region)))
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, region):
+        with self._lock:
+            if region not in self._engines:
+                self._engines[region] = self.engine_for(region)
+            return self._engines[region]
@@ -1,46 +1,109 @@
 import boto3
-from datetime import datetime, timedelta
-from services.pricing import PRICING
+from functools import partial
+from services.pricing import get_price
+from services.metrics import MetricsEngine
+from services.paginate import paginate, drain
+from services.client import wrap
+from services.findings import Finding
+from services import inventory
 
 class NATScanner:
-    def __init__(self, ec2_client, cw_client):
-        self.ec2 = ec2_client
-        self.cw = cw_client
+    def __init__(self, ec2_client, cw_client, metrics=None):
+        self.ec2 = wrap(ec2_client)
+        self.cw = wrap(cw_client)
+        self.metrics = metrics or MetricsEngine(cw_client)
+        self.inventory = inventory.INVENTORY
+        self.scope = inventory.scope_of(self.ec2)
 
-    def get_idle_nats(self):
-        response = self.ec2.describe_nat_gateways()
+    def iter_idle_nats(self):
+        for nats in paginate(self.ec2, 'describe_nat_gateways', 'NatGateways'):
+            queued = []
+            reused = []
+
+            for nat in nats:
+                plan = self._plan(nat)
+                if isinstance(plan, list):
+                    reused.extend(plan)
+                elif plan:
+                    queued.append(plan)
+
+            yield reused + self._evaluate(queued)
+
+        if self.inventory:
+            self.inventory.listed(self.scope, 'nat')
+
+    def nat_tasks(self):
+        # One task per gateway, their queries batched on first read
+        tasks = []
+        for nats in paginate(self.ec2, 'describe_nat_gateways', 'NatGateways'):
+            for nat in nats:
+                plan = self._plan(nat)
+                if isinstance(plan, list):
+                    tasks.append(partial(list, plan))
+                elif plan:
+                    tasks.append(partial(self._evaluate, [plan]))
+        if self.inventory:
+            self.inventory.listed(self.scope, 'nat')
+        return tasks
+
+    def _plan(self, nat):
+        nat_id = nat['NatGatewayId']
+        if nat['State'] != 'available':
+            return None
+
+        # Its addresses (and their attachment state) and price matter too
+        addresses = [(a.get('AllocationId'), a.get('NetworkInterfaceId'), a.get('Status'))
+                     for a in nat.get('NatGatewayAddresses', [])]
+        stamp = inventory.fingerprint(
+            nat['State'], nat.get('SubnetId'), nat.get('CreateTime'), addresses,
+            get_price('nat_gateway', self.ec2.region)
+        )
+        if self.inventory:
+            hit, verdict = self.inventory.lookup(self.scope, 'nat', nat_id, stamp)
+            if hit:
+                return verdict
+
+        query_id = self.metrics.add_query(
+            'AWS/NATGateway', 'ConnectionEstablishedCount',
+            [{'Name': 'NatGatewayId', 'Value': nat_id}],
+            'Sum', days=1
+        )
+        return nat_id, query_id, stamp
+
+    def _evaluate(self, queued):
         idle_list = []
 
-        for nat in response.get('NatGateways', []):
-            nat_id = nat['NatGatewayId']
-            if nat['State'] != 'available':
+        for nat_id, query_id, stamp in queued:
+            datapoints = self.metrics.values(query_id)
+            if datapoints is None:
                 continue
-            
-            try:
-                metric_data = self.cw.get_metric_statistics(
-                    Namespace='AWS/NATGateway',
-                    MetricName='ConnectionEstablishedCount',
-                    Dimensions=[{'Name': 'NatGatewayId', 'Value': nat_id}],
-                    StartTime=datetime.utcnow() - timedelta(days=1),
-                    EndTime=datetime.utcnow(),
-                    Period=86400,
-                    Statistics=['Sum']
+
+            verdict = []
+            if sum(datapoints) == 0:
+                item = Finding(
+                    nat_id,
+                    "Idle NAT Gateway",
+                    get_price('nat_gateway', self.ec2.region)
                 )
+                verdict.append(item)
 
-                datapoints = metric_data.get("Datapoints", [])
+            if self.inventory:
+                self.inventory.record(self.scope, 'nat', nat_id, stamp, verdict)
+            idle_list.extend(verdict)
 
-                if not datapoints or datapoints[0].get('Sum', 0) == 0:
-                    item = {
-                        "ID": nat_id,
-                        "Reason": "Idle NAT Gateway",
-                        "Cost": PRICING['nat_gateway']
-                    }
-                    idle_list.append(item)
-            except Exception as e:
-                continue
-        
         return idle_list
 
-def scan_nat(ec2_client, cw_client): 
-    scanner = NATScanner(ec2_client, cw_client)
-    return scanner.get_idle_nats()
\ No newline at end of file
+    def get_idle_nats(self):
+        return drain(self.iter_idle_nats())
+
+def scan_nat(ec2_client, cw_client, metrics=None):
+    scanner = NATScanner(ec2_client, cw_client, metrics)
+    return scanner.get_idle_nats()
+
+def stream_nat(ec2_client, cw_client, metrics=None):
+    scanner = NATScanner(ec2_client, cw_client, metrics)
+    return scanner.iter_idle_nats()
+
+def split_nat(ec2_client, cw_client, metrics=None):
+    scanner = NATScanner(ec2_client, cw_client, metrics)
+    return scanner.nat_tasks()
@@ -0,0 +1,14 @@
+# Streaming layer over boto3 paginators.
+# Scanners pull one page at a time, so memory stays flat however many
+# resources the account has, and callers see findings while later pages load.
+
+def paginate(client, operation, result_key, **kwargs):
+    """Yield the `result_key` list of every page of a describe/list call."""
+    paginator = client.get_paginator(operation)
+    for page in paginator.paginate(**kwargs):
+        yield page.get(result_key, [])
+
+
+def drain(pages):
+    """Flatten a stream of finding pages into one list."""
+    return [item for page in pages for item in page]
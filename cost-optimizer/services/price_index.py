@@ -0,0 +1,202 @@
+# Offline price index built from the AWS bulk Price List files
+# (https://pricing.us-east-1.amazonaws.com/offers/v1.0/aws/<Service>/current/index.{json,csv}).
+#
+# Build once:
+#     python -m services.price_index AmazonEC2.csv AmazonRDS.csv AWSELB.json ...
+#
+# The index is a flat file of fixed-width records sorted by "<region>\x1f<key>",
+# so it is memory-mapped and binary-searched rather than loaded; an LRU
+# in front of it makes repeat lookups dictionary-fast.
+
+import argparse
+import csv
+import json
+import mmap
+import os
+import struct
+from functools import lru_cache
+
+OUTPUTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
+DEFAULT_PATH = os.path.join(OUTPUTS, 'price_index.bin')
+
+HOURS_PER_MONTH = 730
+MAGIC = b'CPIX1\0\0\0'
+HEADER = struct.Struct('<8sII')   # magic, key width, record count
+PRICE = struct.Struct('<d')
+SEPARATOR = '\x1f'
+
+# Monthly multipliers for the price units we index
+UNITS = {'hrs': HOURS_PER_MONTH, 'hours': HOURS_PER_MONTH, 'gb-mo': 1}
+
+
+def _norm(name):
+    return ''.join(c for c in name.lower() if c.isalnum())
+
+
+def classify(offer, attrs):
+    """Index key for a product, or None if we do not price it. `attrs` holds
+    the product's attributes (and productfamily) with normalised names."""
+    family = attrs.get('productfamily', '')
+    usage = attrs.get('usagetype', '')
+
+    if offer == 'AmazonEC2':
+        if family == 'Compute Instance':
+            if (attrs.get('operatingsystem') == 'Linux' and attrs.get('tenancy') == 'Shared'
+                    and attrs.get('preinstalledsw', 'NA') == 'NA' and attrs.get('capacitystatus', 'Used') == 'Used'):
+                return f"ec2:{attrs.get('instancetype')}"
+        elif family == 'Storage' and attrs.get('volumeapiname'):
+            return f"ebs:{attrs['volumeapiname']}"
+        elif family == 'Storage Snapshot' and usage.endswith('EBS:SnapshotUsage'):
+            return 'ebs:snapshot'
+        elif family == 'NAT Gateway' and usage.endswith('NatGateway-Hours'):
+            return 'nat_gateway'
+        elif family == 'IP Address' and 'PublicIPv4:InUseAddress' in usage:
+            return 'elastic_ip'
+    elif offer == 'AmazonVPC':
+        if family == 'VpcEndpoint' and usage.endswith('VpcEndpoint-Hours'):
+            return 'vpc_endpoint'
+    elif offer == 'AWSELB':
+        if family == 'Load Balancer-Application' and usage.endswith('LoadBalancerUsage'):
+            return 'alb'
+    elif offer == 'AmazonEKS':
+        if usage.endswith('AmazonEKS-Hours:perCluster'):
+            return 'eks_cluster'
+    elif offer == 'AmazonRDS':
+        if family == 'Database Instance' and attrs.get('deploymentoption') == 'Single-AZ':
+            return f"rds:{attrs.get('instancetype')}:{attrs.get('databaseengine', '').lower()}"
+    elif offer == 'AmazonS3':
+        if family == 'Storage' and attrs.get('volumetype') == 'Standard' and usage.endswith('TimedStorage-ByteHrs'):
+            return 's3:standard'
+    return None
+
+
+def _monthly(unit, price, begin_range):
+    multiplier = UNITS.get(unit.lower())
+    if multiplier is None or float(begin_range or 0) != 0:
+        return None  # Other units, and every tier after the first
+    return float(price) * multiplier
+
+
+def iter_csv(path):
+    """(region, key, monthly USD) for every priced on-demand row of a bulk CSV."""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        offer = None
+        # Metadata lines come first; the header row starts with "SKU"
+        for row in reader:
+            if row and row[0] == 'OfferCode':
+                offer = row[1]
+            if row and row[0] == 'SKU':
+                columns = [_norm(c) for c in row]
+                break
+        else:
+            return
+
+        for row in reader:
+            attrs = dict(zip(columns, row))
+            if attrs.get('termtype') != 'OnDemand' or attrs.get('currency', 'USD') != 'USD':
+                continue
+            key = classify(offer or attrs.get('servicecode'), attrs)
+            if key is None or not attrs.get('regioncode'):
+                continue
+            monthly = _monthly(attrs.get('unit', ''), attrs.get('priceperunit', 0), attrs.get('startingrange'))
+            if monthly is not None:
+                yield attrs['regioncode'], key, monthly
+
+
+def iter_json(path):
+    """Same as iter_csv, for a bulk JSON offer file (read whole: prefer CSV
+    for the multi-GB EC2 offer)."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    offer = data.get('offerCode')
+    on_demand = data.get('terms', {}).get('OnDemand', {})
+
+    for sku, product in data.get('products', {}).items():
+        attrs = {_norm(k): v for k, v in product.get('attributes', {}).items()}
+        attrs['productfamily'] = product.get('productFamily', '')
+        key = classify(offer, attrs)
+        if key is None or not attrs.get('regioncode'):
+            continue
+        for term in on_demand.get(sku, {}).values():
+            for dimension in term.get('priceDimensions', {}).values():
+                price = dimension.get('pricePerUnit', {}).get('USD')
+                if price is None:
+                    continue
+                monthly = _monthly(dimension.get('unit', ''), price, dimension.get('beginRange'))
+                if monthly is not None:
+                    yield attrs['regioncode'], key, monthly
+
+
+def build(sources, path=DEFAULT_PATH):
+    """Merge bulk price-list files into a sorted, fixed-width index at `path`.
+    Where several SKUs map to one key the lowest price wins. Returns the
+    number of records written."""
+    prices = {}
+    for source in sources:
+        rows = iter_json(source) if source.endswith('.json') else iter_csv(source)
+        for region, key, monthly in rows:
+            record = f"{region}{SEPARATOR}{key}".encode('utf-8')
+            if record not in prices or monthly < prices[record]:
+                prices[record] = monthly
+
+    width = max((len(k) for k in prices), default=1)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, width, len(prices)))
+        for record in sorted(prices):
+            f.write(record.ljust(width, b'\0'))
+            f.write(PRICE.pack(prices[record]))
+    os.replace(tmp, path)
+    return len(prices)
+
+
+class PriceIndex:
+    """Read-only view of an index file. lookup() is an O(log n) binary
+    search over the mapped file, cached in an LRU."""
+
+    def __init__(self, path=DEFAULT_PATH, cache_size=4096):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a price index")
+        self._stride = self.width + PRICE.size
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, region, key):
+        """Monthly USD for `key` in `region`, or None if not indexed."""
+        target = f"{region}{SEPARATOR}{key}".encode('utf-8').ljust(self.width, b'\0')
+        if len(target) > self.width:
+            return None
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = HEADER.size + mid * self._stride
+            probe = self._map[offset:offset + self.width]
+            if probe < target:
+                lo = mid + 1
+            elif probe > target:
+                hi = mid
+            else:
+                return PRICE.unpack_from(self._map, offset + self.width)[0]
+        return None
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline price index from AWS bulk price-list files")
+    parser.add_argument('sources', nargs='+', help="Bulk price-list offer files (.csv or .json)")
+    parser.add_argument('-o', '--output', default=DEFAULT_PATH, help=f"Index file to write (default: {DEFAULT_PATH})")
+    args = parser.parse_args()
+    count = build(args.sources, args.output)
+    print(f"Wrote {count} prices to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,13 @@
-# Real pricing for ap-south-1 (Mumbai) - Updated Feb 2026
-# Assumes 730 hours/month
+# Monthly prices for every scanner, in one place.
+#
+# With a price index (built from the AWS bulk Price List, see
+# services/price_index.py) prices are exact for each region and instance
+# type; otherwise they fall back to the ap-south-1 (Mumbai) table below.
+# Assumes 730 hours/month. Fallback table as of Feb 2026.
+
+import os
+import threading
+from services.price_index import PriceIndex, DEFAULT_PATH
 
 PRICING = {
     # EC2 (Linux On-Demand)
@@ -11,20 +19,99 @@ PRICING = {
     't3.medium': 30.37,
     'm5.large': 70.81,
     'c5.large': 62.05,
-    
+
     # STORAGE (Per GB)
     'gp2': 0.10,
     'gp3': 0.08,
-    
+    'standard': 0.05,
+    'snapshot': 0.05,
+    's3_standard': 0.023,
+
     # NETWORK / OTHER
     'nat_gateway': 33.58,
-    'elastic_ip': 3.65,
-    'alb': 16.42
+    'elastic_ip': 3.65,   # Also every public IPv4 address ($0.005/hr)
+    'alb': 16.42,
+    'vpc_endpoint': 8.03,  # Interface endpoint, per AZ ($0.011/hr)
+    'eks_cluster': 72.00,
+    'rds': 15.00,
+    'stopped_instance': 2.00,  # Nominal EBS cost of a stopped instance
 }
 
-def get_ec2_price(instance_type):
-    return PRICING.get(instance_type, 50.00) # Default estimate
+# boto3 engine names -> Price List "Database Engine"
+RDS_ENGINES = {
+    'mysql': 'mysql',
+    'postgres': 'postgresql',
+    'mariadb': 'mariadb',
+    'aurora-mysql': 'aurora mysql',
+    'aurora-postgresql': 'aurora postgresql',
+}
+
+INDEX = None
+_index_lock = threading.Lock()
+_default_checked = False
+
+
+def configure(path=DEFAULT_PATH):
+    """Price from the index at `path`."""
+    global INDEX
+    INDEX = PriceIndex(path)
+    return INDEX
+
+
+def disable():
+    """Use only the fallback table."""
+    global INDEX, _default_checked
+    INDEX = None
+    _default_checked = True
+
+
+def _index():
+    # Pick up outputs/price_index.bin on first use if nobody configured one
+    global INDEX, _default_checked
+    if INDEX is None and not _default_checked:
+        with _index_lock:
+            if not _default_checked:
+                _default_checked = True
+                if os.path.exists(DEFAULT_PATH):
+                    INDEX = PriceIndex(DEFAULT_PATH)
+    return INDEX
+
+
+def lookup(key, region=None, default=None):
+    """Monthly price of an index key (e.g. 'ec2:t3.micro') in `region`."""
+    index = _index()
+    if index is not None and region:
+        price = index.lookup(region, key)
+        if price is not None:
+            return price
+    return default
+
+
+def get_price(name, region=None):
+    """Monthly price of a flat-rate resource: 'nat_gateway', 'elastic_ip',
+    'alb', 'vpc_endpoint', 'eks_cluster' or 'stopped_instance'."""
+    return lookup(name, region, PRICING[name])
+
+
+def get_ec2_price(instance_type, region=None):
+    return lookup(f"ec2:{instance_type}", region, PRICING.get(instance_type, 50.00)) # Default estimate
+
+
+def get_ebs_price(size, vol_type, region=None):
+    rate = lookup(f"ebs:{vol_type}", region, PRICING.get(vol_type, 0.10))
+    return float(size) * rate
+
+
+def get_snapshot_price(size_gb, region=None):
+    return float(size_gb) * lookup('ebs:snapshot', region, PRICING['snapshot'])
+
+
+def get_s3_price(size_gb, region=None):
+    return float(size_gb) * lookup('s3:standard', region, PRICING['s3_standard'])
+
 
-def get_ebs_price(size, vol_type):
-    rate = PRICING.get(vol_type, 0.10)
-    return float(size) * rate
\ No newline at end of file
+def get_rds_price(instance_class, engine, region=None):
+    engine = RDS_ENGINES.get(engine)
+    if engine is None:
+        return PRICING['rds']
+    return lookup(f"rds:{instance_class}:{engine}", region, PRICING['rds'])
@@ -1,30 +1,38 @@
 import boto3
+from services.pricing import get_rds_price
+from services.paginate import paginate, drain
+from services.client import wrap
+from services.findings import Finding
 
 class rds_scanner():
     def __init__(self,client):
-        self.client = client
+        self.client = wrap(client)
 
 
-        #Get the list of RDS instances
-    def get_rds(self):
-        list_of_rds = self.client.describe_db_instances()['DBInstances']
+        #Stream the RDS instances page by page
+    def iter_rds(self):
+        for list_of_rds in paginate(self.client, 'describe_db_instances', 'DBInstances'):
+            clean_list = []
 
-        clean_list = []
+            for rds in list_of_rds:
+                if rds['DBInstanceStatus'] == 'available':
+                    item = Finding(
+                        rds['DBInstanceIdentifier'],
+                        f"Running {rds['Engine']} {rds['DBInstanceClass']}",
+                        get_rds_price(rds['DBInstanceClass'], rds['Engine'], self.client.region)
+                    )
+                    clean_list.append(item)
+            yield clean_list
 
-        for rds in list_of_rds:
-            if rds['DBInstanceStatus'] == 'available':
-                item = {
-                    "ID": rds['DBInstanceIdentifier'],
-                    "Engine": rds['Engine'],
-                    "Cost": 15.0
-                }
-                clean_list.append(item)
-        return clean_list
+        #Get the list of RDS instances
+    def get_rds(self):
+        return drain(self.iter_rds())
     
     #Function to scan for RDS instances
 def scan_rds(rds_client):
     rds_instance = rds_scanner(rds_client)
     return rds_instance.get_rds()
 
-
-
+def stream_rds(rds_client):
+    rds_instance = rds_scanner(rds_client)
+    return rds_instance.iter_rds()
@@ -0,0 +1,163 @@
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import CredentialProvider, CredentialResolver
+import threading
+import time
+from functools import partial
+from services.metrics import MetricsEngine, RegionalMetrics
+from services.client import wrap
+from services import cache, inventory
+from services.registry import SCANS
+from services.scheduler import ScanScheduler, ScanUnit
+from services.findings import FindingsTable
+
+
+class SharedCredentials(CredentialProvider):
+    """Credential provider that hands out one existing credentials object."""
+    METHOD = 'shared'
+
+    def __init__(self, credentials):
+        super().__init__()
+        self.credentials = credentials
+
+    def load(self):
+        return self.credentials
+
+
+def credentials_session(credentials, region=None):
+    """A fresh boto3 session that resolves to `credentials` itself, so
+    refreshable (assumed-role) credentials keep refreshing in every session
+    built on them."""
+    botocore_session = botocore.session.get_session()
+    resolver = CredentialResolver([SharedCredentials(credentials)])
+    botocore_session.register_component('credential_provider', resolver)
+    return boto3.Session(botocore_session=botocore_session, region_name=region)
+
+
+def region_session(session, region):
+    """A fresh boto3 session for `region` that shares `session`'s credentials."""
+    return credentials_session(session.get_credentials(), region)
+
+
+# Retries are handled (and counted) by services.client, so botocore's own
+# retry loop is switched off rather than hiding throttles from it
+CLIENT_CONFIG = Config(retries={'mode': 'standard', 'max_attempts': 1})
+
+
+class RegionClients:
+    """One boto3 session per region, with its clients built once and reused
+    by every scanner that runs in that region. When the scan cache is on,
+    clients serve fresh cached responses for `account`; the account also
+    scopes the incremental-scan inventory."""
+
+    def __init__(self, region, session=None, account=None):
+        self.region = region
+        self.account = account
+        if session is None:
+            self.session = boto3.Session(region_name=region)
+        else:
+            self.session = region_session(session, region)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, name):
+        scan_cache = cache.CACHE
+        if (scan_cache or inventory.INVENTORY) and self.account is None:
+            self.account = self.session.client('sts').get_caller_identity()['Account']
+        return wrap(self.session.client(name, config=CLIENT_CONFIG), account=self.account, cache=scan_cache)
+
+    def _engine_for(self, region):
+        # This region shares its engine; others get a client of their own
+        if region == self.region:
+            return self.get('metrics')
+        session = region_session(self.session, region)
+        cw = session.client('cloudwatch', config=CLIENT_CONFIG)
+        return MetricsEngine(wrap(cw, account=self.account, cache=cache.CACHE))
+
+    def args(self, scan):
+        """Client arguments for a registry scan entry."""
+        return [self.get(name) for name in scan['clients']]
+
+    def get(self, name):
+        # Sessions are not thread-safe, so client creation is serialised
+        with self._lock:
+            if name not in self._clients:
+                if name == 'metrics':
+                    cw = self._clients.get('cloudwatch') or self._client('cloudwatch')
+                    self._clients['cloudwatch'] = cw
+                    self._clients[name] = MetricsEngine(cw)
+                elif name == 'regional_metrics':
+                    self._clients[name] = RegionalMetrics(self._engine_for)
+                else:
+                    self._clients[name] = self._client(name)
+            return self._clients[name]
+
+
+def get_enabled_regions(session=None, region='us-east-1'):
+    """Regions enabled for this account (default ones plus any opted into)."""
+    session = session or boto3.Session()
+    ec2 = session.client('ec2', region_name=session.region_name or region)
+    response = ec2.describe_regions(
+        Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}]
+    )
+    return sorted(r['RegionName'] for r in response['Regions'])
+
+
+def plan_jobs(regions, scans=SCANS):
+    """The (region, scan) pairs to run; global scanners run only in the first region."""
+    jobs = []
+    for scan in scans:
+        targets = regions[:1] if scan.get('global') else regions
+        for region in targets:
+            jobs.append((region, scan))
+    return jobs
+
+
+def scan_regions(regions, session=None, max_workers=16, scans=SCANS, on_page=None, on_done=None,
+                 deadline=None, scheduler=None, account=None):
+    """Fan every scanner out across (region x service) on the async scheduler.
+
+    Returns (findings, timings). findings is a FindingsTable of every
+    finding, each tagged with its "Region". timings holds wall seconds per region and
+    per (region, service). on_page(region, name, page) is called for every
+    page of findings as it arrives, on_done(region, name, seconds, error)
+    when a scanner finishes. Pass a ScanScheduler to cancel from another
+    thread, or a deadline in seconds. `account` keys the scan cache (looked
+    up with STS when omitted).
+    """
+    clients = {region: RegionClients(region, session, account) for region in regions}
+    scheduler = scheduler or ScanScheduler(concurrency=max_workers, deadline=deadline)
+
+    # 1. Build the (region x service) work list
+    units = []
+    for region, scan in plan_jobs(regions, scans):
+        tag = 'global' if scan.get('global') else region
+        get_args = partial(clients[region].args, scan)
+        units.append(ScanUnit(scan, get_args, {'Region': tag}))
+
+    findings = FindingsTable(scan['name'] for scan in scans)
+    timings = {'regions': {}, 'scanners': {}}
+    region_spans = {}
+
+    def page_done(unit, page):
+        findings.add(unit.name, page)
+        if on_page:
+            on_page(unit.tags['Region'], unit.name, page)
+
+    def unit_done(unit, seconds, error):
+        region = unit.tags['Region']
+        end = time.perf_counter()
+        timings['scanners'][(region, unit.name)] = seconds
+        first, last = region_spans.get(region, (end - seconds, end))
+        region_spans[region] = (min(first, end - seconds), max(last, end))
+        if on_done:
+            on_done(region, unit.name, seconds, error)
+
+    # 2. Run everything on the scheduler
+    scheduler.run(units, on_page=page_done, on_done=unit_done)
+
+    for region, (first, last) in region_spans.items():
+        timings['regions'][region] = last - first
+
+    return findings, timings
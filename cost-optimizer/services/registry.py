@@ -0,0 +1,30 @@
+# Every scanner the orchestrators know about: display name, stream function
+# and the clients it takes (by boto3 service name). 'metrics' is the shared
+# CloudWatch MetricsEngine for the region rather than a boto3 client, and
+# 'regional_metrics' hands out an engine for any region.
+# Global scanners (S3 lists every bucket from any region) run only once.
+# 'split' returns one task per resource so the scheduler can run them side by side.
+
+from services.ebs import stream_ebs
+from services.elastic_ip import stream_eip
+from services.alb import stream_alb, split_alb
+from services.nat_gateway import stream_nat, split_nat
+from services.snapshot import stream_snapshots
+from services.rds import stream_rds
+from services.s3 import stream_s3, split_s3
+from services.ec2 import stream_ec2, split_ec2
+from services.eks import stream_eks
+from services.vpc import stream_vpc
+
+SCANS = [
+    {"name": "EBS Volumes", "stream": stream_ebs, "clients": ['ec2']},
+    {"name": "Elastic IPs", "stream": stream_eip, "clients": ['ec2']},
+    {"name": "Load Balancers", "stream": stream_alb, "split": split_alb, "clients": ['elbv2', 'cloudwatch', 'metrics']},
+    {"name": "NAT Gateways", "stream": stream_nat, "split": split_nat, "clients": ['ec2', 'cloudwatch', 'metrics']},
+    {"name": "Snapshots", "stream": stream_snapshots, "clients": ['ec2']},
+    {"name": "RDS Instances", "stream": stream_rds, "clients": ['rds']},
+    {"name": "S3 Buckets", "stream": stream_s3, "split": split_s3, "clients": ['s3', 'regional_metrics'], "global": True},
+    {"name": "EC2 Instances", "stream": stream_ec2, "split": split_ec2, "clients": ['ec2', 'cloudwatch', 'metrics']},
+    {"name": "EKS Clusters", "stream": stream_eks, "clients": ['eks']},
+    {"name": "VPC & Public IPs", "stream": stream_vpc, "clients": ['ec2']},
+]
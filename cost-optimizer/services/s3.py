@@ -1,63 +1,196 @@
 import boto3
 from datetime import datetime, timezone
+from functools import partial
+from services.paginate import drain
+from services.client import wrap, record_drop
+from services.findings import Finding
+from services.metrics import RegionalMetrics
+from services.pricing import get_s3_price
+from services import inventory, s3_inventory
+
+STALE_DAYS = 90
+
+# BucketSizeBytes is published per storage class (plus the per-object
+# overhead archived classes bill for); a bucket's size is their sum
+SIZE_STORAGE_TYPES = [
+    'StandardStorage', 'StandardIAStorage', 'StandardIASizeOverhead',
+    'OneZoneIAStorage', 'OneZoneIASizeOverhead', 'ReducedRedundancyStorage',
+    'IntelligentTieringFAStorage', 'IntelligentTieringIAStorage', 'IntelligentTieringAAStorage',
+    'IntelligentTieringAIAStorage', 'IntelligentTieringDAAStorage',
+    'GlacierInstantRetrievalStorage', 'GlacierInstantRetrievalSizeOverhead',
+    'GlacierStorage', 'GlacierStagingStorage', 'GlacierObjectOverhead', 'GlacierS3ObjectOverhead',
+    'DeepArchiveStorage', 'DeepArchiveStagingStorage', 'DeepArchiveObjectOverhead', 'DeepArchiveS3ObjectOverhead',
+]
 
 class S3Scanner:
-    def __init__(self, s3_client):
-        self.s3 = s3_client
+    """Flags large buckets nobody has written to in 90 days.
 
-    def get_stale_buckets(self):
+    Buckets are sized without listing objects: from a local S3 Inventory
+    report when one covers the bucket (exact size and last write), else from
+    the daily BucketSizeBytes / NumberOfObjects storage metrics, which
+    CloudWatch publishes in the bucket's own region. A bucket whose size and
+    object count stayed flat for the whole 90-day series counts as stale.
+    """
+
+    def __init__(self, s3_client, metrics_for=None, report_path=None):
+        self.s3 = wrap(s3_client)
+        self.metrics_for = metrics_for or RegionalMetrics()
+        self.report_path = report_path or s3_inventory.REPORT_PATH
+        self.inventory = inventory.INVENTORY
+        self.scope = inventory.scope_of(self.s3)
+        self._report = None
+
+    def list_buckets(self):
         try:
             response = self.s3.list_buckets()
-            buckets = response['Buckets']
+            if self.inventory:
+                self.inventory.listed(self.scope, 's3')
+            return response['Buckets']
         except Exception as e:
-            print(f"Error listing buckets: {e}")
+            record_drop('S3 Buckets', e)
             return []
 
-        waste_list = []
-        
-        for bucket in buckets:
-            b_name = bucket['Name']
-            
-            try:
-                
-                objects = self.s3.list_objects_v2(Bucket=b_name, MaxKeys=1000)
-                
-                total_size_bytes = 0
-                last_modified = bucket['CreationDate'] # Default to creation date
-                
-                if 'Contents' in objects:
-                    for obj in objects['Contents']:
-                        total_size_bytes += obj['Size']
-                  
-                        if obj['LastModified'] > last_modified:
-                            last_modified = obj['LastModified']
-                
-          
-                total_size_gb = total_size_bytes / (1024 ** 3)
-                
-             # (Mumbai Standard: $0.023/GB)
-                estimated_cost = total_size_gb * 0.023
-                
-               
-                if estimated_cost < 0.01:
-                    continue
+    def check_bucket(self, bucket):
+        step = self._task(bucket)
+        return step() if callable(step) else step
+
+    def _task(self, bucket):
+        # First step for one bucket: its reused verdict, or a second step
+        # that judges it once every bucket has queued its metric queries
+        try:
+            # Incremental scans skip re-sizing a bucket whose verdict is
+            # still fresh, unless a newer inventory report covers it
+            report = self._reports().get(bucket['Name'], {}) if self.report_path else {}
+            stamp = inventory.fingerprint(bucket['CreationDate'], report.get('report'))
+            if self.inventory:
+                hit, verdict = self.inventory.lookup(self.scope, 's3', bucket['Name'], stamp)
+                if hit:
+                    return verdict
+
+            size = self._sizer(bucket)
+        except Exception as e:
+            record_drop(f"S3 Bucket {bucket['Name']}", e)
+            return []
+        return partial(self._judge, bucket, stamp, size)
+
+    def _reports(self):
+        # Read once per scan; s3_inventory itself re-reads only new reports
+        if self._report is None:
+            self._report = s3_inventory.load(self.report_path)
+        return self._report
+
+    def _sizer(self, bucket):
+        # A callable returning (size_bytes, last_modified, flat_days), or
+        # None if the bucket could not be sized
+        if self.report_path:
+            report = self._reports()
+            if bucket['Name'] in report:
+                summary = report[bucket['Name']]
+                return lambda: (summary['size_bytes'], summary['last_modified'], None)
+
+        # Queue the storage metrics now so every bucket shares the batch
+        engine = self.metrics_for(self._bucket_region(bucket))
+        dims = [{'Name': 'BucketName', 'Value': bucket['Name']}]
+        size_queries = [
+            engine.add_query(
+                'AWS/S3', 'BucketSizeBytes',
+                dims + [{'Name': 'StorageType', 'Value': storage_type}],
+                'Average', days=STALE_DAYS + 1
+            )
+            for storage_type in SIZE_STORAGE_TYPES
+        ]
+        count_query = engine.add_query(
+            'AWS/S3', 'NumberOfObjects',
+            dims + [{'Name': 'StorageType', 'Value': 'AllStorageTypes'}],
+            'Average', days=STALE_DAYS + 1
+        )
+
+        def from_metrics():
+            series = [engine.series(query) for query in size_queries]
+            counts = engine.values(count_query)
+            if counts is None or any(points is None for points in series):
+                return None
+            # Add the storage classes up day by day
+            daily = {}
+            for points in series:
+                for timestamp, value in points:
+                    daily[timestamp] = daily.get(timestamp, 0) + value
+            sizes = [daily[timestamp] for timestamp in sorted(daily, reverse=True)]
+            if not sizes:
+                return 0, None, None
+            # Daily datapoints, newest first; unchanged size and count mean no writes
+            flat_days = len(sizes) if max(sizes) == min(sizes) and (not counts or max(counts) == min(counts)) else 0
+            return sizes[0], None, flat_days
+
+        return from_metrics
 
+    def _bucket_region(self, bucket):
+        # Remembered on the bucket so pricing can use it too
+        if not bucket.get('BucketRegion'):
+            location = self.s3.get_bucket_location(Bucket=bucket['Name']).get('LocationConstraint')
+            if location is None:
+                location = 'us-east-1'
+            bucket['BucketRegion'] = 'eu-west-1' if location == 'EU' else location
+        return bucket['BucketRegion']
+
+    def _judge(self, bucket, stamp, size):
+        b_name = bucket['Name']
+        sized = size()
+        if sized is None:
+            return []
+        total_size_bytes, last_modified, flat_days = sized
+
+        total_size_gb = total_size_bytes / (1024 ** 3)
+
+        estimated_cost = get_s3_price(total_size_gb, bucket.get('BucketRegion'))
+
+        verdict = []
+        if estimated_cost >= 0.01:
+            if last_modified is not None:
                 days_inactive = (datetime.now(timezone.utc) - last_modified).days
-                
-                if days_inactive > 90:
-                    item = {
-                        "ID": b_name,
-                        "Reason": f"Stale ({days_inactive} days) - {total_size_gb:.4f} GB",
-                        "Cost": estimated_cost
-                    }
-                    waste_list.append(item)
-
-            except Exception as e:
-            
-                continue
-                
-        return waste_list
-
-def scan_s3(s3_client):
-    scanner = S3Scanner(s3_client)
-    return scanner.get_stale_buckets()
\ No newline at end of file
+                stale = days_inactive > STALE_DAYS
+                age = f"{days_inactive} days"
+            else:
+                # Metrics only show the size held still for the whole series
+                stale = (flat_days or 0) >= STALE_DAYS
+                age = f"{STALE_DAYS}+ days"
+
+            if stale:
+                item = Finding(
+                    b_name,
+                    f"Stale ({age}) - {total_size_gb:.4f} GB",
+                    estimated_cost
+                )
+                verdict.append(item)
+
+        if self.inventory:
+            self.inventory.record(self.scope, 's3', b_name, stamp, verdict)
+        return verdict
+
+    def iter_stale_buckets(self):
+        # Plan every bucket first so their metric queries go out in one batch
+        steps = [task() for task in self.bucket_tasks()]
+        for step in steps:
+            page = step() if callable(step) else step
+            if page:
+                yield page
+
+    def bucket_tasks(self):
+        # One independent task per bucket, so a scheduler can locate and
+        # size buckets in parallel
+        return [partial(self._task, bucket) for bucket in self.list_buckets()]
+
+    def get_stale_buckets(self):
+        return drain(self.iter_stale_buckets())
+
+def scan_s3(s3_client, metrics_for=None):
+    scanner = S3Scanner(s3_client, metrics_for)
+    return scanner.get_stale_buckets()
+
+def stream_s3(s3_client, metrics_for=None):
+    scanner = S3Scanner(s3_client, metrics_for)
+    return scanner.iter_stale_buckets()
+
+def split_s3(s3_client, metrics_for=None):
+    scanner = S3Scanner(s3_client, metrics_for)
+    return scanner.bucket_tasks()
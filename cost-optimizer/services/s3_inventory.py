@@ -0,0 +1,148 @@
+# Reader for S3 Inventory reports synced to a local directory
+# (e.g. `aws s3 sync s3://inventory-bucket/prefix ./inventory`).
+# Rows are streamed one at a time and folded into per-bucket totals, so a
+# report with billions of objects needs memory only per bucket.
+
+import csv
+import glob
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+REPORT_PATH = None
+
+_reports = {}
+_reports_lock = threading.Lock()
+
+
+def configure(path):
+    """Size buckets from the S3 Inventory reports under `path` when they have one."""
+    global REPORT_PATH
+    REPORT_PATH = path
+
+
+def load(path):
+    """Per-bucket {'size_bytes', 'objects', 'last_modified', 'report'} from the latest
+    report of every source bucket under `path` (a directory or a manifest.json).
+    Kept until a manifest is added or rewritten (a new daily report lands)."""
+    manifests, roots = _find_manifests(path)
+    key = tuple(sorted((m, os.path.getmtime(m)) for m in manifests))
+    with _reports_lock:
+        cached = _reports.get(path)
+        if cached is None or cached[0] != key:
+            cached = _reports[path] = (key, _read_reports(manifests, roots))
+        return cached[1]
+
+
+def _find_manifests(path):
+    if os.path.isdir(path):
+        manifests = glob.glob(os.path.join(path, '**', 'manifest.json'), recursive=True)
+        roots = [path]
+    else:
+        manifests = [path]
+        # Manifests sit at <prefix>/<bucket>/<config>/<date>/manifest.json
+        roots = [os.path.dirname(path)]
+        for _ in range(4):
+            roots.append(os.path.dirname(roots[-1]))
+    return manifests, roots
+
+
+def _read_reports(manifests, roots):
+    # Keep only the newest manifest for each source bucket
+    latest = {}
+    for manifest_path in manifests:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        bucket = manifest['sourceBucket']
+        created = int(manifest.get('creationTimestamp', 0))
+        if bucket not in latest or created > latest[bucket][0]:
+            latest[bucket] = (created, manifest)
+
+    totals = {}
+    for bucket, (created, manifest) in latest.items():
+        totals[bucket] = summary = {'size_bytes': 0, 'objects': 0, 'last_modified': None, 'report': created}
+        for size, last_modified in iter_objects(manifest, roots):
+            summary['size_bytes'] += size
+            summary['objects'] += 1
+            if last_modified and (summary['last_modified'] is None or last_modified > summary['last_modified']):
+                summary['last_modified'] = last_modified
+    return totals
+
+
+def iter_objects(manifest, roots):
+    """(size, last_modified) for every current object in a manifest's data files."""
+    file_format = manifest.get('fileFormat', 'CSV').upper()
+    for data_file in manifest.get('files', []):
+        local = _resolve(data_file['key'], roots)
+        if local is None:
+            raise FileNotFoundError(f"Inventory data file {data_file['key']} not found under {roots[0]}")
+        if file_format == 'CSV':
+            yield from _iter_csv(local, manifest['fileSchema'])
+        elif file_format == 'PARQUET':
+            yield from _iter_parquet(local)
+        else:
+            raise ValueError(f"Unsupported S3 Inventory format: {file_format}")
+
+
+def _resolve(key, roots):
+    # Data file keys include the destination prefix; match them against the
+    # synced directory with as many leading parts stripped as needed
+    parts = key.split('/')
+    for root in roots:
+        for i in range(len(parts)):
+            candidate = os.path.join(root, *parts[i:])
+            if os.path.isfile(candidate):
+                return candidate
+    return None
+
+
+def _column(name):
+    return name.strip().lower().replace('_', '')
+
+
+def _iter_csv(local, file_schema):
+    columns = [_column(c) for c in file_schema.split(',')]
+    size_at = columns.index('size')
+    modified_at = columns.index('lastmodifieddate') if 'lastmodifieddate' in columns else None
+    latest_at = columns.index('islatest') if 'islatest' in columns else None
+    marker_at = columns.index('isdeletemarker') if 'isdeletemarker' in columns else None
+
+    opener = gzip.open if local.endswith('.gz') else open
+    with opener(local, 'rt', newline='') as f:
+        for row in csv.reader(f):
+            if latest_at is not None and row[latest_at] == 'false':
+                continue
+            if marker_at is not None and row[marker_at] == 'true':
+                continue
+            if not row[size_at]:
+                continue
+            last_modified = None
+            if modified_at is not None and row[modified_at]:
+                last_modified = datetime.fromisoformat(row[modified_at].replace('Z', '+00:00'))
+            yield int(row[size_at]), last_modified
+
+
+def _iter_parquet(local):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet inventory reports needs pyarrow (pip install pyarrow)")
+
+    parquet = pq.ParquetFile(local)
+    names = {_column(name): name for name in parquet.schema_arrow.names}
+    wanted = [names[c] for c in ('size', 'lastmodifieddate', 'islatest', 'isdeletemarker') if c in names]
+
+    for batch in parquet.iter_batches(columns=wanted):
+        rows = batch.to_pydict()
+        sizes = rows[names['size']]
+        modified = rows.get(names.get('lastmodifieddate'), [None] * len(sizes))
+        latest = rows.get(names.get('islatest'), [True] * len(sizes))
+        markers = rows.get(names.get('isdeletemarker'), [False] * len(sizes))
+        for size, last_modified, is_latest, is_marker in zip(sizes, modified, latest, markers):
+            if size is None or is_latest is False or is_marker:
+                continue
+            if last_modified is not None and last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+            yield size, last_modified
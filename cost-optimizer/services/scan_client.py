@@ -0,0 +1,96 @@
+import json
+import time
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from services.findings import Finding, FindingsTable
+from services.jobs import FINISHED, spec_key
+from services.registry import SCANS
+
+
+class ScanClient:
+    """Talks to scan_server.py. Scans are submitted as option dicts (see
+    jobs.SPEC_DEFAULTS); identical in-flight requests come back as the same
+    job, and follow() replays a job's events from the start, so late
+    viewers see everything the first one did."""
+
+    def __init__(self, base_url, timeout=30, poll_interval=0.5):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+    def _request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = Request(self.base_url + path, data=data, method=method,
+                          headers={'Content-Type': 'application/json'})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except HTTPError as e:
+            if e.code == 404:
+                return json.loads(e.read())
+            raise RuntimeError(f"Scan service error {e.code}: {e.read().decode(errors='replace')}")
+
+    def submit(self, spec):
+        """{'job': ..., 'deduped': bool}"""
+        return self._request('POST', '/scans', spec)
+
+    def job(self, job_id):
+        return self._request('GET', f'/jobs/{job_id}').get('job')
+
+    def latest(self, spec):
+        """Newest finished job for these options, or None."""
+        return self._request('GET', '/jobs/latest?' + urlencode({'key': spec_key(spec)})).get('job')
+
+    def metrics(self):
+        """The service's Prometheus metrics, as text."""
+        with urlopen(self.base_url + '/metrics', timeout=self.timeout) as response:
+            return response.read().decode()
+
+    def cancel(self, job_id):
+        return self._request('DELETE', f'/jobs/{job_id}')['job']
+
+    def follow(self, job_id, on_page=None, on_done=None, should_stop=None):
+        """Stream a job's events until it finishes: on_page(region, name,
+        [Finding]) and on_done(region, name, seconds, error). Returns the
+        finished job."""
+        since = 0
+        while True:
+            response = self._request('GET', f'/jobs/{job_id}/events?since={since}')
+            for event in response['events']:
+                payload = event['payload']
+                if event['kind'] == 'page' and on_page:
+                    on_page(event['region'], event['name'], [Finding.from_dict(d) for d in payload])
+                elif event['kind'] == 'done' and on_done:
+                    on_done(event['region'], event['name'], payload['seconds'], payload['error'])
+            since = response['next']
+
+            if response['status'] in FINISHED and not response['events']:
+                return self.job(job_id)
+            if should_stop and should_stop():
+                return self.job(job_id)
+            if not response['events']:
+                time.sleep(self.poll_interval)
+
+    def findings(self, job_id, on_done=None, on_page=None):
+        """(FindingsTable, finished job) for a job."""
+        table = FindingsTable(scan['name'] for scan in SCANS)
+
+        def add_page(region, name, page):
+            table.add(name, page)
+            if on_page:
+                on_page(region, name, page)
+
+        job = self.follow(job_id, add_page, on_done)
+        return table, job
+
+
+def timings_from_job(job):
+    """The job's timings in the shape scan_regions returns, or None."""
+    timings = (job.get('result') or {}).get('timings')
+    if not timings:
+        return None
+    return {
+        'regions': timings['regions'],
+        'scanners': {(region, name): seconds for region, name, seconds in timings['scanners']},
+    }
@@ -0,0 +1,237 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from services.client import is_throttle, throttle_events
+from services.telemetry import TELEMETRY
+
+# Tries for a split task that still hits a throttle the client layer gave up on
+MAX_RESTARTS = 3
+
+
+class ScanUnit:
+    """One scanner run: `scan` is a registry entry, `get_args` builds its
+    clients, `tags` are stamped on every finding and `key` (e.g. an account
+    id) groups units that share a concurrency limit."""
+
+    def __init__(self, scan, get_args, tags, key=None):
+        self.scan = scan
+        self.get_args = get_args
+        self.tags = tags
+        self.key = key
+        self.name = scan['name']
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit. Every clean call counts towards growing the
+    limit by one; a throttled call halves it."""
+
+    def __init__(self, initial, minimum=1, maximum=64):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.throttles = 0
+        self._clean = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, throttled=False):
+        async with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttles += 1
+                self.limit = max(self.minimum, self.limit // 2)
+                self._clean = 0
+            else:
+                self._clean += 1
+                if self._clean >= self.limit:
+                    self.limit = min(self.maximum, self.limit + 1)
+                    self._clean = 0
+            self._cond.notify_all()
+
+
+class ScanScheduler:
+    """Async scan scheduler shared by main.py and web_app.py.
+
+    Work is scheduled per page (and per resource for scanners that can
+    split, like S3 buckets), not per service: each blocking boto3 step runs
+    in the thread pool only while it is in flight, so a slow service never
+    pins a worker and every scanner makes progress side by side. Overall
+    concurrency adapts to throttling; `per_key` caps concurrency per unit
+    key (e.g. per account). Call cancel() from any thread, or pass a
+    deadline in seconds, to stop early.
+    """
+
+    def __init__(self, concurrency=16, max_concurrency=None, per_key=None, deadline=None):
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency or concurrency * 4
+        self.per_key = per_key
+        self.deadline = deadline
+        self.limiter = None
+        self._loop = None
+        self._task = None
+        self._cancelled = False
+        self._timed_out = False
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def timed_out(self):
+        """True if the deadline cut the scan short."""
+        return self._timed_out
+
+    @property
+    def complete(self):
+        """False if the scan was cancelled or ran out of time."""
+        return not (self._cancelled or self._timed_out)
+
+    def cancel(self):
+        """Stop the scan. Safe to call from any thread; a no-op once the
+        scan has finished, so a finished scan still counts as complete."""
+        if self._task is not None and self._task.done():
+            return
+        self._cancelled = True
+        if self._task is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._task.cancel)
+            except RuntimeError:
+                pass  # Loop already closed: the scan has finished
+
+    def run(self, units, on_page=None, on_done=None):
+        """Blocking entry point: run every unit and return when all finish,
+        the deadline passes or cancel() is called."""
+        return asyncio.run(self.run_async(units, on_page, on_done))
+
+    async def run_async(self, units, on_page=None, on_done=None):
+        self._loop = asyncio.get_running_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        self.limiter = AdaptiveLimiter(self.concurrency, maximum=self.max_concurrency)
+        self._key_limits = {}
+        if self.per_key:
+            for unit in units:
+                if unit.key is not None and unit.key not in self._key_limits:
+                    self._key_limits[unit.key] = asyncio.Semaphore(self.per_key)
+
+        finished = set()
+
+        async def run_unit(unit):
+            start = time.perf_counter()
+            error = None
+            try:
+                await self._run_unit(unit, on_page)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+            finished.add(unit)
+            seconds = time.perf_counter() - start
+            TELEMETRY.observe('scanner_seconds', seconds, scanner=unit.name, region=unit.tags.get('Region', '-'))
+            if on_done:
+                on_done(unit, seconds, error)
+
+        self._task = asyncio.ensure_future(
+            asyncio.gather(*(run_unit(unit) for unit in units))
+        )
+        if self._cancelled:
+            self._task.cancel()
+
+        scan_start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._task, self.deadline)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            self._timed_out = isinstance(e, asyncio.TimeoutError)
+            reason = "deadline exceeded" if self._timed_out else "cancelled"
+            # Report every unfinished unit so callers' progress still adds up
+            for unit in units:
+                if unit not in finished and on_done:
+                    on_done(unit, 0.0, RuntimeError(f"Scan {reason}"))
+        finally:
+            TELEMETRY.observe('scan_seconds', time.perf_counter() - scan_start)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _call(self, unit, func, *args):
+        # One blocking boto3 step, under the per-key and adaptive limits
+        key_limit = self._key_limits.get(unit.key)
+        if key_limit:
+            await key_limit.acquire()
+        try:
+            await self.limiter.acquire()
+            throttled = False
+            try:
+                result, throttled = await self._loop.run_in_executor(self._executor, self._step, func, args)
+                return result
+            except ClientError as e:
+                throttled = is_throttle(e)
+                raise
+            finally:
+                await self.limiter.release(throttled)
+        finally:
+            if key_limit:
+                key_limit.release()
+
+    @staticmethod
+    def _step(func, args):
+        # Runs in a worker thread. Throttles the client layer retried away
+        # still count, so the limit backs off before calls start failing.
+        throttle_events()
+        try:
+            result = func(*args)
+        except Exception:
+            throttle_events()
+            raise
+        return result, throttle_events() > 0
+
+    async def _run_unit(self, unit, on_page):
+        args = await self._call(unit, unit.get_args)
+
+        def deliver(page):
+            TELEMETRY.count('findings', len(page), scanner=unit.name, region=unit.tags.get('Region', '-'))
+            for finding in page:
+                finding.tag(unit.tags)
+            if on_page:
+                on_page(unit, page)
+
+        # Scanners that can split (one task per resource) fan out fully.
+        # A task may hand back a second step instead of findings; those run
+        # once every first step is done, so work they share (like a batch of
+        # queued metric queries) goes out together
+        if unit.scan.get('split'):
+            async def run_task(task, next_steps):
+                result = await self._retrying(unit, task)
+                if callable(result):
+                    next_steps.append(result)
+                else:
+                    deliver(result)
+
+            tasks = await self._call(unit, lambda: list(unit.scan['split'](*args)))
+            while tasks:
+                next_steps = []
+                await asyncio.gather(*(run_task(task, next_steps) for task in tasks))
+                tasks = next_steps
+            return
+
+        # Everything else is stepped one page at a time. Throttles are waited
+        # out by the client layer, whose paginators resume from their last
+        # token, so a stream is never restarted and its pages never re-fetched.
+        stream = unit.scan['stream'](*args)
+        while True:
+            page = await self._call(unit, next, stream, None)
+            if page is None:
+                return
+            deliver(page)
+
+    async def _retrying(self, unit, task):
+        for attempt in range(MAX_RESTARTS + 1):
+            try:
+                return await self._call(unit, task)
+            except ClientError as e:
+                if not is_throttle(e) or attempt == MAX_RESTARTS:
+                    raise
+                await asyncio.sleep(2 ** (attempt + 1))
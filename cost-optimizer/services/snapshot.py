@@ -1,43 +1,155 @@
 import boto3
+from array import array
+from bisect import bisect_left
 from datetime import datetime, timedelta, timezone
+from services.paginate import paginate, drain
+from services.client import wrap, record_drop
+from services.findings import Finding
+from services.pricing import get_snapshot_price
+
+# Memory the volume index may use. Volume IDs are kept in a set while that
+# fits, then packed into sorted 64-bit arrays (8 bytes per volume).
+MAX_INDEX_BYTES = 256 * 1024 ** 2
+SET_BYTES_PER_ID = 120  # str object + set slot, measured on CPython 3.11
+PACKED_BYTES_PER_ID = 8
+
+
+class VolumeIndex:
+    """Set of volume IDs with O(1) / O(log n) membership and a memory ceiling.
+
+    IDs go into a plain set until that would pass `max_bytes`, then switch to
+    a packed form: "vol-" + 17 hex digits is a 68-bit number, so it is stored
+    as its low 64 bits in one of 16 sorted array('Q') buckets picked by the
+    top 4 bits (legacy 8-digit IDs get a 17th bucket). Anything that does not
+    parse stays in a small overflow set. Call freeze() after the last add().
+    """
+
+    def __init__(self, max_bytes=MAX_INDEX_BYTES):
+        self.max_bytes = max_bytes
+        self.count = 0
+        self._set = set()
+        self._buckets = None
+        self._overflow = set()
+
+    def add_all(self, volume_ids):
+        for volume_id in volume_ids:
+            self.add(volume_id)
+
+    def add(self, volume_id):
+        self.count += 1
+        if self._buckets is None:
+            self._set.add(volume_id)
+            if len(self._set) * SET_BYTES_PER_ID > self.max_bytes:
+                self._pack()
+            return
+        if self.count * PACKED_BYTES_PER_ID > self.max_bytes:
+            raise MemoryError(f"Volume index passed its {self.max_bytes} byte ceiling at {self.count} volumes")
+        self._insert(volume_id)
+
+    def freeze(self):
+        if self._buckets is not None:
+            for bucket in self._buckets:
+                bucket[:] = array('Q', sorted(bucket))
+        return self
+
+    def __contains__(self, volume_id):
+        if self._buckets is None:
+            return volume_id in self._set
+        key = _pack_id(volume_id)
+        if key is None:
+            return volume_id in self._overflow
+        bucket = self._buckets[key[0]]
+        i = bisect_left(bucket, key[1])
+        return i < len(bucket) and bucket[i] == key[1]
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def packed(self):
+        return self._buckets is not None
+
+    def _pack(self):
+        self._buckets = [array('Q') for _ in range(17)]
+        for volume_id in self._set:
+            self._insert(volume_id)
+        self._set = set()
+
+    def _insert(self, volume_id):
+        key = _pack_id(volume_id)
+        if key is None:
+            self._overflow.add(volume_id)
+        else:
+            self._buckets[key[0]].append(key[1])
+
+
+def _pack_id(volume_id):
+    # (bucket, low 64 bits) for "vol-<hex>", or None for anything else
+    if not volume_id or not volume_id.startswith('vol-'):
+        return None
+    digits = volume_id[4:]
+    try:
+        value = int(digits, 16)
+    except ValueError:
+        return None
+    if len(digits) == 17:
+        return value >> 64, value & 0xFFFFFFFFFFFFFFFF
+    if len(digits) == 8:
+        return 16, value
+    return None
+
+
+def join_orphans(snapshot_pages, volumes, threshold_date, region=None):
+    """Probe side of the join: stream snapshot pages against the volume
+    index and yield one page of orphaned-snapshot findings per input page."""
+    for snapshots in snapshot_pages:
+        trash_list = []
+
+        for snap in snapshots:
+            if snap.get('VolumeId') not in volumes and snap['StartTime'] < threshold_date:
+                item = Finding(
+                    snap['SnapshotId'],
+                    "Orphaned (>30 days old)",
+                    get_snapshot_price(snap['VolumeSize'], region)
+                )
+                trash_list.append(item)
+
+        yield trash_list
+
 
 class SnapshotScanner:
-    def __init__(self, ec2_client):
-        self.ec2 = ec2_client
+    def __init__(self, ec2_client, max_index_bytes=None):
+        self.ec2 = wrap(ec2_client)
+        self.max_index_bytes = max_index_bytes or MAX_INDEX_BYTES
 
-    def get_orphaned_snapshots(self):
-       
+    def iter_orphaned_snapshots(self):
+        # The volume list is the build side of the join, so index it in full first,
+        # one page at a time
         try:
-            snapshots = self.ec2.describe_snapshots(OwnerIds=['self'])['Snapshots']
+            volumes = VolumeIndex(self.max_index_bytes)
+            for page in paginate(self.ec2, 'describe_volumes', 'Volumes'):
+                volumes.add_all(v['VolumeId'] for v in page)
+            volumes.freeze()
         except Exception as e:
-            print(f"Error describing snapshots: {e}")
-            return []
-        
+            # Without the volume list every snapshot would look orphaned
+            record_drop('Snapshots', e)
+            return
 
-        try:
-            volumes = self.ec2.describe_volumes()['Volumes']
-            active_vols = [v['VolumeId'] for v in volumes]
-        except Exception:
-            active_vols = []
-        
-        trash_list = []
         threshold_date = datetime.now(timezone.utc) - timedelta(days=30)
 
-        for snap in snapshots:
-            vol_id = snap.get('VolumeId')
-            start_time = snap['StartTime']
-
-       
-            if vol_id not in active_vols and start_time < threshold_date:
-                item = {
-                    "ID": snap['SnapshotId'],
-                    "Reason": "Orphaned (>30 days old)",
-                    "Cost": snap['VolumeSize'] * 0.05 # Approx $0.05/GB
-                }
-                trash_list.append(item)
-        
-        return trash_list
+        try:
+            pages = paginate(self.ec2, 'describe_snapshots', 'Snapshots', OwnerIds=['self'])
+            yield from join_orphans(pages, volumes, threshold_date, self.ec2.region)
+        except Exception as e:
+            record_drop('Snapshots', e)
+
+    def get_orphaned_snapshots(self):
+        return drain(self.iter_orphaned_snapshots())
 
 def scan_snapshots(ec2_client):
     scanner = SnapshotScanner(ec2_client)
-    return scanner.get_orphaned_snapshots()
\ No newline at end of file
+    return scanner.get_orphaned_snapshots()
+
+def stream_snapshots(ec2_client):
+    scanner = SnapshotScanner(ec2_client)
+    return scanner.iter_orphaned_snapshots()
@@ -0,0 +1,241 @@
+import bisect
+import cProfile
+import pstats
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+PREFIX = 'cost_optimizer'
+
+# Everything exported on /metrics: name -> (type, help)
+METRICS = {
+    'api_call_seconds': ('histogram', "Latency of AWS API calls, one per attempt or paginator page"),
+    'api_response_bytes': ('counter', "Bytes received from AWS APIs"),
+    'scanner_seconds': ('histogram', "Wall time of one scanner run in one region"),
+    'scan_seconds': ('histogram', "Wall time of a whole scan"),
+    'findings': ('counter', "Findings produced by scanners"),
+    'api_calls': ('counter', "AWS API calls made, including retries"),
+    'api_pages': ('counter', "Paginator pages fetched"),
+    'api_retries': ('counter', "AWS API calls retried"),
+    'api_throttles': ('counter', "AWS API calls throttled"),
+    'dropped_findings': ('counter', "Findings lost after retries ran out"),
+}
+
+# ClientStats kind -> metric; those counters are keyed "region:API" (drops by scanner)
+STATS_METRICS = {
+    'calls': 'api_calls', 'pages': 'api_pages', 'retries': 'api_retries',
+    'throttles': 'api_throttles', 'drops': 'dropped_findings',
+}
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (the
+        largest value seen, for the overflow bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Telemetry:
+    """Spans, latency histograms and counters for a scan.
+
+    The client layer records a span per API call attempt and paginator page
+    (with response bytes), the scheduler one per scanner run (with the
+    findings it produced) and one per scan. Histograms and counters are
+    keyed by metric and labels; the most recent spans are kept for the
+    dashboard's debug panel. prometheus() renders all of it, plus the
+    ClientStats counters, in the Prometheus text format.
+    """
+
+    def __init__(self, keep=5000):
+        self._lock = threading.Lock()
+        self.keep = keep
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = Counter()
+            self.spans = deque(maxlen=self.keep)
+
+    def observe(self, metric, seconds, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+            self.spans.append((metric, labels, time.time() - seconds, seconds))
+
+    def count(self, metric, value=1, **labels):
+        with self._lock:
+            self.counters[(metric, tuple(sorted(labels.items())))] += value
+
+    @contextmanager
+    def span(self, metric, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(metric, time.perf_counter() - start, **labels)
+
+    def summary(self):
+        """Per-scanner and per-API latency tables and the slowest recent
+        spans, as JSON-friendly rows."""
+        with self._lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+            spans = list(self.spans)
+
+        def rows(metric):
+            table = []
+            for (name, labels), histogram in histograms.items():
+                if name == metric:
+                    row = dict(labels)
+                    row.update({
+                        'count': histogram.count, 'total_s': round(histogram.sum, 3),
+                        'p50_s': histogram.quantile(0.5), 'p95_s': histogram.quantile(0.95),
+                        'max_s': round(histogram.max, 3),
+                    })
+                    table.append(row)
+            return sorted(table, key=lambda r: r['total_s'], reverse=True)
+
+        scanners = rows('scanner_seconds')
+        for row in scanners:
+            row['findings'] = counters.get(('findings', (('region', row['region']), ('scanner', row['scanner']))), 0)
+        apis = rows('api_call_seconds')
+        for row in apis:
+            row['bytes'] = counters.get(('api_response_bytes', (('api', row['api']), ('region', row['region']))), 0)
+
+        slowest = sorted(spans, key=lambda s: s[3], reverse=True)[:20]
+        return {
+            'scanners': scanners,
+            'apis': apis,
+            'slowest': [dict(labels, metric=metric, seconds=round(seconds, 3)) for metric, labels, _, seconds in slowest],
+        }
+
+    def prometheus(self, stats=None):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+
+        if stats is not None:
+            for kind, counter in stats.snapshot().items():
+                for key, value in counter.items():
+                    if kind == 'drops':
+                        labels = (('source', key),)
+                    else:
+                        region, _, api = key.partition(':')
+                        labels = (('api', api), ('region', region))
+                    counters[(STATS_METRICS[kind], labels)] = value
+
+        lines = []
+        for metric, (kind, help_text) in METRICS.items():
+            name = f"{PREFIX}_{metric}"
+            if kind == 'counter':
+                series = sorted((labels, value) for (m, labels), value in counters.items() if m == metric)
+                if not series:
+                    continue
+                lines += [f"# HELP {name}_total {help_text}", f"# TYPE {name}_total counter"]
+                lines += [f"{name}_total{_labels(labels)} {value}" for labels, value in series]
+            else:
+                series = sorted((labels, h) for (m, labels), h in histograms.items() if m == metric)
+                if not series:
+                    continue
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for labels, histogram in series:
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+TELEMETRY = Telemetry()
+
+
+class Profiler:
+    """cProfile across every thread, not just the caller's: scans do their
+    work in the scheduler's thread pool, which a plain cProfile (or a
+    single-thread sampler) never sees. Threads started while it runs get
+    their own profile, merged into one pstats dump on stop()."""
+
+    def __init__(self):
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def _start_thread(self, *args):
+        # First profile event in a new thread: swap in a real profiler
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        threading.setprofile(self._start_thread)
+        self._start_thread()
+        return self
+
+    def stop(self, path=None):
+        """Stop profiling; write the merged stats to `path` and return them.
+        Returns None (and writes nothing) if no thread recorded anything."""
+        threading.setprofile(None)
+        with self._lock:
+            profiles, self._profiles = self._profiles, []
+        for profile in profiles:
+            profile.disable()
+        profiles = [p for p in profiles if p.getstats()]
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        if path:
+            stats.dump_stats(path)
+        return stats
+
+
+@contextmanager
+def profile(path):
+    """Profile the block across all threads and dump pstats to `path`
+    (open with `python -m pstats` or snakeviz)."""
+    profiler = Profiler().start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop(path)
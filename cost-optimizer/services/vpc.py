@@ -1,53 +1,139 @@
 import boto3
+from collections import Counter
+from services.pricing import get_price
+from services.paginate import paginate, drain
+from services.client import wrap, record_drop
+from services.findings import Finding
 
 class VPCScanner:
+    """Public IPs, empty VPCs and subnets, unused security groups and idle
+    interface endpoints. One paginated ENI pass, grouped by VPC and subnet,
+    feeds every check, so the call count doesn't grow with the VPC count."""
+
     def __init__(self, ec2_client):
-        self.ec2 = ec2_client
+        self.ec2 = wrap(ec2_client)
 
-    def get_vpc_waste(self):
-        waste_list = []
-        
+    def iter_vpc_waste(self):
         # 1. SCAN FOR PUBLIC IPS (The Real Cost: $0.005/hr)
-       
+        # The same pass counts ENIs per VPC and subnet and collects the
+        # security groups in use, for the checks below
+        vpc_enis = Counter()
+        subnet_enis = Counter()
+        groups_in_use = set()
         try:
-            
-            response = self.ec2.describe_network_interfaces()
-            
-            for eni in response['NetworkInterfaces']:
-                if 'Association' in eni and 'PublicIp' in eni['Association']:
-                    public_ip = eni['Association']['PublicIp']
+            for enis in paginate(self.ec2, 'describe_network_interfaces', 'NetworkInterfaces'):
+                waste_list = []
+
+                for eni in enis:
+                    vpc_enis[eni.get('VpcId')] += 1
+                    subnet_enis[eni.get('SubnetId')] += 1
+                    groups_in_use.update(group['GroupId'] for group in eni.get('Groups', []))
+
+                    if 'Association' in eni and 'PublicIp' in eni['Association']:
+                        public_ip = eni['Association']['PublicIp']
                     
                     
-                    waste_list.append({
-                        "ID": public_ip,
-                        "Reason": "Public IPv4 ($0.005/hr) - Attached to " + eni.get('Attachment', {}).get('InstanceId', 'Unknown'),
-                        "Cost": 3.60 
-                    })
+                        waste_list.append(Finding(
+                            public_ip,
+                            "Public IPv4 ($0.005/hr) - Attached to " + eni.get('Attachment', {}).get('InstanceId', 'Unknown'),
+                            get_price('elastic_ip', self.ec2.region)
+                        ))
+
+                yield waste_list
         except Exception as e:
-            print(f"Error scanning IPs: {e}")
+            # Without a complete ENI inventory every VPC would look empty
+            record_drop('Public IPs', e)
+            return
 
         # 2. SCAN FOR EMPTY VPCS 
+        empty_vpcs = set()
+        try:
+            for vpcs in paginate(self.ec2, 'describe_vpcs', 'Vpcs'):
+                waste_list = []
+
+                for vpc in vpcs:
+                    vpc_id = vpc['VpcId']
+
+                    if not vpc_enis[vpc_id]:
+                        empty_vpcs.add(vpc_id)
+                        waste_list.append(Finding(
+                            vpc_id,
+                            "Empty VPC (No Active Resources)",
+                            0.00
+                        ))
+
+                yield waste_list
+        except Exception as e:
+            record_drop('Empty VPCs', e)
+
+        # 3. SCAN FOR EMPTY SUBNETS (inside VPCs that are in use; an empty
+        # VPC is already flagged as a whole)
+        try:
+            for subnets in paginate(self.ec2, 'describe_subnets', 'Subnets'):
+                waste_list = []
+
+                for subnet in subnets:
+                    if subnet['VpcId'] not in empty_vpcs and not subnet_enis[subnet['SubnetId']]:
+                        waste_list.append(Finding(
+                            subnet['SubnetId'],
+                            f"Empty Subnet in {subnet['VpcId']} ({subnet.get('AvailableIpAddressCount', 0)} free IPs)",
+                            0.00
+                        ))
+
+                yield waste_list
+        except Exception as e:
+            record_drop('Empty Subnets', e)
+
+        # 4. SCAN FOR UNUSED SECURITY GROUPS (not attached to any ENI and
+        # not referenced by another group's rules)
+        try:
+            groups = []
+            referenced = set()
+            for page in paginate(self.ec2, 'describe_security_groups', 'SecurityGroups'):
+                for group in page:
+                    groups.append((group['GroupId'], group['GroupName'], group.get('VpcId')))
+                    for rule in group.get('IpPermissions', []) + group.get('IpPermissionsEgress', []):
+                        referenced.update(pair['GroupId'] for pair in rule.get('UserIdGroupPairs', []) if 'GroupId' in pair)
+
+            yield [
+                Finding(group_id, f"Unused Security Group '{name}' in {vpc_id}", 0.00)
+                for group_id, name, vpc_id in groups
+                if name != 'default' and vpc_id not in empty_vpcs
+                and group_id not in groups_in_use and group_id not in referenced
+            ]
+        except Exception as e:
+            record_drop('Unused Security Groups', e)
+
+        # 5. SCAN FOR IDLE INTERFACE ENDPOINTS (billed per AZ-hour; idle
+        # when nothing but the endpoint's own ENIs lives in its VPC)
         try:
-            vpcs = self.ec2.describe_vpcs()['Vpcs']
-            for vpc in vpcs:
-                vpc_id = vpc['VpcId']
-                
-                
-                enis = self.ec2.describe_network_interfaces(
-                    Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}]
-                )['NetworkInterfaces']
-                
-                if len(enis) == 0:
-                    waste_list.append({
-                        "ID": vpc_id,
-                        "Reason": "Empty VPC (No Active Resources)",
-                        "Cost": 0.00 
-                    })
-        except Exception:
-            pass
-            
-        return waste_list
+            endpoints = []
+            endpoint_enis = Counter()
+            for page in paginate(self.ec2, 'describe_vpc_endpoints', 'VpcEndpoints'):
+                for endpoint in page:
+                    if endpoint.get('VpcEndpointType') == 'Interface':
+                        endpoints.append(endpoint)
+                        endpoint_enis[endpoint['VpcId']] += len(endpoint.get('NetworkInterfaceIds', []))
+
+            yield [
+                Finding(
+                    endpoint['VpcEndpointId'],
+                    f"Idle VPC Endpoint ({endpoint.get('ServiceName', 'Unknown')}) - No other resources in {endpoint['VpcId']}",
+                    get_price('vpc_endpoint', self.ec2.region) * max(1, len(endpoint.get('SubnetIds', [])))
+                )
+                for endpoint in endpoints
+                if vpc_enis[endpoint['VpcId']] <= endpoint_enis[endpoint['VpcId']]
+            ]
+        except Exception as e:
+            record_drop('Idle VPC Endpoints', e)
+
+    def get_vpc_waste(self):
+        return drain(self.iter_vpc_waste())
 
 def scan_vpc(ec2_client):
     scanner = VPCScanner(ec2_client)
-    return scanner.get_vpc_waste()
\ No newline at end of file
+    return scanner.get_vpc_waste()
+
+def stream_vpc(ec2_client):
+    scanner = VPCScanner(ec2_client)
+    return scanner.iter_vpc_waste()
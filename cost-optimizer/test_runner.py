@@ -35,13 +35,13 @@ def test_my_tool():
 
     # 4. VERIFY RESULTS
     print("\n RESULTS:")
-    if len(nat_waste) > 0: print(f" PASSED: Found NAT Gateway ({nat_waste[0]['Cost']})")
+    if len(nat_waste) > 0: print(f" PASSED: Found NAT Gateway ({nat_waste[0].cost})")
     else: print(" FAILED: Missed NAT Gateway")
 
-    if len(snap_waste) > 0: print(f" PASSED: Found Snapshot ({snap_waste[0]['Cost']})")
+    if len(snap_waste) > 0: print(f" PASSED: Found Snapshot ({snap_waste[0].cost})")
     else: print(" FAILED: Missed Snapshot")
 
-    if len(eks_waste) > 0: print(f" PASSED: Found EKS Cluster ({eks_waste[0]['Cost']})")
+    if len(eks_waste) > 0: print(f" PASSED: Found EKS Cluster ({eks_waste[0].cost})")
     else: print(" FAILED: Missed EKS Cluster")
 
 if __name__ == "__main__":
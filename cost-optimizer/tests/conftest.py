@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+from moto import mock_aws
+
+# Tests import the app the way main.py does: `services` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import cache, client, inventory, pricing  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    # No retry sleeps, no on-disk cache or inventory, fallback prices only
+    monkeypatch.setattr(client, 'backoff', lambda attempt: 0)
+    monkeypatch.setattr(cache, 'CACHE', None)
+    monkeypatch.setattr(inventory, 'INVENTORY', None)
+    monkeypatch.setattr(pricing, 'INDEX', None)
+    monkeypatch.setattr(pricing, '_default_checked', True)
+    client.STATS.reset()
+    yield
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """Moto-backed AWS with dummy credentials."""
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SECURITY_TOKEN', 'AWS_SESSION_TOKEN'):
+        monkeypatch.setenv(name, 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        yield
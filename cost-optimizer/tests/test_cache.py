@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import pytest
+
+from services import cache as cache_module
+from services.cache import ScanCache
+from services.client import STATS, wrap
+from services.metrics import MetricsEngine
+
+
+@pytest.fixture
+def scan_cache(tmp_path):
+    return ScanCache(str(tmp_path / 'cache.sqlite'))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_their_type_ttl(scan_cache, clock):
+    scan_cache.put('snap', 'DescribeSnapshots', {'Snapshots': []})
+    scan_cache.put('inst', 'DescribeInstances', {'Reservations': []})
+
+    clock[0] += 601
+    assert scan_cache.get('snap', 'DescribeSnapshots') == (True, {'Snapshots': []})
+    assert scan_cache.get('inst', 'DescribeInstances') == (False, None)
+    assert (scan_cache.hits, scan_cache.misses) == (1, 1)
+
+
+def test_max_age_overrides_every_ttl(tmp_path, clock):
+    scan_cache = ScanCache(str(tmp_path / 'cache.sqlite'), max_age=60)
+    scan_cache.put('snap', 'DescribeSnapshots', 1)
+    clock[0] += 61
+    assert scan_cache.get('snap', 'DescribeSnapshots') == (False, None)
+
+
+def test_prune_and_clear(scan_cache, clock):
+    scan_cache.put('old', 'DescribeSnapshots', 1)
+    clock[0] += max(scan_cache.ttls.values()) + 1
+    scan_cache.put('new', 'DescribeSnapshots', 2)
+
+    scan_cache.prune()
+    assert scan_cache.get('old', 'DescribeSnapshots') == (False, None)
+    assert scan_cache.get('new', 'DescribeSnapshots') == (True, 2)
+
+    scan_cache.clear()
+    assert scan_cache.get('new', 'DescribeSnapshots') == (False, None)
+
+
+def test_keys(scan_cache):
+    key = scan_cache.key('111', 'us-east-1', 'DescribeVolumes', {'Filters': []})
+    assert key == scan_cache.key('111', 'us-east-1', 'DescribeVolumes', {'Filters': [], 'PaginationConfig': {'PageSize': 5}})
+    assert key != scan_cache.key('222', 'us-east-1', 'DescribeVolumes', {'Filters': []})
+    assert key != scan_cache.key('111', 'us-east-1', 'DescribeVolumes', {'Filters': []}, page=1)
+
+    # Metric windows slide with the clock, so only their length is keyed
+    now = datetime.now(timezone.utc)
+    window = lambda end, days: {'StartTime': end - timedelta(days=days), 'EndTime': end}
+    metric_key = scan_cache.key('111', 'us-east-1', 'GetMetricData', window(now, 7))
+    assert metric_key == scan_cache.key('111', 'us-east-1', 'GetMetricData', window(now + timedelta(minutes=5), 7))
+    assert metric_key != scan_cache.key('111', 'us-east-1', 'GetMetricData', window(now, 1))
+
+
+def test_wrapped_client_serves_fresh_responses_from_cache(aws, scan_cache):
+    ec2 = boto3.client('ec2', region_name='us-east-1')
+    ec2.create_volume(AvailabilityZone='us-east-1a', Size=10)
+    cached = wrap(ec2, account='111', cache=scan_cache)
+
+    first = list(cached.get_paginator('describe_volumes').paginate())
+    ec2.create_volume(AvailabilityZone='us-east-1a', Size=20)
+    second = list(cached.get_paginator('describe_volumes').paginate())
+
+    assert [len(page['Volumes']) for page in second] == [len(page['Volumes']) for page in first] == [1]
+    assert STATS.totals()['calls'] == 1
+
+    # Once stale, the listing is fetched again and picks up the new volume
+    scan_cache.ttls['volumes'] = -1
+    third = list(cached.get_paginator('describe_volumes').paginate())
+    assert [len(page['Volumes']) for page in third] == [2]
+    assert STATS.totals()['calls'] == 2
+
+
+def test_writes_are_never_cached(scan_cache):
+    assert not scan_cache.cacheable('CreateVolume')
+    assert not scan_cache.cacheable('DeleteSnapshot')
+    assert scan_cache.cacheable('DescribeVolumes')
+
+
+def test_metric_queries_hit_whatever_order_they_are_queued_in(aws, scan_cache):
+    raw = boto3.client('cloudwatch', region_name='us-east-1')
+    now = datetime.now(timezone.utc)
+    for n, instance in enumerate(('i-a', 'i-b', 'i-c')):
+        raw.put_metric_data(Namespace='AWS/EC2', MetricData=[{
+            'MetricName': 'CPUUtilization', 'Dimensions': [{'Name': 'InstanceId', 'Value': instance}],
+            'Timestamp': now - timedelta(hours=1), 'Value': float(n + 1)}])
+    cw = wrap(raw, account='111', cache=scan_cache)
+
+    def scan(*instances):
+        # A fresh engine per scan, as each scan builds its own clients
+        engine = MetricsEngine(cw)
+        ids = {i: engine.add_query('AWS/EC2', 'CPUUtilization', [{'Name': 'InstanceId', 'Value': i}], 'Average')
+               for i in instances}
+        return {i: engine.values(query_id) for i, query_id in ids.items()}, engine.api_calls
+
+    assert scan('i-a', 'i-b') == ({'i-a': [1.0], 'i-b': [2.0]}, 1)
+    # Same queries, other order and ids: nothing to fetch
+    assert scan('i-b', 'i-a') == ({'i-b': [2.0], 'i-a': [1.0]}, 0)
+    # Only the new query goes out
+    assert scan('i-c', 'i-b', 'i-a') == ({'i-c': [3.0], 'i-b': [2.0], 'i-a': [1.0]}, 1)
+    assert STATS.snapshot()['calls']['us-east-1:GetMetricData'] == 2
+    assert not scan_cache.cacheable('GetMetricData')
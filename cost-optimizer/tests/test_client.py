@@ -0,0 +1,115 @@
+import datetime
+import threading
+
+import boto3
+import pytest
+from botocore.credentials import RefreshableCredentials
+from botocore.exceptions import ClientError
+
+from services import client as client_module
+from services.client import STATS, THROTTLE_ATTEMPTS, MAX_ATTEMPTS, wrap
+from services.metrics import MetricsEngine
+from services.regions import credentials_session, region_session
+
+
+def error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'ListObjectsV2')
+
+
+@pytest.fixture
+def bucket(aws):
+    s3 = boto3.client('s3', region_name='us-east-1')
+    s3.create_bucket(Bucket='resume-bucket')
+    for i in range(5):
+        s3.put_object(Bucket='resume-bucket', Key=f"key-{i}", Body=b'x')
+    return s3
+
+
+def fail_calls(boto_client, event, failures):
+    """Raise failures[n] on the n-th call (None lets it through); returns
+    the params each call was made with."""
+    calls = []
+
+    def hook(params, **kwargs):
+        calls.append(dict(params))
+        if len(calls) <= len(failures) and failures[len(calls) - 1]:
+            raise failures[len(calls) - 1]
+
+    boto_client.meta.events.register(event, hook)
+    return calls
+
+
+def test_throttled_page_resumes_from_its_token(bucket):
+    calls = fail_calls(bucket, 'before-parameter-build.s3.ListObjectsV2', [None, None, error('SlowDown')])
+
+    pages = list(wrap(bucket).get_paginator('list_objects_v2').paginate(
+        Bucket='resume-bucket', PaginationConfig={'PageSize': 2}))
+
+    assert [page['KeyCount'] for page in pages] == [2, 2, 1]
+    # Page 3 was retried with page 2's continuation token; pages 1-2 were not re-fetched
+    assert len(calls) == 4
+    assert 'ContinuationToken' not in calls[0]
+    assert calls[2]['ContinuationToken'] == calls[3]['ContinuationToken']
+    assert STATS.totals()['throttles'] == 1
+    assert STATS.totals()['pages'] == 3
+
+
+def test_resume_token_is_none_on_the_last_page(bucket):
+    paginator = wrap(bucket).get_paginator('list_objects_v2')
+    model = paginator._model()
+    pages = bucket.get_paginator('list_objects_v2').paginate(Bucket='resume-bucket', PaginationConfig={'PageSize': 2})
+    tokens = [client_module.resume_token(pages, page, model) for page in pages]
+    assert [token is None for token in tokens] == [False, False, True]
+
+
+def test_non_retryable_error_raises_at_once(bucket):
+    calls = fail_calls(bucket, 'before-parameter-build.s3.ListObjectsV2', [error('AccessDenied')])
+    with pytest.raises(ClientError):
+        wrap(bucket).list_objects_v2(Bucket='resume-bucket')
+    assert len(calls) == 1
+    assert STATS.totals()['retries'] == 0
+
+
+@pytest.mark.parametrize('code, attempts', [('Throttling', THROTTLE_ATTEMPTS), ('InternalError', MAX_ATTEMPTS)])
+def test_retries_give_up_after_their_attempts(bucket, code, attempts):
+    calls = fail_calls(bucket, 'before-parameter-build.s3.ListObjectsV2', [error(code)] * 50)
+    with pytest.raises(ClientError):
+        wrap(bucket).list_objects_v2(Bucket='resume-bucket')
+    assert len(calls) == attempts
+    assert STATS.totals()['retries'] == attempts - 1
+
+
+def test_transient_error_then_success(bucket):
+    fail_calls(bucket, 'before-parameter-build.s3.ListObjectsV2', [error('ServiceUnavailable')])
+    assert wrap(bucket).list_objects_v2(Bucket='resume-bucket')['KeyCount'] == 5
+
+
+def test_sessions_share_refreshable_credentials():
+    fetched = []
+
+    def fetch():
+        fetched.append(1)
+        expiry = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=1)
+        return {'access_key': f"AK{len(fetched)}", 'secret_key': 's', 'token': 't', 'expiry_time': expiry.isoformat()}
+
+    credentials = RefreshableCredentials.create_from_metadata(
+        metadata=fetch(), refresh_using=fetch, method='sts-assume-role')
+    session = credentials_session(credentials)
+    regional = region_session(session, 'eu-west-1')
+
+    assert regional.region_name == 'eu-west-1'
+    assert regional.get_credentials() is credentials
+    # Already inside the refresh window, so reading them renews the token
+    assert regional.get_credentials().get_frozen_credentials().access_key == 'AK2'
+
+
+def test_metric_call_count_is_exact_across_threads(aws):
+    engine = MetricsEngine(boto3.client('cloudwatch', region_name='us-east-1'), max_workers=8)
+    for i in range(4000):
+        engine.add_query('AWS/EC2', 'CPUUtilization', [{'Name': 'InstanceId', 'Value': f"i-{i}"}], 'Average')
+    threads = [threading.Thread(target=engine.run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert engine.api_calls == 8
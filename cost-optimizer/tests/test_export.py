@@ -0,0 +1,86 @@
+import gzip
+import json
+import threading
+
+import pytest
+
+from services.export import COLUMNS, Exports, ParquetWriter, open_writer
+from services.findings import Finding
+
+
+def pages():
+    return [
+        ('EBS Volumes', [Finding('vol-1', 'Unattached', 1.0, 'us-east-1', '111'),
+                         Finding('vol-2', 'Unattached', 2.5, 'eu-west-1', '222')]),
+        ('Elastic IPs', []),
+        ('Elastic IPs', [Finding('eipalloc-1', 'Unattached', 3.65)]),
+    ]
+
+
+def read(fmt, path):
+    if fmt == 'ndjson':
+        with gzip.open(path, 'rt') as f:
+            return [json.loads(line) for line in f]
+    pa = pytest.importorskip('pyarrow')
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+    else:
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+    return table.to_pylist()
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'parquet', 'arrow'])
+def test_every_format_round_trips(tmp_path, fmt):
+    if fmt != 'ndjson':
+        pytest.importorskip('pyarrow')
+    with open_writer(fmt, outputs=str(tmp_path)) as writer:
+        for service, page in pages():
+            writer.write(service, page)
+
+    rows = read(fmt, writer.path)
+    assert writer.rows == len(rows) == 3
+    assert list(rows[0]) == COLUMNS
+    assert [(r['Service'], r['ID'], r['Account'], r['Region'], r['Cost']) for r in rows] == [
+        ('EBS Volumes', 'vol-1', '111', 'us-east-1', 1.0),
+        ('EBS Volumes', 'vol-2', '222', 'eu-west-1', 2.5),
+        ('Elastic IPs', 'eipalloc-1', '-', '-', 3.65),
+    ]
+    # One timestamp for the whole scan
+    assert len({str(r['ScannedAt']) for r in rows}) == 1
+
+
+def test_parquet_writes_a_row_group_per_batch(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'findings.parquet')
+    with ParquetWriter(path, batch_rows=100) as writer:
+        for i in range(25):
+            writer.write('EBS Volumes', [Finding(f"vol-{i}-{j}", 'Unattached', 1.0) for j in range(10)])
+
+    assert pq.ParquetFile(path).metadata.num_row_groups == 3
+    assert pq.read_table(path).num_rows == 250
+
+
+def test_concurrent_writers_lose_no_rows(tmp_path):
+    pytest.importorskip('pyarrow')
+    exports = Exports(['ndjson', 'arrow'], outputs=str(tmp_path))
+
+    def scan(n):
+        for i in range(50):
+            exports.on_page('us-east-1', 'EBS Volumes', [Finding(f"vol-{n}-{i}", 'Unattached', 1.0)])
+
+    threads = [threading.Thread(target=scan, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ndjson_path, arrow_path = exports.close()
+    assert {r['ID'] for r in read('ndjson', ndjson_path)} == {f"vol-{n}-{i}" for n in range(8) for i in range(50)}
+    assert len(read('arrow', arrow_path)) == 400
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        Exports(['csv'], outputs=str(tmp_path))
@@ -0,0 +1,69 @@
+import pytest
+
+from services.findings import Finding, FindingsTable
+
+
+def test_finding_is_slotted_and_round_trips():
+    finding = Finding('vol-1', 'Unattached Volume (10 GB)', '1.5')
+    with pytest.raises(AttributeError):
+        finding.extra = 1
+
+    finding.tag({'Region': 'eu-west-1', 'Account': '111'})
+    assert finding.cost == 1.5
+    assert Finding.from_dict(finding.to_dict()) == finding
+    assert finding.to_dict() == {'ID': 'vol-1', 'Reason': 'Unattached Volume (10 GB)', 'Cost': 1.5,
+                                 'Region': 'eu-west-1', 'Account': '111'}
+
+
+def test_tag_keeps_fields_the_tags_leave_out():
+    finding = Finding('vol-1', 'Unattached', 1.0, region='us-east-1')
+    finding.tag({'Account': '111'})
+    assert (finding.region, finding.account) == ('us-east-1', '111')
+
+
+@pytest.fixture
+def table():
+    table = FindingsTable(['EBS Volumes', 'Elastic IPs', 'S3 Buckets'])
+    table.add('Elastic IPs', [Finding('eip-1', 'Unattached', 3.65, 'us-east-1', '111')])
+    table.add('EBS Volumes', [Finding('vol-1', 'Unattached', 1.0, 'us-east-1', '111'),
+                              Finding('vol-2', 'Unattached', 8.0, 'eu-west-1', '222')])
+    table.add('EBS Volumes', [])
+    return table
+
+
+def test_table_totals_and_summary(table):
+    assert len(table) == 3
+    assert table.total() == pytest.approx(12.65)
+    assert table.services == ['EBS Volumes', 'Elastic IPs', 'S3 Buckets']
+
+    summary = table.summary()
+    # Registry order, services without findings left out
+    assert list(summary['Service']) == ['EBS Volumes', 'Elastic IPs']
+    assert list(summary['Count']) == [2, 1]
+    assert list(summary['Cost']) == pytest.approx([9.0, 3.65])
+
+    by_account = table.summary(by=('Account',))
+    assert dict(zip(by_account['Account'], by_account['Cost'])) == pytest.approx({'111': 4.65, '222': 8.0})
+
+
+def test_table_ordering(table):
+    assert list(table.by_cost()['ID']) == ['vol-2', 'eip-1', 'vol-1']
+    assert list(table.top(2)['ID']) == ['vol-2', 'eip-1']
+    assert table.has_accounts()
+
+
+def test_records_and_frame_refresh_after_add(table):
+    assert len(table.records()) == 3
+    table.add('S3 Buckets', [Finding('bucket', 'Stale', 2.0)])
+    records = table.records()
+    assert records[-1] == {'Service': 'S3 Buckets', 'Account': '-', 'Region': '-', 'ID': 'bucket',
+                           'Reason': 'Stale', 'Cost': 2.0}
+
+
+def test_empty_table():
+    table = FindingsTable()
+    assert len(table) == 0
+    assert table.total() == 0.0
+    assert table.summary().empty
+    assert not table.has_accounts()
+    assert table.records() == []
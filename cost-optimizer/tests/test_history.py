@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from services.findings import Finding, FindingsTable
+from services.history import History
+
+DAY = 86400
+# Noon UTC three days ago, so runs a few seconds apart share a day
+NOON = (time.time() // DAY - 3) * DAY + DAY / 2
+
+
+@pytest.fixture
+def history(tmp_path):
+    return History(str(tmp_path / 'history.sqlite'))
+
+
+def table(*findings):
+    findings_table = FindingsTable()
+    for service, finding in findings:
+        findings_table.add(service, [finding])
+    return findings_table
+
+
+def volume(resource_id, cost=1.0):
+    return ('EBS Volumes', Finding(resource_id, 'Unattached', cost, 'us-east-1', '111'))
+
+
+def test_streaks_keep_first_seen_until_a_resource_is_resolved(history):
+    start = time.time() - 10 * DAY
+    history.record(table(volume('vol-1'), volume('vol-2')), scanned_at=start)
+    history.record(table(volume('vol-1')), scanned_at=start + DAY)
+    history.record(table(volume('vol-1'), volume('vol-2')), scanned_at=start + 2 * DAY)
+
+    vol_1 = history.resource('vol-1')
+    assert (vol_1['first_seen'], vol_1['days'], vol_1['open']) == (start, 2, True)
+    assert len(vol_1['history']) == 3
+    # vol-2 dropped out on day 2, so its streak starts over
+    assert history.resource('vol-2')['first_seen'] == start + 2 * DAY
+    assert history.resource('vol-3') is None
+
+
+def test_resource_flagged_twice_in_one_run_keeps_its_streak(history):
+    start = time.time() - 10 * DAY
+    twice = lambda: table(('VPC & Public IPs', Finding('203.0.113.7', 'Public IPv4', 3.65)),
+                          ('VPC & Public IPs', Finding('203.0.113.7', 'Idle public IPv4', 3.65)))
+    history.record(twice(), scanned_at=start)
+    history.record(twice(), scanned_at=start + DAY)
+
+    assert history.resource('203.0.113.7')['first_seen'] == start
+    assert history.oldest()['Days'].tolist() == [1]
+
+
+def test_trend_uses_each_days_last_run(history):
+    history.record(table(volume('vol-1', 1.0)), scanned_at=NOON)
+    history.record(table(volume('vol-1', 1.0), volume('vol-2', 2.0)), scanned_at=NOON + 60)
+    history.record(table(volume('vol-1', 1.0)), scanned_at=NOON + DAY)
+
+    trend = history.trend(days=7)
+    assert trend['Count'].tolist() == [2, 1]
+    assert trend['Cost'].tolist() == pytest.approx([3.0, 1.0])
+    assert history.trend(days=7, by='Account')['Account'].tolist() == ['111', '111']
+
+
+def test_oldest_lists_only_open_findings(history):
+    start = time.time() - 5 * DAY
+    history.record(table(volume('vol-1'), volume('vol-2')), scanned_at=start)
+    history.record(table(volume('vol-2'), volume('vol-3')), scanned_at=start + 3 * DAY)
+
+    oldest = history.oldest()
+    assert oldest['ID'].tolist() == ['vol-2', 'vol-3']
+    assert oldest['Days'].tolist() == [3, 0]
+    assert history.runs()['findings'].tolist() == [2, 2]
+
+
+def test_empty_history(history):
+    assert history.oldest().empty
+    assert history.trend().empty
+    assert history.record(FindingsTable()) == 1
@@ -0,0 +1,117 @@
+import json
+
+import boto3
+import pytest
+
+from services import inventory
+from services.ec2 import EC2Scanner
+from services.findings import Finding, FindingsTable
+from services.inventory import Inventory, fingerprint
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = Inventory(str(tmp_path / 'inventory.sqlite'))
+    monkeypatch.setattr(inventory, 'INVENTORY', store)
+    return store
+
+
+def test_verdict_is_reused_until_the_fingerprint_changes(store):
+    stamp = fingerprint('running', 't3.micro')
+    assert store.lookup('-:us-east-1', 'ec2', 'i-1', stamp) == (False, None)
+
+    store.record('-:us-east-1', 'ec2', 'i-1', stamp, [Finding('i-1', 'Zombie', 7.5)])
+    assert store.lookup('-:us-east-1', 'ec2', 'i-1', stamp) == (True, [Finding('i-1', 'Zombie', 7.5)])
+    assert store.lookup('-:us-east-1', 'ec2', 'i-1', fingerprint('running', 't3.large')) == (False, None)
+    assert store.lookup('-:eu-west-1', 'ec2', 'i-1', stamp) == (False, None)
+    assert (store.reused, store.checked) == (1, 3)
+
+
+def test_stale_verdicts_are_rechecked(store):
+    store.max_age = -1
+    store.record('-:us-east-1', 'ec2', 'i-1', 'x', [])
+    assert store.lookup('-:us-east-1', 'ec2', 'i-1', 'x') == (False, None)
+
+
+def test_prune_drops_resources_a_complete_listing_missed(store):
+    for resource_id in ('i-1', 'i-2'):
+        store.record('-:us-east-1', 'ec2', resource_id, 'x', [])
+    store.record('-:us-east-1', 'nat', 'nat-1', 'x', [])
+
+    # Only i-1 came back, and only the EC2 listing ran to the end
+    store.lookup('-:us-east-1', 'ec2', 'i-1', 'x')
+    store.listed('-:us-east-1', 'ec2')
+    assert store.prune() == 1
+
+    rows = store._connect().execute("SELECT kind, id FROM resources ORDER BY id").fetchall()
+    assert rows == [('ec2', 'i-1'), ('nat', 'nat-1')]
+    # Nothing listed since, so nothing more goes
+    assert store.prune() == 0
+
+
+def test_ec2_scanner_reuses_then_rechecks_on_attachment_change(aws, store):
+    ec2 = boto3.client('ec2', region_name='us-east-1')
+    cw = boto3.client('cloudwatch', region_name='us-east-1')
+    instance = ec2.run_instances(ImageId='ami-12c6146b', MinCount=1, MaxCount=1, InstanceType='t3.micro')['Instances'][0]
+
+    EC2Scanner(ec2, cw).get_ec2_waste()
+    EC2Scanner(ec2, cw).get_ec2_waste()
+    assert (store.reused, store.checked) == (1, 1)
+
+    volume = ec2.create_volume(AvailabilityZone=instance['Placement']['AvailabilityZone'], Size=10)
+    ec2.attach_volume(VolumeId=volume['VolumeId'], InstanceId=instance['InstanceId'], Device='/dev/sdf')
+    EC2Scanner(ec2, cw).get_ec2_waste()
+    assert (store.reused, store.checked) == (1, 2)
+
+
+def test_terminated_instance_is_pruned_after_a_scan(aws, store):
+    ec2 = boto3.client('ec2', region_name='us-east-1')
+    cw = boto3.client('cloudwatch', region_name='us-east-1')
+    ids = [i['InstanceId'] for i in ec2.run_instances(ImageId='ami-12c6146b', MinCount=2, MaxCount=2)['Instances']]
+
+    EC2Scanner(ec2, cw).get_ec2_waste()
+    store.prune()
+    ec2.terminate_instances(InstanceIds=ids[:1])
+    EC2Scanner(ec2, cw).get_ec2_waste()
+
+    assert store.prune() == 1
+    assert [row[0] for row in store._connect().execute("SELECT id FROM resources")] == ids[1:]
+
+
+def test_write_diff(tmp_path):
+    def table(*ids):
+        findings = FindingsTable()
+        findings.add('EBS Volumes', [Finding(i, 'Unattached', 1.0) for i in ids])
+        return findings
+
+    last = str(tmp_path / 'last.json')
+    first = inventory.write_diff(table('vol-1', 'vol-2'), last, str(tmp_path))
+    assert len(first['new']) == 2
+
+    diff = inventory.write_diff(table('vol-2', 'vol-3'), last, str(tmp_path))
+    assert [d['ID'] for d in diff['new']] == ['vol-3']
+    assert [d['ID'] for d in diff['resolved']] == ['vol-1']
+    assert [d['ID'] for d in diff['unchanged']] == ['vol-2']
+    with open(diff['path']) as f:
+        assert json.load(f)['resolved'][0]['ID'] == 'vol-1'
+
+
+def test_each_scope_keeps_its_own_baseline(tmp_path):
+    outputs = str(tmp_path)
+    both = inventory.baseline_path(['111'], ['us-east-1', 'eu-west-1'], outputs)
+    assert both == inventory.baseline_path(['111'], ['eu-west-1', 'us-east-1'], outputs)
+    one_region = inventory.baseline_path(['111'], ['us-east-1'], outputs)
+    other_account = inventory.baseline_path(['222'], ['us-east-1', 'eu-west-1'], outputs)
+    assert len({both, one_region, other_account}) == 3
+
+    def table(*findings):
+        findings_table = FindingsTable()
+        findings_table.add('EBS Volumes', [Finding(i, 'Unattached', 1.0, region, '111') for i, region in findings])
+        return findings_table
+
+    inventory.write_diff(table(('vol-1', 'us-east-1'), ('vol-2', 'eu-west-1')), both, outputs)
+    # A one-region scan neither resolves the other region's findings...
+    assert inventory.write_diff(table(('vol-1', 'us-east-1')), one_region, outputs)['resolved'] == []
+    # ...nor moves the full scan's baseline
+    diff = inventory.write_diff(table(('vol-1', 'us-east-1'), ('vol-2', 'eu-west-1')), both, outputs)
+    assert diff['new'] == [] and diff['resolved'] == [] and len(diff['unchanged']) == 2
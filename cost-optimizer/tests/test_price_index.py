@@ -0,0 +1,126 @@
+import csv
+import json
+import random
+
+import pytest
+
+from services import price_index, pricing
+from services.price_index import HOURS_PER_MONTH, PriceIndex
+
+HEADER = ["SKU", "OfferTermCode", "RateCode", "TermType", "PriceDescription", "EffectiveDate",
+          "StartingRange", "EndingRange", "Unit", "PricePerUnit", "Currency", "Product Family",
+          "serviceCode", "Location", "Region Code", "Instance Type", "Operating System", "Tenancy",
+          "Pre Installed S/W", "CapacityStatus", "Volume API Name", "usageType"]
+REGIONS = ['us-east-1', 'eu-west-1', 'ap-south-1', 'ap-southeast-2']
+TYPES = [f"{family}.{size}" for family in ('t3', 'm5', 'c6g', 'r7i') for size in ('micro', 'large', '12xlarge')]
+
+
+def offer_rows(seed):
+    """Bulk-CSV rows for EC2 instances and gp3 volumes, plus the rows the
+    index must skip: other OSes, reserved terms, later tiers, other currencies."""
+    rng = random.Random(seed)
+    rows = []
+    for region in REGIONS:
+        for instance_type in TYPES:
+            # Several SKUs can map to one key; the cheapest is indexed
+            for _ in range(rng.randint(1, 3)):
+                rows.append(dict(os='Linux', term='OnDemand', start='0', unit='Hrs', currency='USD',
+                                 family='Compute Instance', region=region, type=instance_type,
+                                 price=f"{rng.uniform(0.001, 5):.4f}"))
+            rows.append(dict(os='Windows', term='OnDemand', start='0', unit='Hrs', currency='USD',
+                             family='Compute Instance', region=region, type=instance_type, price='9.0'))
+            rows.append(dict(os='Linux', term='Reserved', start='0', unit='Hrs', currency='USD',
+                             family='Compute Instance', region=region, type=instance_type, price='0.0001'))
+        rows.append(dict(os='', term='OnDemand', start='0', unit='GB-Mo', currency='USD', family='Storage',
+                         region=region, volume='gp3', price=f"{rng.uniform(0.05, 0.2):.4f}"))
+        rows.append(dict(os='', term='OnDemand', start='100', unit='GB-Mo', currency='USD', family='Storage',
+                         region=region, volume='gp3', price='0.0001'))
+        rows.append(dict(os='', term='OnDemand', start='0', unit='GB-Mo', currency='CNY', family='Storage',
+                         region=region, volume='gp3', price='0.0001'))
+    return rows
+
+
+def expected_prices(rows):
+    # Reference result, straight from the rows
+    prices = {}
+    for row in rows:
+        if row['term'] != 'OnDemand' or row['currency'] != 'USD' or row['start'] != '0':
+            continue
+        if row['family'] == 'Compute Instance':
+            if row['os'] != 'Linux':
+                continue
+            key, monthly = f"ec2:{row['type']}", float(row['price']) * HOURS_PER_MONTH
+        else:
+            key, monthly = f"ebs:{row['volume']}", float(row['price'])
+        prices[(row['region'], key)] = min(monthly, prices.get((row['region'], key), monthly))
+    return prices
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerows([["FormatVersion", "v1.0"], ["Disclaimer", "test"], ["OfferCode", "AmazonEC2"]])
+        writer.writerow(HEADER)
+        for n, row in enumerate(rows):
+            writer.writerow([f"SKU{n}", "T", "R", row['term'], "", "", row['start'], "Inf", row['unit'],
+                             row['price'], row['currency'], row['family'], "AmazonEC2", "", row['region'],
+                             row.get('type', ''), row['os'], "Shared", "NA", "Used", row.get('volume', ''), ""])
+
+
+def write_json(path, rows):
+    products, terms = {}, {}
+    for n, row in enumerate(rows):
+        if row['term'] != 'OnDemand':
+            continue
+        attributes = {'regionCode': row['region'], 'operatingSystem': row['os'], 'tenancy': 'Shared',
+                      'preInstalledSw': 'NA', 'capacitystatus': 'Used'}
+        if 'type' in row:
+            attributes['instanceType'] = row['type']
+        if 'volume' in row:
+            attributes['volumeApiName'] = row['volume']
+        products[f"SKU{n}"] = {'productFamily': row['family'], 'attributes': attributes}
+        terms[f"SKU{n}"] = {'T': {'priceDimensions': {'D': {
+            'unit': row['unit'], 'beginRange': row['start'], 'pricePerUnit': {row['currency']: row['price']}}}}}
+    with open(path, 'w') as f:
+        json.dump({'offerCode': 'AmazonEC2', 'products': products, 'terms': {'OnDemand': terms}}, f)
+
+
+@pytest.mark.parametrize('seed', [1, 2])
+@pytest.mark.parametrize('source', ['AmazonEC2.csv', 'AmazonEC2.json'])
+def test_index_lookups_match_the_source(tmp_path, seed, source):
+    rows = offer_rows(seed)
+    path = str(tmp_path / source)
+    (write_json if source.endswith('.json') else write_csv)(path, rows)
+    expected = expected_prices(rows)
+
+    assert price_index.build([path], str(tmp_path / 'index.bin')) == len(expected)
+    index = PriceIndex(str(tmp_path / 'index.bin'))
+    try:
+        for (region, key), monthly in expected.items():
+            assert index.lookup(region, key) == pytest.approx(monthly), (region, key)
+        assert index.lookup('us-east-1', 'ec2:x9.huge') is None
+        assert index.lookup('eu-central-1', 'ec2:t3.micro') is None
+        assert index.lookup('us-east-1', 'ec2:t3.micr') is None
+        assert index.lookup('us-east-1', 'ec2:' + 'x' * 200) is None
+    finally:
+        index.close()
+
+
+def test_pricing_falls_back_without_an_index_entry(tmp_path):
+    rows = offer_rows(3)
+    write_csv(str(tmp_path / 'AmazonEC2.csv'), rows)
+    price_index.build([str(tmp_path / 'AmazonEC2.csv')], str(tmp_path / 'index.bin'))
+    expected = expected_prices(rows)
+
+    fallback = pricing.get_ec2_price('t3.micro')
+    pricing.configure(str(tmp_path / 'index.bin'))
+    assert pricing.get_ec2_price('t3.micro', 'eu-west-1') == pytest.approx(expected[('eu-west-1', 'ec2:t3.micro')])
+    # No region, or a region the index lacks: the built-in table
+    assert pricing.get_ec2_price('t3.micro') == fallback
+    assert pricing.get_ec2_price('t3.micro', 'eu-central-1') == fallback
+
+
+def test_rejects_files_that_are_not_an_index(tmp_path):
+    (tmp_path / 'bogus.bin').write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        PriceIndex(str(tmp_path / 'bogus.bin'))
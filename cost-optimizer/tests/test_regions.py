@@ -0,0 +1,87 @@
+import sys
+import threading
+
+import boto3
+import pytest
+
+import main
+from services.accounts import scan_accounts
+from services.findings import Finding, FindingsTable
+from services.regions import plan_jobs, scan_regions
+from services.scheduler import ScanScheduler
+
+REGIONS = ['us-east-1', 'eu-west-1', 'ap-south-1']
+
+
+def test_global_scanners_run_only_in_the_first_region():
+    scans = [{'name': 'S3 Buckets', 'global': True}, {'name': 'EBS Volumes'}]
+    jobs = [(region, scan['name']) for region, scan in plan_jobs(REGIONS, scans)]
+    assert jobs == [('us-east-1', 'S3 Buckets'),
+                    ('us-east-1', 'EBS Volumes'), ('eu-west-1', 'EBS Volumes'), ('ap-south-1', 'EBS Volumes')]
+    assert plan_jobs([], scans) == []
+
+
+def test_scan_regions_tags_findings_and_times_every_scanner(aws):
+    scans = [{'name': 'S3 Buckets', 'global': True, 'clients': [],
+              'stream': lambda: iter([[Finding('bucket', 'Stale', 1.0)]])},
+             {'name': 'EBS Volumes', 'clients': ['ec2'],
+              'stream': lambda ec2: iter([[Finding(f"vol-{ec2.meta.region_name}", 'Unattached', 1.0)]])}]
+
+    findings, timings = scan_regions(REGIONS[:2], session=boto3.Session(), scans=scans)
+    assert sorted((r['ID'], r['Region']) for r in findings.records()) == [
+        ('bucket', 'global'), ('vol-eu-west-1', 'eu-west-1'), ('vol-us-east-1', 'us-east-1')]
+    assert sorted(timings['scanners']) == [('eu-west-1', 'EBS Volumes'), ('global', 'S3 Buckets'),
+                                           ('us-east-1', 'EBS Volumes')]
+
+
+def test_main_scans_with_its_session(monkeypatch):
+    session = boto3.Session(region_name='eu-west-1')
+    seen = []
+
+    def fake_scan_regions(regions, session=None, **kwargs):
+        seen.append(session)
+        return FindingsTable(), {'regions': {}, 'scanners': {}}
+
+    monkeypatch.setattr(main.boto3, 'Session', lambda: session)
+    monkeypatch.setattr(main, 'scan_regions', fake_scan_regions)
+    monkeypatch.setattr(sys, 'argv', ['main.py', '--no-cache', '--no-history'])
+    assert main.main() is not None
+    assert seen == [session]
+
+
+@pytest.fixture
+def gate():
+    gate = threading.Event()
+    yield gate
+    gate.set()
+
+
+def test_closing_the_account_stream_cancels_the_scan(aws, gate):
+    def slow():
+        yield [Finding('vol-1', 'Unattached', 1.0)]
+        gate.wait(5)
+        yield [Finding('vol-2', 'Unattached', 1.0)]
+
+    scheduler = ScanScheduler()
+    stream = scan_accounts(['111111111111', '222222222222'], 'Auditor', ['us-east-1'], session=boto3.Session(),
+                           scans=[{'name': 'EBS Volumes', 'clients': [], 'stream': slow}], scheduler=scheduler)
+
+    account, region, name, page = next(stream)
+    assert account in ('111111111111', '222222222222') and (region, name) == ('us-east-1', 'EBS Volumes')
+    assert [(f.id, f.account) for f in page] == [('vol-1', account)]
+
+    stream.close()
+    assert scheduler.cancelled and not scheduler.complete
+
+
+def test_account_stream_ends_when_every_scanner_is_done(aws):
+    done = []
+    pages = list(scan_accounts(
+        ['111111111111', '222222222222'], 'Auditor', REGIONS[:2], session=boto3.Session(),
+        scans=[{'name': 'EBS Volumes', 'clients': [], 'stream': lambda: iter([[Finding('vol', 'Unattached', 1.0)]])}],
+        on_done=lambda account, region, name, seconds, error: done.append((account, region, error)),
+    ))
+    assert sorted((account, region) for account, region, _, _ in pages) == [
+        ('111111111111', 'eu-west-1'), ('111111111111', 'us-east-1'),
+        ('222222222222', 'eu-west-1'), ('222222222222', 'us-east-1')]
+    assert len(done) == 4 and all(error is None for _, _, error in done)
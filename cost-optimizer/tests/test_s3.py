@@ -0,0 +1,99 @@
+import csv
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import pytest
+
+from services import s3_inventory
+from services.metrics import RegionalMetrics
+from services.s3 import STALE_DAYS, S3Scanner, split_s3
+
+GB = 1024 ** 3
+
+
+def put_daily(region, bucket, metric, storage_type, value, days=STALE_DAYS + 1):
+    cw = boto3.client('cloudwatch', region_name=region)
+    now = datetime.now(timezone.utc)
+    for day in range(1, days + 1):
+        cw.put_metric_data(Namespace='AWS/S3', MetricData=[{
+            'MetricName': metric,
+            'Dimensions': [{'Name': 'BucketName', 'Value': bucket}, {'Name': 'StorageType', 'Value': storage_type}],
+            'Timestamp': now - timedelta(days=day) + timedelta(hours=1),
+            'Value': value,
+        }])
+
+
+@pytest.fixture
+def buckets(aws):
+    s3 = boto3.client('s3', region_name='us-east-1')
+    s3.create_bucket(Bucket='archive-bucket')
+    s3.create_bucket(Bucket='eu-bucket', CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+    for region, bucket in (('us-east-1', 'archive-bucket'), ('eu-west-2', 'eu-bucket')):
+        put_daily(region, bucket, 'BucketSizeBytes', 'StandardStorage', 50 * GB)
+        put_daily(region, bucket, 'BucketSizeBytes', 'GlacierStorage', 20 * GB)
+        put_daily(region, bucket, 'NumberOfObjects', 'AllStorageTypes', 10)
+    return s3
+
+
+def test_size_sums_every_storage_class(buckets):
+    findings = S3Scanner(buckets, RegionalMetrics()).get_stale_buckets()
+    assert sorted((f.id, f.reason) for f in findings) == [
+        ('archive-bucket', f"Stale ({STALE_DAYS}+ days) - 70.0000 GB"),
+        ('eu-bucket', f"Stale ({STALE_DAYS}+ days) - 70.0000 GB"),
+    ]
+
+
+def test_growing_bucket_is_not_stale(buckets):
+    put_daily('us-east-1', 'archive-bucket', 'BucketSizeBytes', 'StandardIAStorage', 1 * GB, days=3)
+    findings = S3Scanner(buckets, RegionalMetrics()).get_stale_buckets()
+    assert [f.id for f in findings] == ['eu-bucket']
+
+
+def test_split_tasks_locate_buckets_then_judge_them_together(buckets):
+    engines = RegionalMetrics()
+    first_steps = split_s3(buckets, engines)
+    judges = [task() for task in first_steps]
+
+    # Every bucket is located and queued before any metrics are fetched
+    assert all(callable(judge) for judge in judges)
+    assert sorted(engines._engines) == ['eu-west-2', 'us-east-1']
+    assert all(engine.api_calls == 0 for engine in engines._engines.values())
+
+    findings = [f for judge in judges for f in judge()]
+    assert sorted(f.id for f in findings) == ['archive-bucket', 'eu-bucket']
+    assert all(engine.api_calls == 1 for engine in engines._engines.values())
+
+
+def write_report(root, bucket, day, size, created):
+    folder = os.path.join(root, bucket, 'config', day)
+    os.makedirs(folder)
+    with open(os.path.join(folder, 'data.csv'), 'w', newline='') as f:
+        csv.writer(f).writerow([bucket, 'key', str(size), '2020-01-01T00:00:00.000Z'])
+    with open(os.path.join(folder, 'manifest.json'), 'w') as f:
+        json.dump({
+            'sourceBucket': bucket, 'fileFormat': 'CSV', 'creationTimestamp': str(created),
+            'fileSchema': 'Bucket, Key, Size, LastModifiedDate',
+            'files': [{'key': f"{bucket}/config/{day}/data.csv"}],
+        }, f)
+
+
+def test_inventory_reports_reload_when_a_new_one_lands(tmp_path):
+    root = str(tmp_path)
+    write_report(root, 'archive-bucket', '2026-10-01', 5 * GB, 1000)
+    assert s3_inventory.load(root)['archive-bucket']['size_bytes'] == 5 * GB
+
+    write_report(root, 'archive-bucket', '2026-10-02', 7 * GB, 2000)
+    report = s3_inventory.load(root)['archive-bucket']
+    assert (report['size_bytes'], report['report']) == (7 * GB, 2000)
+    # Unchanged manifests are served from memory
+    assert s3_inventory.load(root) is s3_inventory.load(root)
+
+
+def test_inventory_report_sizes_the_bucket(buckets, tmp_path):
+    write_report(str(tmp_path), 'archive-bucket', '2026-10-01', 100 * GB, 1000)
+    findings = S3Scanner(buckets, RegionalMetrics(), report_path=str(tmp_path)).get_stale_buckets()
+    reasons = {f.id: f.reason for f in findings}
+    assert reasons['archive-bucket'].endswith('- 100.0000 GB')
+    assert reasons['eu-bucket'].endswith('- 70.0000 GB')
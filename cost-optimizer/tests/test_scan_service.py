@@ -0,0 +1,261 @@
+import json
+import threading
+import time
+from functools import partial
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import boto3
+import pytest
+
+import scan_server
+from services import inventory, jobs, regions
+from services.findings import Finding
+from services.inventory import Inventory
+from services.jobs import FINISHED, JobStore, ScanService, spec_key
+from services.scan_client import ScanClient
+
+SPEC = {'region': 'us-east-1', 'use_cache': False}
+
+
+def stub_scans(gate):
+    def volumes():
+        yield [Finding('vol-1', 'Unattached', 1.0)]
+        gate.wait(5)
+        yield [Finding('vol-2', 'Unattached', 2.0)]
+
+    def addresses():
+        yield [Finding('eipalloc-1', 'Unattached', 3.65)]
+
+    return [{'name': 'EBS Volumes', 'stream': volumes, 'clients': []},
+            {'name': 'Elastic IPs', 'stream': addresses, 'clients': []}]
+
+
+@pytest.fixture
+def gate():
+    # Holds the stub EBS scanner between its two pages until set
+    gate = threading.Event()
+    yield gate
+    gate.set()
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    runs = []
+
+    class History:
+        def record(self, findings):
+            runs.append(len(findings))
+            return len(runs)
+    monkeypatch.setattr(jobs, 'History', History)
+    return runs
+
+
+@pytest.fixture
+def service(aws, tmp_path, monkeypatch, gate, recorded):
+    scans = stub_scans(gate)
+    monkeypatch.setattr(jobs, 'SCANS', scans)
+    monkeypatch.setattr(jobs, 'scan_regions', partial(regions.scan_regions, scans=scans))
+    return ScanService(JobStore(str(tmp_path / 'jobs.sqlite')), boto3.Session(region_name='us-east-1')).start()
+
+
+def wait_for(store, job_id, statuses=FINISHED, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = store.get(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_concurrent_identical_submits_share_one_job(service, gate):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.submit(dict(SPEC)))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({job['id'] for job, _ in results}) == 1
+    assert sorted(deduped for _, deduped in results) == [False] + [True] * 7
+    # Different options are a different scan
+    other, deduped = service.submit(dict(SPEC, incremental=True))
+    assert not deduped and other['id'] != results[0][0]['id']
+
+    gate.set()
+    job = wait_for(service.store, results[0][0]['id'])
+    assert job['status'] == 'done' and job['total'] == 2
+
+
+def test_finished_job_is_recorded_and_served_as_latest(service, gate, recorded):
+    gate.set()
+    job, _ = service.submit(dict(SPEC))
+    job = wait_for(service.store, job['id'])
+
+    assert job['status'] == 'done'
+    assert recorded == [3] and job['result']['history_run'] == 1
+    assert service.store.latest(spec_key(SPEC))['id'] == job['id']
+    # A finished job is not joined by the next identical request
+    again, deduped = service.submit(dict(SPEC))
+    assert not deduped and again['id'] != job['id']
+
+
+def test_events_replay_from_any_sequence_number(service, gate):
+    gate.set()
+    job, _ = service.submit(dict(SPEC))
+    wait_for(service.store, job['id'])
+
+    events = service.store.events(job['id'])
+    assert [e['seq'] for e in events] == list(range(len(events)))
+    pages = [f['ID'] for e in events if e['kind'] == 'page' for f in e['payload']]
+    assert sorted(pages) == ['eipalloc-1', 'vol-1', 'vol-2']
+    assert sorted(e['name'] for e in events if e['kind'] == 'done') == ['EBS Volumes', 'Elastic IPs']
+    # A viewer reconnecting at seq N gets exactly the rest
+    assert service.store.events(job['id'], since=2) == events[2:]
+
+
+def test_cancel_running_and_queued_jobs(service, gate, recorded):
+    running, _ = service.submit(dict(SPEC))
+    queued, _ = service.submit(dict(SPEC, incremental=True))
+    wait_for(service.store, running['id'], statuses=('running',))
+
+    service.cancel(queued['id'])
+    service.cancel(running['id'])
+    assert wait_for(service.store, running['id'])['status'] == 'cancelled'
+    assert service.store.get(queued['id'])['status'] == 'cancelled'
+    assert service.store.get(queued['id'])['started'] is None
+    assert recorded == []
+
+
+def test_deadline_leaves_a_partial_job_that_is_never_reused(service, recorded):
+    job, _ = service.submit(dict(SPEC, deadline=0.3))
+    job = wait_for(service.store, job['id'])
+
+    assert job['status'] == 'partial'
+    assert recorded == [] and 'history_run' not in job['result']
+    assert service.store.latest(spec_key(dict(SPEC, deadline=0.3))) is None
+
+
+def test_only_complete_incremental_jobs_write_a_diff(service, gate, tmp_path, monkeypatch):
+    def configure(max_age):
+        monkeypatch.setattr(inventory, 'INVENTORY', Inventory(str(tmp_path / 'inventory.sqlite'), max_age))
+    monkeypatch.setattr(inventory, 'configure', configure)
+    baselines = []
+    monkeypatch.setattr(inventory, 'write_diff', lambda findings, path: baselines.append(path) or {'path': path})
+
+    partial_job, _ = service.submit(dict(SPEC, incremental=True, deadline=0.3))
+    partial_job = wait_for(service.store, partial_job['id'])
+    assert 'diff' not in partial_job['result'] and 'verdicts' in partial_job['result']
+    assert baselines == []
+
+    gate.set()
+    job, _ = service.submit(dict(SPEC, incremental=True))
+    job = wait_for(service.store, job['id'])
+    # Keyed on the caller's account and the scanned regions
+    assert baselines == [inventory.baseline_path(['123456789012'], ['us-east-1'])]
+    assert job['result']['diff'] == {'path': baselines[0]}
+
+
+def test_restart_fails_jobs_left_running(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite'))
+    job = store.create('key', {}, 1)
+    store.update(job['id'], status='running')
+    ScanService(store, session=object()).start()
+    assert store.get(job['id'])['status'] == 'failed'
+
+
+def test_unknown_options_are_rejected():
+    with pytest.raises(ValueError):
+        jobs.normalize({'regions': ['us-east-1']})
+
+
+@pytest.fixture
+def server(service):
+    httpd = scan_server.make_server('127.0.0.1', 0, service)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def call(url, method='GET', body=None):
+    """(status, decoded JSON body)"""
+    data = body if isinstance(body, bytes) or body is None else json.dumps(body).encode()
+    try:
+        with urlopen(Request(url, data=data, method=method), timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_http_routes(server, gate):
+    status, body = call(server + '/scans', 'POST', SPEC)
+    assert status == 202 and not body['deduped']
+    job_id = body['job']['id']
+    status, body = call(server + '/scans', 'POST', SPEC)
+    assert status == 200 and body['deduped'] and body['job']['id'] == job_id
+
+    key = spec_key(SPEC)
+    assert call(f"{server}/jobs/latest?key={key}")[0] == 404
+
+    gate.set()
+    client = ScanClient(server, poll_interval=0.02)
+    client.follow(job_id)
+
+    status, body = call(f"{server}/jobs/{job_id}/events?since=1")
+    assert status == 200 and body['status'] == 'done'
+    assert body['events'][0]['seq'] == 1 and body['next'] == body['events'][-1]['seq'] + 1
+    assert call(f"{server}/jobs/{job_id}/events?since={body['next']}")[1]['events'] == []
+
+    assert call(f"{server}/jobs/latest?key={key}")[1]['job']['id'] == job_id
+    assert call(f"{server}/jobs/{job_id}")[1]['job']['status'] == 'done'
+    assert [job['id'] for job in call(server + '/jobs')[1]['jobs']] == [job_id]
+
+    with urlopen(server + '/metrics', timeout=5) as response:
+        metrics = response.read().decode()
+    assert response.headers['Content-Type'].startswith('text/plain')
+    assert 'cost_optimizer_findings_total' in metrics
+
+
+def test_http_errors(server):
+    assert call(server + '/scans', 'POST', {'regions': 'all'})[0] == 400
+    assert call(server + '/scans', 'POST', b'not json')[0] == 400
+    assert call(server + '/jobs/unknown')[0] == 404
+    assert call(server + '/jobs/unknown/events')[0] == 404
+    assert call(server + '/jobs/unknown', 'DELETE')[0] == 404
+    assert call(server + '/nowhere')[0] == 404
+    assert call(server + '/nowhere', 'POST', {})[0] == 404
+
+
+def test_delete_cancels_a_running_job(server, service):
+    client = ScanClient(server, poll_interval=0.02)
+    job = client.submit(SPEC)['job']
+    wait_for(service.store, job['id'], statuses=('running',))
+
+    client.cancel(job['id'])
+    assert client.follow(job['id'])['status'] == 'cancelled'
+
+
+def test_client_follow_streams_and_replays(server, gate):
+    client = ScanClient(server, poll_interval=0.02)
+    job = client.submit(SPEC)['job']
+
+    pages, done = [], []
+    threading.Timer(0.3, gate.set).start()
+    finished = client.follow(job['id'], on_page=lambda region, name, page: pages.extend(f.id for f in page),
+                             on_done=lambda region, name, seconds, error: done.append((name, error)))
+    assert finished['status'] == 'done'
+    assert sorted(pages) == ['eipalloc-1', 'vol-1', 'vol-2']
+    assert sorted(done) == [('EBS Volumes', None), ('Elastic IPs', None)]
+
+    # A viewer that connects after the scan sees everything the first one did
+    table, job = client.findings(job['id'])
+    assert sorted(table.frame()['ID']) == ['eipalloc-1', 'vol-1', 'vol-2']
+    assert client.latest(SPEC)['id'] == job['id']
+
+
+def test_client_stops_following_on_request(server, service):
+    client = ScanClient(server, poll_interval=0.02)
+    job = client.submit(SPEC)['job']
+    assert client.follow(job['id'], should_stop=lambda: True)['status'] in ('queued', 'running')
@@ -0,0 +1,190 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from services.findings import Finding
+from services.scheduler import AdaptiveLimiter, ScanScheduler, ScanUnit
+
+
+def throttle():
+    return ClientError({'Error': {'Code': 'Throttling', 'Message': 'Rate exceeded'}}, 'DescribeVolumes')
+
+
+def unit(name, stream=None, split=None, key=None):
+    scan = {'name': name, 'stream': stream}
+    if split:
+        scan['split'] = split
+    return ScanUnit(scan, lambda: (), {'Region': 'us-east-1', 'Account': key or '-'}, key)
+
+
+def run(units, **kwargs):
+    pages, done = [], {}
+    ScanScheduler(**kwargs).run(
+        units,
+        on_page=lambda u, page: pages.append((u.name, page)),
+        on_done=lambda u, seconds, error: done.__setitem__(u.name, error),
+    )
+    return pages, done
+
+
+def test_stream_pages_arrive_tagged_in_order():
+    def stream():
+        yield [Finding('vol-1', 'Unattached', 1.0)]
+        yield [Finding('vol-2', 'Unattached', 2.0)]
+
+    pages, done = run([unit('EBS', stream, key='111')])
+
+    assert [page[0].id for _, page in pages] == ['vol-1', 'vol-2']
+    assert all(page[0].region == 'us-east-1' and page[0].account == '111' for _, page in pages)
+    assert done == {'EBS': None}
+
+
+def test_failed_stream_is_reported_once_and_never_replayed():
+    started = []
+
+    def stream():
+        started.append(1)
+        yield [Finding('vol-1', 'Unattached', 1.0)]
+        raise throttle()
+
+    pages, done = run([unit('EBS', stream)])
+
+    # The client layer owns throttle retries; the scheduler does not restart
+    # the stream (which would re-fetch and re-deliver vol-1)
+    assert len(started) == 1
+    assert [page[0].id for _, page in pages] == ['vol-1']
+    assert isinstance(done['EBS'], ClientError)
+
+
+def test_split_runs_every_first_step_before_second_steps():
+    order = []
+
+    def task(name):
+        def first():
+            order.append(f"plan {name}")
+            return lambda: order.append(f"judge {name}") or [Finding(name, 'Stale', 1.0)]
+        return first
+
+    pages, done = run([unit('S3', split=lambda: [task('a'), task('b'), lambda: []])])
+
+    assert sorted(order[:2]) == ['plan a', 'plan b']
+    assert sorted(order[2:]) == ['judge a', 'judge b']
+    assert sorted(page[0].id for _, page in pages if page) == ['a', 'b']
+    assert done == {'S3': None}
+
+
+def test_split_task_retries_a_throttle(monkeypatch):
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise throttle()
+        return [Finding('bucket', 'Stale', 1.0)]
+
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(asyncio, 'sleep', no_sleep)
+    pages, done = run([unit('S3', split=lambda: [flaky])])
+
+    assert len(calls) == 2
+    assert [page[0].id for _, page in pages] == ['bucket']
+
+
+def blocking_stream(release):
+    def stream():
+        yield [Finding('first', 'Unattached', 1.0)]
+        release.wait(5)
+        yield [Finding('late', 'Unattached', 1.0)]
+    return stream
+
+
+def test_deadline_stops_the_scan_and_reports_unfinished_units():
+    release = threading.Event()
+    scheduler = ScanScheduler(deadline=0.5)
+    done = {}
+    pages = []
+    try:
+        start = time.perf_counter()
+        scheduler.run([unit('slow', blocking_stream(release)), unit('fast', lambda: iter([[]]))],
+                      on_page=lambda u, page: pages.append((u.name, page)),
+                      on_done=lambda u, seconds, error: done.__setitem__(u.name, error))
+        elapsed = time.perf_counter() - start
+    finally:
+        release.set()
+
+    assert elapsed < 3
+    assert scheduler.timed_out and not scheduler.cancelled and not scheduler.complete
+    assert [page[0].id for name, page in pages if name == 'slow'] == ['first']
+    assert 'deadline exceeded' in str(done['slow'])
+    assert done['fast'] is None
+
+
+def test_cancel_from_another_thread():
+    release = threading.Event()
+    scheduler = ScanScheduler()
+    done = {}
+    threading.Timer(0.3, scheduler.cancel).start()
+    try:
+        scheduler.run([unit('slow', blocking_stream(release))],
+                      on_done=lambda u, seconds, error: done.__setitem__(u.name, error))
+    finally:
+        release.set()
+
+    assert scheduler.cancelled and not scheduler.timed_out and not scheduler.complete
+    assert 'cancelled' in str(done['slow'])
+
+
+def test_cancel_after_the_scan_finished_keeps_it_complete():
+    scheduler = ScanScheduler()
+    scheduler.run([unit('EBS', lambda: iter([[]]))])
+    scheduler.cancel()
+    assert scheduler.complete and not scheduler.cancelled
+
+
+def test_cancel_before_run_finishes_nothing():
+    scheduler = ScanScheduler()
+    scheduler.cancel()
+    done = {}
+    scheduler.run([unit('EBS', lambda: iter([[Finding('vol-1', 'Unattached', 1.0)]]))],
+                  on_done=lambda u, seconds, error: done.__setitem__(u.name, error))
+    assert 'cancelled' in str(done['EBS'])
+
+
+def test_per_key_limit_caps_concurrency_per_account():
+    lock = threading.Lock()
+    active = {'111': 0, '222': 0}
+    peak = {'111': 0, '222': 0}
+
+    def task(key):
+        def step():
+            with lock:
+                active[key] += 1
+                peak[key] = max(peak[key], active[key])
+            time.sleep(0.05)
+            with lock:
+                active[key] -= 1
+            return []
+        return step
+
+    units = [unit(f"{key}-{i}", split=lambda key=key: [task(key) for _ in range(4)], key=key)
+             for key in ('111', '222') for i in range(2)]
+    run(units, concurrency=16, per_key=2)
+
+    assert peak == {'111': 2, '222': 2}
+
+
+@pytest.mark.parametrize('throttled, expected', [(True, 4), (False, 9)])
+def test_adaptive_limiter(throttled, expected):
+    async def go():
+        limiter = AdaptiveLimiter(8)
+        for _ in range(8 if not throttled else 1):
+            await limiter.acquire()
+            await limiter.release(throttled)
+        return limiter.limit
+
+    assert asyncio.run(go()) == expected
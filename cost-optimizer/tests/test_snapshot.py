@@ -0,0 +1,74 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.snapshot import PACKED_BYTES_PER_ID, SET_BYTES_PER_ID, VolumeIndex, join_orphans
+
+
+def volume_ids(rng, n):
+    ids = [f"vol-{rng.getrandbits(68):017x}" for _ in range(n)]
+    ids += [f"vol-{rng.getrandbits(32):08x}" for _ in range(n // 10)]
+    ids += ['vol-not-hex', 'vol-123', 'snap-0123456789abcdef0', '']
+    return ids
+
+
+def probes(rng, ids):
+    # Every stored id, random misses, and near misses: the same low 64 bits
+    # in another bucket, or an 8-digit id that equals a 17-digit one's value
+    near = []
+    for volume_id in ids[:200]:
+        digits = volume_id[4:]
+        if len(digits) == 17:
+            near.append(f"vol-{(int(digits, 16) ^ (1 << 64)):017x}")
+            near.append(f"vol-{int(digits, 16) & 0xFFFFFFFF:08x}")
+    return ids + volume_ids(rng, 500) + near + ['vol-', 'vol-zzz']
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_packed_index_matches_a_set(seed):
+    rng = random.Random(seed)
+    ids = volume_ids(rng, 2000)
+    stored = ids[::2]
+
+    small = VolumeIndex()
+    small.add_all(stored)
+    packed = VolumeIndex(max_bytes=len(stored) * SET_BYTES_PER_ID // 4)
+    packed.add_all(stored)
+    packed.freeze()
+
+    assert not small.packed and packed.packed
+    assert len(small) == len(packed) == len(stored)
+    for volume_id in probes(rng, ids):
+        assert (volume_id in packed) == (volume_id in small) == (volume_id in set(stored)), volume_id
+
+
+def test_index_packs_once_the_set_would_pass_its_ceiling():
+    index = VolumeIndex(max_bytes=100 * SET_BYTES_PER_ID)
+    index.add_all(f"vol-{i:017x}" for i in range(100))
+    assert not index.packed
+    index.add('vol-00000000000000064')
+    assert index.packed
+    assert 'vol-00000000000000000' in index.freeze()
+
+
+def test_packed_index_enforces_its_ceiling():
+    index = VolumeIndex(max_bytes=10 * PACKED_BYTES_PER_ID)
+    with pytest.raises(MemoryError):
+        index.add_all(f"vol-{i:017x}" for i in range(11))
+
+
+def test_join_flags_old_snapshots_of_missing_volumes():
+    now = datetime.now(timezone.utc)
+    index = VolumeIndex()
+    index.add_all(['vol-00000000000000001'])
+    snapshot = lambda snap_id, volume_id, days: {
+        'SnapshotId': snap_id, 'VolumeId': volume_id, 'VolumeSize': 10, 'StartTime': now - timedelta(days=days)}
+    pages = [
+        [snapshot('snap-1', 'vol-00000000000000001', 60), snapshot('snap-2', 'vol-00000000000000002', 60)],
+        [snapshot('snap-3', 'vol-00000000000000002', 5)],
+    ]
+
+    result = list(join_orphans(pages, index, now - timedelta(days=30)))
+    assert [[f.id for f in page] for page in result] == [['snap-2'], []]
+
@@ -0,0 +1,100 @@
+import threading
+
+import boto3
+import pytest
+
+from services.client import STATS, ResilientClient, wrap
+from services.findings import Finding
+from services.scheduler import ScanScheduler, ScanUnit
+from services.telemetry import TELEMETRY, Histogram, Profiler, Telemetry
+
+
+@pytest.fixture(autouse=True)
+def telemetry():
+    TELEMETRY.reset()
+    yield TELEMETRY
+    TELEMETRY.reset()
+
+
+def busy(n=20000):
+    return sum(i * i for i in range(n))
+
+
+def test_stop_without_profiles_writes_nothing(tmp_path):
+    path = tmp_path / 'profile.pstats'
+    assert Profiler().stop(str(path)) is None
+    assert not path.exists()
+
+
+def test_profiler_merges_every_thread(tmp_path):
+    path = tmp_path / 'profile.pstats'
+    profiler = Profiler().start()
+    threads = [threading.Thread(target=busy) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = profiler.stop(str(path))
+
+    assert path.stat().st_size > 0
+    calls = [count for (_, _, name), (_, count, *_) in stats.stats.items() if name == 'busy']
+    assert sum(calls) == 3
+
+
+def bytes_counted():
+    return sum(value for (metric, _), value in TELEMETRY.counters.items() if metric == 'api_response_bytes')
+
+
+def test_response_bytes_counted_once_however_often_a_client_is_wrapped(aws):
+    raw = boto3.client('s3', region_name='us-east-1')
+    raw.create_bucket(Bucket='bucket')
+
+    ResilientClient(raw).list_buckets()
+    once = bytes_counted()
+    assert once > 0
+
+    # Each scanner and the cache wrap the same raw client again
+    TELEMETRY.reset()
+    wrappers = [ResilientClient(raw) for _ in range(3)]
+    wrap(wrappers[-1]).list_buckets()
+    assert bytes_counted() == once
+
+
+def test_summary_counts_findings_per_scanner_and_region():
+    def volumes(region, count):
+        page = [Finding(f"vol-{i}", 'Unattached', 1.0) for i in range(count)]
+        return ScanUnit({'name': 'EBS Volumes', 'stream': lambda: iter([page])}, lambda: (), {'Region': region})
+
+    ScanScheduler().run([volumes('us-east-1', 3), volumes('eu-west-1', 1)])
+
+    rows = {row['region']: row for row in TELEMETRY.summary()['scanners']}
+    assert {region: row['findings'] for region, row in rows.items()} == {'us-east-1': 3, 'eu-west-1': 1}
+    assert all(row['scanner'] == 'EBS Volumes' and row['count'] == 1 for row in rows.values())
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    assert histogram.quantile(0.5) == 0.0
+    for value in (0.05, 0.05, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    # Overflow bucket: the largest value seen
+    assert histogram.quantile(1.0) == 3.0
+
+
+def test_prometheus_output_includes_client_stats():
+    telemetry = Telemetry()
+    telemetry.observe('scanner_seconds', 0.2, scanner='EBS Volumes', region='us-east-1')
+    telemetry.count('findings', 4, scanner='EBS Volumes')
+    STATS.record('calls', 'us-east-1:DescribeVolumes', 2)
+
+    text = telemetry.prometheus(STATS)
+    assert '# TYPE cost_optimizer_scanner_seconds histogram' in text
+    assert 'cost_optimizer_scanner_seconds_bucket{region="us-east-1",scanner="EBS Volumes",le="0.25"} 1' in text
+    assert 'cost_optimizer_scanner_seconds_count{region="us-east-1",scanner="EBS Volumes"} 1' in text
+    assert 'cost_optimizer_findings_total{scanner="EBS Volumes"} 4' in text
+    assert 'cost_optimizer_api_calls_total{api="DescribeVolumes",region="us-east-1"} 2' in text
+    # Metrics with no data are left out
+    assert 'api_throttles' not in text
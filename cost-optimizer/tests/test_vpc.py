@@ -0,0 +1,79 @@
+import boto3
+import pytest
+
+from services.client import STATS
+from services.vpc import VPCScanner
+
+# One of the AMIs moto ships with
+IMAGE_ID = 'ami-12c6146b'
+
+
+@pytest.fixture
+def ec2(aws):
+    return boto3.client('ec2', region_name='us-east-1')
+
+
+def network(ec2, cidr='10.0.0.0/16'):
+    vpc_id = ec2.create_vpc(CidrBlock=cidr)['Vpc']['VpcId']
+    subnets = [ec2.create_subnet(VpcId=vpc_id, CidrBlock=cidr.replace('0.0/16', f"{n}.0/24"))['Subnet']['SubnetId']
+               for n in range(2)]
+    return vpc_id, subnets
+
+
+def launch(ec2, subnet_id, public=False, groups=()):
+    interface = {'DeviceIndex': 0, 'SubnetId': subnet_id, 'AssociatePublicIpAddress': public}
+    if groups:
+        interface['Groups'] = list(groups)
+    return ec2.run_instances(ImageId=IMAGE_ID, InstanceType='t3.micro', MinCount=1, MaxCount=1,
+                             NetworkInterfaces=[interface])['Instances'][0]['InstanceId']
+
+
+def findings_by_reason(ec2):
+    return {f.id: f.reason for f in VPCScanner(ec2).get_vpc_waste()}
+
+
+def test_empty_vpcs_and_subnets(ec2):
+    used_vpc, (used_subnet, idle_subnet) = network(ec2, '10.0.0.0/16')
+    empty_vpc, empty_subnets = network(ec2, '10.1.0.0/16')
+    launch(ec2, used_subnet)
+
+    reasons = findings_by_reason(ec2)
+    assert reasons[empty_vpc] == "Empty VPC (No Active Resources)"
+    assert reasons[idle_subnet].startswith(f"Empty Subnet in {used_vpc}")
+    assert used_vpc not in reasons and used_subnet not in reasons
+    # Subnets of an empty VPC are covered by the VPC's finding
+    assert not set(empty_subnets) & set(reasons)
+
+
+def test_public_ips_name_their_instance(ec2):
+    _, (subnet_id, _) = network(ec2)
+    public = launch(ec2, subnet_id, public=True)
+    launch(ec2, subnet_id)
+
+    findings = [f for f in VPCScanner(ec2).get_vpc_waste() if f.reason.startswith('Public IPv4')]
+    assert [f.reason for f in findings] == [f"Public IPv4 ($0.005/hr) - Attached to {public}"]
+    assert findings[0].cost > 0
+
+
+def test_unused_security_groups(ec2):
+    vpc_id, (subnet_id, _) = network(ec2)
+    group = lambda name: ec2.create_security_group(GroupName=name, Description=name, VpcId=vpc_id)['GroupId']
+    attached, referenced, unused = group('web'), group('db-clients'), group('leftover')
+    ec2.authorize_security_group_ingress(GroupId=attached, IpPermissions=[
+        {'IpProtocol': 'tcp', 'FromPort': 5432, 'ToPort': 5432, 'UserIdGroupPairs': [{'GroupId': referenced}]}])
+    launch(ec2, subnet_id, groups=[attached])
+
+    reasons = findings_by_reason(ec2)
+    assert reasons[unused] == f"Unused Security Group 'leftover' in {vpc_id}"
+    assert attached not in reasons and referenced not in reasons
+
+
+def test_one_eni_pass_however_many_vpcs(ec2):
+    for n in range(5):
+        vpc_id, (subnet_id, _) = network(ec2, f"10.{n}.0.0/16")
+        launch(ec2, subnet_id)
+
+    VPCScanner(ec2).get_vpc_waste()
+    calls = STATS.snapshot()['calls']
+    assert calls['us-east-1:DescribeNetworkInterfaces'] == 1
+    assert calls['us-east-1:DescribeVpcs'] == 1
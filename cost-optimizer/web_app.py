@@ -1,25 +1,25 @@
 import streamlit as st
 import pandas as pd
 import boto3
+import io
+import os
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+import threading
 
 # --- IMPORT SCANNERS ---
-from services.ebs import scan_ebs
-from services.elastic_ip import scan_eip
-from services.snapshot import scan_snapshots
-from services.rds import scan_rds
-from services.nat_gateway import scan_nat
-from services.s3 import scan_s3
-from services.ec2 import scan_ec2
-from services.eks import scan_eks
-from services.vpc import scan_vpc
-
-# Handle optional ALB scanner
-try:
-    from services.alb import scan_alb
-except ImportError:
-    scan_alb = None
+from services.registry import SCANS
+from services.regions import get_enabled_regions, plan_jobs, scan_regions
+from services.accounts import list_org_accounts, scan_accounts
+from services.scheduler import ScanScheduler
+from services.client import STATS
+from services.findings import FindingsTable
+from services import cache, inventory, s3_inventory
+from services.jobs import SPEC_DEFAULTS
+from services.export import Exports, FORMATS
+from services.history import History, TREND_BY, DEFAULT_PATH as HISTORY_PATH
+from services.telemetry import TELEMETRY, Profiler
+from services.scan_client import ScanClient, timings_from_job
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="AWS Cost Optimizer", layout="wide", page_icon="")
@@ -33,9 +33,43 @@ st.markdown("""
 with st.sidebar:
     st.header(" Configuration")
     region = st.text_input("AWS Region", value="ap-south-1")
+    all_regions = st.checkbox(" Scan all enabled regions", value=False)
+
+    # Org-wide mode: assume a role in every member account
+    org_scan = st.checkbox(" Scan all Organization accounts", value=False)
+    if org_scan:
+        role_name = st.text_input("Role to assume", value="OrganizationAccountAccessRole")
+        account_workers = st.number_input("Max concurrent API calls per account", min_value=1, value=4)
     
+    # On-disk scan cache: repeat loads reuse fresh AWS responses
+    use_cache = st.checkbox(" Use scan cache", value=True)
+    if use_cache:
+        max_cache_minutes = st.number_input("Use cache if fresher than (minutes, 0 = per-type TTLs)", min_value=0, value=0)
+        if st.button(" Clear cache"):
+            cache.configure().clear()
+
+    # Incremental mode: reuse verdicts for unchanged resources, diff against the last run
+    incremental = st.checkbox(" Incremental scan (only re-check changed resources)", value=False)
+
+    # Exact bucket sizes from synced S3 Inventory reports (CloudWatch metrics otherwise)
+    s3_inventory_path = st.text_input("S3 Inventory reports path (optional)", value="")
+
+    # Stop scanning after this long and show what was found (0 = no limit)
+    deadline = st.number_input("Scan deadline (seconds, 0 = none)", min_value=0, value=0)
+
+    # Keep every run in outputs/history.sqlite for the trend view
+    record_history = st.checkbox(" Record scan history", value=True)
+
+    # Stream findings to outputs/ as they arrive, for BI tools
+    export_formats = st.multiselect("Export findings to outputs/", list(FORMATS), default=[])
+
+    # Run scans on a shared scan service (scan_server.py) instead of in this process
+    service_url = st.text_input("Scan service URL (optional)", value="")
+    load_latest = bool(service_url) and st.button(" Load last results")
+
     # Debug mode toggle
     debug_mode = st.checkbox(" Debug Mode", value=True)
+    profile_scan = debug_mode and st.checkbox(" Profile scan (cProfile, all threads)", value=False)
     
     if st.button(" Run Fast Scan"):
         st.session_state['scan_in_progress'] = True
@@ -47,148 +81,300 @@ with st.sidebar:
         st.session_state['scan_completed'] = False
         st.rerun()
 
+# The same options as a scan service request
+scan_spec = dict(
+    SPEC_DEFAULTS, region=region, all_regions=all_regions, org=org_scan,
+    deadline=deadline or None, use_cache=use_cache,
+    max_cache_age=max_cache_minutes * 60 if use_cache and max_cache_minutes else None,
+    incremental=incremental, s3_inventory=s3_inventory_path or None, history=record_history,
+)
+if org_scan:
+    scan_spec.update(role_name=role_name, account_workers=account_workers)
+
+
+def store_results(results, scan_errors, timings, client_stats, diff, telemetry=None, metrics_text=None):
+    st.session_state['scan_completed'] = True
+    st.session_state['results'] = results
+    st.session_state['total_savings'] = results.total()
+    st.session_state['scan_errors'] = scan_errors
+    st.session_state['timings'] = timings
+    st.session_state['client_stats'] = client_stats
+    st.session_state['diff'] = diff
+    st.session_state['telemetry'] = telemetry
+    st.session_state['metrics_text'] = metrics_text
+
+
+# --- LOAD LAST RESULTS: replay the newest finished job from the scan service ---
+if load_latest:
+    try:
+        service = ScanClient(service_url)
+        job = service.latest(scan_spec)
+        if job is None:
+            st.info(" The scan service has no finished scan for these settings yet.")
+        else:
+            scan_errors = {}
+
+            def on_error(scan_region, name, seconds, error):
+                if error:
+                    scan_errors[f"{name} [{scan_region}]"] = error
+
+            results, job = service.findings(job['id'], on_done=on_error)
+            result = job['result'] or {}
+            store_results(results, scan_errors, timings_from_job(job), result.get('stats'), result.get('diff'),
+                          result.get('telemetry'))
+            st.session_state['scan_in_progress'] = False
+            st.sidebar.success(f"✅ Loaded scan from {time.strftime('%Y-%m-%d %H:%M', time.localtime(job['finished']))}")
+    except Exception as e:
+        st.error(f" Scan service error: {e}")
+
+# Live view while a scan runs: redraw at most this often, and never show
+# more rows than this (the full table renders once the scan finishes)
+LIVE_REFRESH = 0.5
+LIVE_ROWS = 200
+
+
+def render_live(results, live_metrics, live_chart, live_table):
+    with live_metrics.container():
+        c1, c2, c3 = st.columns(3)
+        c1.metric(" Monthly Waste So Far", f"${results.total():.2f}")
+        c2.metric(" Services Reporting", results.frame()['Service'].nunique())
+        c3.metric(" Resources Flagged", len(results))
+
+    chart_df = results.summary().set_index("Service")[["Cost"]]
+    live_chart.bar_chart(chart_df[chart_df["Cost"] > 0])
+
+    df = results.top(LIVE_ROWS).rename(columns={"ID": "Resource ID"})
+    df['Cost ($)'] = df['Cost'].map("${:.2f}".format)
+    columns = ["Service", "Account", "Region", "Resource ID", "Reason", "Cost ($)"]
+    if not results.has_accounts():
+        columns.remove("Account")
+    live_table.dataframe(df[columns], use_container_width=True, hide_index=True)
+
+
 # --- MAIN LOGIC ---
 if st.session_state.get('scan_in_progress', False) and not st.session_state.get('scan_completed', False):
-    
-    # 1. INITIALIZE CLIENTS (Fast)
-    with st.spinner(f" Connecting to AWS ({region})..."):
-        try:
-            session = boto3.Session(region_name=region)
-            
-            # Verify credentials
-            sts = session.client('sts')
-            identity = sts.get_caller_identity()
-            st.sidebar.success(f"✅ Connected as: {identity['Arn'].split('/')[-1]}")
-            
-            ec2 = session.client('ec2')
-            elb = session.client('elbv2')
-            cw = session.client('cloudwatch')
-            rds = session.client('rds')
-            s3 = session.client('s3')
-            eks = session.client('eks')
-            
-        except Exception as e:
-            st.error(f" AWS Connection Error: {e}")
-            st.info(" Make sure AWS credentials are configured (`aws configure`)")
-            st.session_state['scan_in_progress'] = False
-            st.stop()
-
-    # 2. DEFINE SCANS
-    scans = [
-        ("EBS Volumes", scan_ebs, [ec2]),
-        ("Elastic IPs", scan_eip, [ec2]),
-        ("Snapshots", scan_snapshots, [ec2]),
-        ("RDS Instances", scan_rds, [rds, cw]),
-        ("NAT Gateways", scan_nat, [ec2, cw]),
-        ("S3 Buckets", scan_s3, [s3]),
-        ("EC2 Instances", scan_ec2, [ec2, cw]),
-        ("EKS Clusters", scan_eks, [eks]),
-        ("VPCs", scan_vpc, [ec2])
-    ]
-
-    if scan_alb:
-        scans.insert(2, ("Load Balancers", scan_alb, [elb, cw]))
-
-    # 3. RUN PARALLEL SCANS
-    results = {}
-    total_savings = 0.0
+
+    service = ScanClient(service_url) if service_url else None
+
+    # 1. INITIALIZE SESSION (Fast)
+    if service:
+        # The service plans the scan and holds the AWS credentials; an
+        # identical scan already running there is joined, not repeated
+        with st.spinner(f" Submitting scan to {service_url}..."):
+            try:
+                submitted = service.submit(scan_spec)
+            except Exception as e:
+                st.error(f" Scan service error: {e}")
+                st.session_state['scan_in_progress'] = False
+                st.stop()
+        job = submitted['job']
+        if submitted['deduped']:
+            st.sidebar.info(f" Joined scan already {job['status']} on the service")
+    else:
+        with st.spinner(f" Connecting to AWS ({region})..."):
+            try:
+                session = boto3.Session(region_name=region)
+
+                # Verify credentials
+                sts = session.client('sts')
+                identity = sts.get_caller_identity()
+                st.sidebar.success(f"✅ Connected as: {identity['Arn'].split('/')[-1]}")
+
+                regions = get_enabled_regions(session, region) if all_regions else [region]
+                accounts = list_org_accounts(session) if org_scan else [identity['Account']]
+
+            except Exception as e:
+                st.error(f" AWS Connection Error: {e}")
+                st.info(" Make sure AWS credentials are configured (`aws configure`)")
+                st.session_state['scan_in_progress'] = False
+                st.stop()
+
+        # 2. DEFINE SCANS: every scanner in every selected region (and account)
+        jobs = plan_jobs(regions, SCANS) * len(accounts)
+
+        # 3. RUN PARALLEL SCANS
+        STATS.reset()
+        TELEMETRY.reset()
+        if use_cache:
+            cache.configure(max_age=scan_spec['max_cache_age'])
+        else:
+            cache.disable()
+        s3_inventory.configure(s3_inventory_path or None)
+        if incremental:
+            inventory.configure()
+        else:
+            inventory.disable()
+    results = FindingsTable(scan['name'] for scan in SCANS)
     scan_errors = {}
     
     # UI Elements for Progress (OUTSIDE spinner to make them visible)
     progress_bar = st.progress(0)
     status_text = st.empty()
-    
-    # The ThreadPool Engine
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        # Submit all tasks to the pool
-        future_to_name = {
-            executor.submit(func, *args): name 
-            for name, func, args in scans
-        }
-        
-        completed_count = 0
-        total_scans = len(scans)
-        
-        # Process as they finish (First Come, First Served)
-        for future in as_completed(future_to_name):
-            name = future_to_name[future]
+
+    # Findings so far: metrics, chart and the most expensive rows, redrawn in place
+    live_metrics = st.empty()
+    live_chart = st.empty()
+    live_table = st.empty()
+
+    # The scan runs in a background thread and pushes every page of findings
+    # onto this queue as it arrives, then a done marker per scanner run
+    page_queue = queue.Queue()
+    scan_output = {}
+
+    try:
+        exports = Exports(export_formats)
+    except ImportError as e:
+        st.error(f" {e}")
+        st.session_state['scan_in_progress'] = False
+        st.stop()
+
+    def on_page(scan_region, name, page):
+        exports.on_page(scan_region, name, page)
+        page_queue.put(('page', scan_region, name, page))
+
+    def on_done(scan_region, name, seconds, error):
+        page_queue.put(('done', scan_region, name, error))
+
+    def on_account_done(account, scan_region, name, seconds, error):
+        on_done(f"{account}/{scan_region}", name, seconds, error)
+
+    stop_following = threading.Event()
+    if not service:
+        scheduler = ScanScheduler(
+            concurrency=16, per_key=account_workers if org_scan else None, deadline=deadline or None
+        )
+
+    def run_scan():
+        # A scan that dies in this thread must not read as a clean account
+        try:
+            if service:
+                scan_output['job'] = service.follow(job['id'], on_page, on_done, should_stop=stop_following.is_set)
+            elif org_scan:
+                stream = scan_accounts(
+                    accounts, role_name, regions, session=session,
+                    on_done=on_account_done, scheduler=scheduler
+                )
+                for account, scan_region, name, page in stream:
+                    on_page(f"{account}/{scan_region}", name, page)
+            else:
+                scan_output['cloud_data'], scan_output['timings'] = scan_regions(
+                    regions, session=session, on_page=on_page, on_done=on_done,
+                    scheduler=scheduler, account=identity['Account']
+                )
+        except Exception as e:
+            scan_output['error'] = e
+
+    # Profile every thread the scan starts (the scan runs in worker threads)
+    profiler = Profiler().start() if profile_scan and not service else None
+    st.session_state['profile'] = None
+
+    scan_thread = threading.Thread(target=run_scan, daemon=True)
+    scan_thread.start()
+
+    completed_count = 0
+    total_scans = job['total'] if service else len(jobs)
+    dirty = False
+    next_render = 0.0
+    scan_finished = False
+
+    # Process pages as they arrive (First Come, First Served).
+    # A Streamlit rerun (e.g. Reset) interrupts this loop; the finally
+    # block then cancels the scan instead of leaving it running unseen
+    # (a service scan keeps running for its other viewers; we just stop following).
+    try:
+        while completed_count < total_scans and (scan_thread.is_alive() or not page_queue.empty()):
+            # Redraw throttled, so a flood of small pages costs one render per
+            # interval rather than one per page. The first finding is drawn
+            # straight away.
+            if dirty and time.monotonic() >= next_render:
+                started = time.monotonic()
+                render_live(results, live_metrics, live_chart, live_table)
+                # Back off if rendering itself is slow (very large scans)
+                next_render = time.monotonic() + max(LIVE_REFRESH, 4 * (time.monotonic() - started))
+                dirty = False
+
             try:
-                data = future.result()
-                
-                # CRITICAL: Validate data structure
-                if data is None:
-                    if debug_mode:
-                        st.warning(f" {name} returned None (missing return statement?)")
-                    data = []
-                
-                if not isinstance(data, list):
-                    if debug_mode:
-                        st.warning(f" {name} returned {type(data).__name__} instead of list")
-                    data = []
-                
-                # Validate each item has required keys
-                validated_data = []
-                for i, item in enumerate(data):
-                    if not isinstance(item, dict):
-                        if debug_mode:
-                            st.warning(f" {name} item {i} is not a dict: {type(item).__name__}")
-                        continue
-                    
-                    # Try to extract data with flexible key names
-                    resource_id = (item.get('ID') or item.get('id') or 
-                                 item.get('ResourceId') or item.get('resource_id') or 
-                                 'N/A')
-                    
-                    reason = (item.get('Reason') or item.get('reason') or 
-                            item.get('Description') or item.get('description') or 
-                            'No reason provided')
-                    
-                    cost = item.get('Cost') or item.get('cost') or 0.0
-                    
-                    # Try to convert cost to float
-                    try:
-                        cost = float(cost)
-                    except (ValueError, TypeError):
-                        if debug_mode:
-                            st.warning(f" {name}: Invalid cost value '{cost}' for {resource_id}")
-                        cost = 0.0
-                    
-                    validated_data.append({
-                        'ID': resource_id,
-                        'Reason': reason,
-                        'Cost': cost
-                    })
-                
-                results[name] = validated_data
-                
-                # Calculate savings immediately
-                for item in validated_data:
-                    total_savings += item['Cost']
-                    
-            except Exception as e:
-                results[name] = []
-                scan_errors[name] = str(e)
-                st.toast(f" Error scanning {name}: {e}", icon="")
-            
-            # Update Progress
-            completed_count += 1
-            progress = completed_count / total_scans
-            progress_bar.progress(progress)
-            status_text.text(f" Finished: {name} ({completed_count}/{total_scans})")
+                kind, scan_region, name, payload = page_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if kind == 'done':
+                if payload is not None:
+                    scan_errors[f"{name} [{scan_region}]"] = str(payload)
+                    st.toast(f" Error scanning {name} [{scan_region}]: {payload}", icon="")
+
+                # Update Progress
+                completed_count += 1
+                progress = completed_count / total_scans
+                progress_bar.progress(progress)
+                status_text.text(f" Finished: {name} [{scan_region}] ({completed_count}/{total_scans})")
+                continue
+
+            # Scanners emit Finding records, so pages go straight into the table
+            if payload:
+                results.add(name, payload)
+                dirty = True
+        scan_finished = True
+    finally:
+        if service:
+            # Once every scanner reported, wait for the job's final result
+            if not scan_finished:
+                stop_following.set()
+        else:
+            scheduler.cancel()
+        # Let the scan thread finish its last page so exports are complete files
+        scan_thread.join()
+        st.session_state['exports'] = exports.close()
+        if profiler:
+            outputs = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'outputs')
+            os.makedirs(outputs, exist_ok=True)
+            profile_path = os.path.join(outputs, f"profile_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+            profile_stats = profiler.stop(profile_path)
+            if profile_stats is not None:
+                profile_stats.stream = io.StringIO()
+                profile_stats.sort_stats('cumulative').print_stats(30)
+                st.session_state['profile'] = {'path': profile_path, 'top': profile_stats.stream.getvalue()}
 
     time.sleep(0.3)
     progress_bar.empty()
     status_text.empty()
-    
+    live_metrics.empty()
+    live_chart.empty()
+    live_table.empty()
+
+    if 'error' in scan_output:
+        st.error(f" Scan failed: {scan_output['error']}")
+        st.session_state['scan_in_progress'] = False
+        st.stop()
+
     # Mark scan as completed
-    st.session_state['scan_completed'] = True
-    st.session_state['results'] = results
-    st.session_state['total_savings'] = total_savings
-    st.session_state['scan_errors'] = scan_errors
+    if service:
+        result = scan_output['job'].get('result') or {}
+        try:
+            metrics_text = service.metrics()
+        except Exception as e:
+            metrics_text = f"# Could not read {service_url}/metrics: {e}"
+        store_results(results, scan_errors, timings_from_job(scan_output['job']), result.get('stats'), result.get('diff'),
+                      result.get('telemetry'), metrics_text)
+    else:
+        diff = None
+        if incremental:
+            inventory.INVENTORY.prune()
+            # A cut-short scan would report everything it missed as resolved
+            if scheduler.complete:
+                diff = inventory.write_diff(results, inventory.baseline_path(accounts, regions))
+        store_results(
+            results, scan_errors, scan_output.get('timings'), STATS.totals(), diff,
+            TELEMETRY.summary(), TELEMETRY.prometheus(STATS)
+        )
+        if record_history:
+            History().record(results)
 
 # 4. DISPLAY RESULTS (separate from scanning)
 if st.session_state.get('scan_completed', False):
-    results = st.session_state.get('results', {})
+    results = st.session_state.get('results')
+    if results is None:
+        results = FindingsTable()
     total_savings = st.session_state.get('total_savings', 0.0)
     scan_errors = st.session_state.get('scan_errors', {})
     
@@ -202,75 +388,148 @@ if st.session_state.get('scan_completed', False):
     
     # Top Metrics
     c1, c2, c3 = st.columns(3)
-    total_items = sum(len(v) for v in results.values())
     c1.metric(" Total Monthly Waste", f"${total_savings:.2f}", delta="Potential Savings")
-    c2.metric(" Services Scanned", len(results))
-    c3.metric(" Resources Flagged", total_items)
+    c2.metric(" Services Scanned", len(results.services))
+    c3.metric(" Resources Flagged", len(results))
     
     # Debug: Show raw results structure
     if debug_mode:
         with st.expander("🔍 Debug: Raw Scan Results", expanded=False):
-            for service, items in results.items():
+            frame = results.frame()
+            for service in results.services:
+                items = frame[frame['Service'] == service]
                 st.write(f"**{service}:** {len(items)} items")
-                if items:
-                    st.json(items[:2])  # Show first 2 items
+                if len(items):
+                    st.json(items.head(2).astype(str).to_dict('records'))  # Show first 2 items
     
+    # Retries and drops from the API client layer
+    client_stats = st.session_state.get('client_stats')
+    if client_stats and client_stats['drops']:
+        st.warning(f" {client_stats['drops']} findings were dropped after retries ran out; results may be incomplete.")
+    if client_stats and debug_mode:
+        with st.expander(" API Client Stats", expanded=False):
+            st.json(client_stats)
+
+    # Where the scan time went: spans per scanner and per API call
+    telemetry = st.session_state.get('telemetry')
+    profile = st.session_state.get('profile')
+    if debug_mode and (telemetry or profile):
+        with st.expander(" Instrumentation", expanded=False):
+            tabs = st.tabs(["Scanners", "API calls", "Slowest spans", "Prometheus", "Profile"])
+            if telemetry:
+                tabs[0].dataframe(pd.DataFrame(telemetry['scanners']), hide_index=True)
+                tabs[1].dataframe(pd.DataFrame(telemetry['apis']), hide_index=True)
+                tabs[2].dataframe(pd.DataFrame(telemetry['slowest']), hide_index=True)
+            metrics_text = st.session_state.get('metrics_text')
+            if metrics_text:
+                tabs[3].code(metrics_text, language="text")
+            if profile:
+                tabs[4].caption(f"Full profile: `{profile['path']}` (python -m pstats, snakeviz)")
+                tabs[4].code(profile['top'], language="text")
+            else:
+                tabs[4].caption("Tick 'Profile scan' in the sidebar to profile the next scan.")
+
+    # New / resolved findings since the last incremental scan
+    diff = st.session_state.get('diff')
+    if diff:
+        with st.expander(f" Changes since last scan: {len(diff['new'])} new, {len(diff['resolved'])} resolved", expanded=False):
+            st.caption(f"{len(diff['unchanged'])} unchanged. Diff saved to {diff['path']}")
+            if diff['new']:
+                st.write("**New**")
+                st.dataframe(pd.DataFrame(diff['new']), hide_index=True)
+            if diff['resolved']:
+                st.write("**Resolved**")
+                st.dataframe(pd.DataFrame(diff['resolved']), hide_index=True)
+
+    # Wall time per region and per scanner
+    timings = st.session_state.get('timings')
+    if timings:
+        with st.expander(" Scan Timings", expanded=False):
+            region_df = pd.DataFrame(
+                [{"Region": r, "Wall Time (s)": round(sec, 2)} for r, sec in timings['regions'].items()]
+            )
+            scanner_df = pd.DataFrame(
+                [{"Region": r, "Scanner": n, "Wall Time (s)": round(sec, 2)} for (r, n), sec in timings['scanners'].items()]
+            )
+            st.dataframe(region_df.sort_values("Wall Time (s)", ascending=False), hide_index=True)
+            st.dataframe(scanner_df.sort_values("Wall Time (s)", ascending=False), hide_index=True)
+
     # Detailed Table
     st.subheader(" Detailed Findings")
     
-    all_rows = []
-    chart_data = []
-
-    for service, items in results.items():
-        service_total = 0.0
-        for item in items:
-            cost = item['Cost']
-            service_total += cost
-            all_rows.append({
-                "Service": service,
-                "Resource ID": item['ID'],
-                "Reason": item['Reason'],
-                "Cost": cost  # Keep as number for sorting
-            })
-        
-        if service_total > 0:
-            chart_data.append({"Service": service, "Cost": service_total})
+    # Sorting and per-service totals run on the findings table
+    df = results.by_cost().rename(columns={"ID": "Resource ID"})
 
-    if all_rows:
-        df = pd.DataFrame(all_rows)
+    if len(df):
+        columns = ["Service", "Account", "Region", "Resource ID", "Reason", "Cost ($)"]
+        if not results.has_accounts():
+            columns.remove("Account")
         # Format Cost column for display
-        df['Cost ($)'] = df['Cost'].apply(lambda x: f"${x:.2f}")
-        
-        # Sort by most expensive
-        df = df.sort_values(by="Cost", ascending=False)
+        df['Cost ($)'] = df['Cost'].map("${:.2f}".format)
         
         st.dataframe(
-            df[["Service", "Resource ID", "Reason", "Cost ($)"]], 
+            df[columns], 
             use_container_width=True,
             hide_index=True
         )
 
         # Bar Chart
         st.subheader("Waste by Service")
-        if chart_data:
-            chart_df = pd.DataFrame(chart_data).set_index("Service")
+        chart_df = results.summary().set_index("Service")[["Cost"]]
+        chart_df = chart_df[chart_df["Cost"] > 0]
+        if len(chart_df):
             st.bar_chart(chart_df)
             
         # Download button
-        csv = df[["Service", "Resource ID", "Reason", "Cost ($)"]].to_csv(index=False)
+        csv = df[columns].to_csv(index=False)
         st.download_button(
             label="📥 Download CSV Report",
             data=csv,
             file_name=f"aws_waste_report_{time.strftime('%Y%m%d_%H%M%S')}.csv",
             mime="text/csv"
         )
+        for path in st.session_state.get('exports') or []:
+            st.caption(f" Findings exported to `{path}`")
     else:
         st.balloons()
         st.success(" Your AWS account is squeaky clean! No waste found.")
-        st.info("**Services checked:** " + ", ".join(results.keys()))
+        st.info("**Services checked:** " + ", ".join(results.services))
         
         # Show what was checked even if empty
         if debug_mode:
             with st.expander("Show Empty Scan Results"):
-                for service in results.keys():
-                    st.write(f"✅ {service}: 0 idle resources")
\ No newline at end of file
+                for service in results.services:
+                    st.write(f"✅ {service}: 0 idle resources")
+
+# 5. TRENDS: waste over time from the scan history
+if os.path.exists(HISTORY_PATH):
+    st.divider()
+    st.subheader(" Trends")
+    scan_history = History(HISTORY_PATH)
+
+    t1, t2 = st.columns(2)
+    trend_days = t1.selectbox("Period", [30, 90, 365], index=1, format_func=lambda d: f"Last {d} days")
+    trend_by = t2.selectbox("Waste by", list(TREND_BY))
+    trend = scan_history.trend(trend_days, by=trend_by)
+    if len(trend):
+        st.line_chart(trend.pivot_table(index="Day", columns=trend_by, values="Cost", aggfunc="sum").fillna(0))
+    else:
+        st.info(" No scans recorded in this period yet.")
+
+    st.write("**Longest-flagged open findings**")
+    oldest = scan_history.oldest(50)
+    if len(oldest):
+        oldest['Cost ($)'] = oldest.pop('Cost').map("${:.2f}".format)
+        st.dataframe(oldest, use_container_width=True, hide_index=True)
+
+    resource_id = st.text_input("How long has this resource been flagged? (resource ID)", value="")
+    if resource_id:
+        flagged = scan_history.resource(resource_id.strip())
+        if flagged is None:
+            st.info(f" {resource_id} has never been flagged.")
+        else:
+            state = "still flagged" if flagged['open'] else "resolved"
+            st.write(f"**{resource_id}** ({flagged['service']}, {flagged['region']}): {state}, "
+                     f"flagged for {flagged['days']} days since "
+                     f"{time.strftime('%Y-%m-%d', time.localtime(flagged['first_seen']))} ({flagged['reason']})")
+            st.line_chart(flagged['history'].set_index("Day")[["Cost"]])